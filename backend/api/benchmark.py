@@ -0,0 +1,578 @@
+"""
+Набор данных и бюджеты для проверки производительности эндпоинтов API.
+
+Используется командой benchmark_api: данные генерируются детерминированно,
+для каждого эндпоинта задаются допустимое число запросов к базе
+и бюджеты задержки p50/p95 в миллисекундах.
+"""
+import math
+import random
+import re
+import time
+from collections import namedtuple
+from io import StringIO
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils.http import quote_etag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import response_cache, shopping_list
+from .paginators import KeysetPagination
+from recipes import similarity
+from recipes.recipe_index import recipe_ingredient_index
+from recipes.models import (Tag, Recipe, Ingredient, IngredientInRecipe,
+                            FavoriteRecipes, ShoppingCart, ShoppingListItem,
+                            SimilarRecipe)
+from users.models import Follow
+
+User = get_user_model()
+
+BATCH_SIZE = 5000
+PASSWORD = 'benchmark-password'
+NEW_PASSWORD = 'benchmark-password-new'
+IMAGE = ('data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAEAAAABCAYAAAAf'
+         'FcSJAAAADUlEQVR42mP8z8BQDwAEhQGAhKmMIQAAAABJRU5ErkJggg==')
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+)
+UNITS = ('г', 'кг', 'мл', 'л', 'шт')
+POSTGRES_FULL_SCAN = re.compile(r'Seq Scan on \S+')
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (?!subquery|CONSTANT)\S+$')
+
+Endpoint = namedtuple(
+    'Endpoint',
+    'name method path data max_queries p50 p95 status anonymous '
+    'setup teardown headers check_plan check'
+)
+Endpoint.__new__.__defaults__ = (None, ) * 14
+
+Result = namedtuple('Result', 'endpoint queries p50 p95 errors')
+
+
+def _bulk_create(model, objs):
+    """Создание объектов пачками без загрузки всего набора в память."""
+    objs = iter(objs)
+    while True:
+        batch = list(islice(objs, BATCH_SIZE))
+        if not batch:
+            break
+        model.objects.bulk_create(batch)
+
+
+def seed(scale=1.0, seed=0):
+    """
+    Заполнение базы детерминированным набором данных.
+    При scale=1 создаётся 10k пользователей, 50k рецептов
+    и 500k ингридиентов в рецептах.
+    """
+    rnd = random.Random(seed)
+    n_users = max(int(10000 * scale), 20)
+    n_recipes = max(int(50000 * scale), 100)
+    n_ingredients = max(int(2000 * scale), 50)
+    per_recipe = 10
+
+    password = make_password(PASSWORD)
+    _bulk_create(User, (
+        User(username=f'bench{i}', email=f'bench{i}@foodgram.ru',
+             first_name='Имя', last_name='Фамилия', password=password)
+        for i in range(n_users)
+    ))
+    user_ids = list(User.objects.order_by('id').values_list('id', flat=True))
+
+    tag_ids = [
+        Tag.objects.create(name=name, color=color, slug=slug).pk
+        for name, color, slug in TAGS
+    ]
+    _bulk_create(Ingredient, (
+        Ingredient(name=f'Ингредиент {i}', measurement_unit=rnd.choice(UNITS))
+        for i in range(n_ingredients)
+    ))
+    ingredient_names = dict(
+        Ingredient.objects.order_by('id').values_list('id', 'name')
+    )
+    ingredient_ids = list(ingredient_names)
+    recipe_ingredients = [
+        rnd.sample(ingredient_ids, per_recipe) for _ in range(n_recipes)
+    ]
+
+    _bulk_create(Recipe, (
+        Recipe(author_id=user_ids[0] if i == 0 else rnd.choice(user_ids),
+               name=f'Рецепт {i}', text='Описание рецепта',
+               image='recipes/images/benchmark.png',
+               cooking_time=rnd.randint(1, 120),
+               ingredient_names=' '.join(map(ingredient_names.get, ids)))
+        for i, ids in enumerate(recipe_ingredients)
+    ))
+    recipe_ids = list(
+        Recipe.objects.order_by('id').values_list('id', flat=True)
+    )
+
+    _bulk_create(Recipe.tags.through, (
+        Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+        for recipe_id in recipe_ids
+        for tag_id in rnd.sample(tag_ids, rnd.randint(1, 2))
+    ))
+    _bulk_create(IngredientInRecipe, (
+        IngredientInRecipe(recipe_id=recipe_id, ingredient_id=ingredient_id,
+                           amount=rnd.randint(1, 500))
+        for recipe_id, ingredients in zip(recipe_ids, recipe_ingredients)
+        for ingredient_id in ingredients
+    ))
+    _bulk_create(FavoriteRecipes, (
+        FavoriteRecipes(user_id=user_id, recipe_id=recipe_id)
+        for user_id in user_ids
+        for recipe_id in rnd.sample(recipe_ids[1:], 5)
+    ))
+    _bulk_create(ShoppingCart, (
+        ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+        for user_id in user_ids
+        for recipe_id in rnd.sample(recipe_ids[1:], 3)
+    ))
+    _bulk_create(Follow, (
+        Follow(user_id=user_id, author_id=author_id)
+        for user_id in user_ids
+        for author_id in rnd.sample(user_ids[1:], 10)
+        if author_id != user_id
+    ))
+    ShoppingListItem.objects.rebuild()
+    call_command('reconcile_counters', stdout=StringIO())
+    call_command('update_recipe_scores', stdout=StringIO())
+    response_cache.invalidate()
+
+    user = User.objects.get(pk=user_ids[0])
+    followed = set(user.follower.values_list('author_id', flat=True))
+    return {
+        'user': user,
+        'user_id': user.pk,
+        'email': user.email,
+        'new_email': 'new-bench@foodgram.ru',
+        'other_user': next(pk for pk in user_ids[1:] if pk not in followed),
+        'author': next(iter(followed)),
+        'recipe': recipe_ids[-1],
+        'meal_plan': recipe_ids[-8:-1],
+        'authors': [pk for pk in user_ids[1:] if pk not in followed][:7],
+        'own_recipe': recipe_ids[0],
+        'tag': tag_ids[0],
+        'tag_slug': TAGS[0][2],
+        'tag_slug_2': TAGS[1][2],
+        'ingredient': ingredient_ids[0],
+        'ingredient_ids': ingredient_ids[:5],
+        'pantry': sorted(
+            set(recipe_ingredients[-1][:-1]) | set(ingredient_ids[:50])
+        ),
+        'tag_ids': tag_ids[:2],
+    }
+
+
+def _recipe_data(ctx, image=True):
+    data = {
+        'name': 'Рецепт для проверки',
+        'text': 'Описание',
+        'cooking_time': 10,
+        'tags': ctx['tag_ids'],
+        'ingredients': [
+            {'id': pk, 'amount': 10} for pk in ctx['ingredient_ids']
+        ],
+    }
+    if image:
+        data['image'] = IMAGE
+    return data
+
+
+def _reset_own_ingredients(ctx):
+    """Другие ингридиенты у рецепта, чтобы обновление их меняло."""
+    Recipe.objects.get(pk=ctx['own_recipe']).set_ingredients(
+        {pk: 1 for pk in ctx['ingredient_ids'][:3]}
+    )
+
+
+def _delete_created(model):
+    def teardown(ctx, response):
+        model.objects.filter(pk=response.data['id']).delete()
+    return teardown
+
+
+def _create_temp_recipe(ctx):
+    recipe = Recipe.objects.create(
+        author=ctx['user'], name='Временный рецепт', text='Описание',
+        image='recipes/images/benchmark.png', cooking_time=1
+    )
+    ctx['temp_recipe'] = recipe.pk
+
+
+def _orm_create(model, **lookup):
+    def setup(ctx):
+        model.objects.get_or_create(
+            **{key: ctx[value] for key, value in lookup.items()}
+        )
+    return setup
+
+
+def _orm_delete(model, **lookup):
+    def teardown(ctx, response):
+        for obj in model.objects.filter(
+            **{key: ctx[value] for key, value in lookup.items()}
+        ):
+            obj.delete()
+    return teardown
+
+
+def _links(ctx, key):
+    return {'ids': ctx[key]}
+
+
+def _add_links(model, key):
+    def setup(ctx):
+        model.objects.add(ctx['user_id'], ctx[key])
+    return setup
+
+
+def _remove_links(model, key):
+    def setup(ctx):
+        model.objects.remove(ctx['user_id'], ctx[key])
+    return setup
+
+
+def _build_recipe_index(ctx):
+    recipe_ingredient_index.match(include=(ctx['ingredient'], ))
+
+
+def _pantry_query(ctx):
+    return {'limit': 6, 'available_ingredients': ctx['pantry'],
+            'max_missing': 2}
+
+
+def _has_results(ctx, response):
+    if not response.data['results']:
+        return 'пустой результат'
+    return None
+
+
+def _build_similar(ctx):
+    if not SimilarRecipe.objects.filter(recipe_id=ctx['recipe']).exists():
+        similarity.build()
+
+
+def _reset_password(ctx, response):
+    ctx['user'].set_password(PASSWORD)
+    ctx['user'].save()
+
+
+def _create_token(ctx):
+    Token.objects.get_or_create(user=ctx['user'])
+
+
+def _shopping_list_etag(ctx):
+    ctx['shopping_list_etag'] = quote_etag(
+        shopping_list.get_etag(ctx['user_id'], 'txt')
+    )
+
+
+def _deep_cursor(ctx):
+    ordering = ('-pub_date', '-id')
+    pagination = KeysetPagination()
+    pagination.ordering = ordering
+    recipe = Recipe.objects.order_by(*ordering)[99 * 6 - 1]
+    ctx['deep_cursor'] = pagination.get_cursor(recipe)
+
+
+def _invalidate_responses(ctx):
+    response_cache.invalidate()
+
+
+def _etag(path, data=None, anonymous=False):
+    def setup(ctx):
+        client = APIClient()
+        if not anonymous:
+            client.force_authenticate(ctx['user'])
+        response = client.get(_format(path, ctx), data)
+        ctx['etag'] = response['ETag']
+    return setup
+
+
+def get_endpoints():
+    """Эндпоинты из api/urls.py и их бюджеты."""
+    favorite = {'user_id': 'user_id', 'recipe_id': 'recipe'}
+    follow = {'user_id': 'user_id', 'author_id': 'other_user'}
+    return (
+        Endpoint('tags-list', 'get', '/api/tags/', None, 0, 20, 50),
+        Endpoint('tags-list-304', 'get', '/api/tags/', None, 0, 20, 50, 304,
+                 setup=_etag('/api/tags/'),
+                 headers={'HTTP_IF_NONE_MATCH': '{etag}'}),
+        Endpoint('tags-detail', 'get', '/api/tags/{tag}/', None, 2, 20, 50),
+        Endpoint('ingredients-list', 'get', '/api/ingredients/', None,
+                 0, 20, 50),
+        Endpoint('ingredients-list-gzip', 'get', '/api/ingredients/', None,
+                 0, 20, 50, headers={'HTTP_ACCEPT_ENCODING': 'gzip'}),
+        Endpoint('ingredients-search', 'get', '/api/ingredients/',
+                 {'name': 'Ингредиент 1'}, 0, 50, 100),
+        Endpoint('ingredients-detail', 'get',
+                 '/api/ingredients/{ingredient}/', None, 0, 20, 50),
+        Endpoint('users-list', 'get', '/api/users/', {'limit': 6},
+                 2, 50, 100),
+        Endpoint('users-detail', 'get', '/api/users/{author}/', None,
+                 1, 20, 50),
+        Endpoint('users-me', 'get', '/api/users/me/', None, 1, 20, 50),
+        Endpoint('users-create', 'post', '/api/users/',
+                 {'email': 'new-bench@foodgram.ru', 'username': 'newbench',
+                  'first_name': 'Имя', 'last_name': 'Фамилия',
+                  'password': PASSWORD},
+                 4, 500, 1000, 201, anonymous=True,
+                 teardown=_orm_delete(User, email='new_email')),
+        Endpoint('users-set-password', 'post', '/api/users/set_password/',
+                 {'current_password': PASSWORD,
+                  'new_password': NEW_PASSWORD},
+                 1, 1000, 2000, 204, teardown=_reset_password),
+        Endpoint('users-subscriptions', 'get', '/api/users/subscriptions/',
+                 {'limit': 6, 'recipes_limit': 3}, 3, 100, 200),
+        Endpoint('users-subscriptions-cursor', 'get',
+                 '/api/users/subscriptions/',
+                 {'limit': 6, 'recipes_limit': 3, 'cursor': ''},
+                 2, 100, 200),
+        Endpoint('users-subscribe', 'post',
+                 '/api/users/{other_user}/subscribe/',
+                 {'recipes_limit': 3}, 6, 50, 100, 201,
+                 teardown=_orm_delete(Follow, **follow)),
+        Endpoint('users-unsubscribe', 'delete',
+                 '/api/users/{other_user}/subscribe/', None, 3, 50, 100, 204,
+                 setup=_orm_create(Follow, **follow)),
+        Endpoint('users-subscribe-many', 'post', '/api/users/subscribe/',
+                 lambda ctx: _links(ctx, 'authors'), 10, 50, 100,
+                 setup=_remove_links(Follow, 'authors')),
+        Endpoint('users-unsubscribe-many', 'delete', '/api/users/subscribe/',
+                 lambda ctx: _links(ctx, 'authors'), 9, 50, 100,
+                 setup=_add_links(Follow, 'authors')),
+        Endpoint('recipes-list', 'get', '/api/recipes/', {'limit': 6},
+                 4, 300, 500, check_plan=True),
+        Endpoint('recipes-list-304', 'get', '/api/recipes/', {'limit': 6},
+                 1, 200, 300, 304,
+                 setup=_etag('/api/recipes/', {'limit': 6}),
+                 headers={'HTTP_IF_NONE_MATCH': '{etag}'}),
+        Endpoint('recipes-list-anonymous', 'get', '/api/recipes/',
+                 {'limit': 6}, 4, 300, 500, anonymous=True,
+                 setup=_invalidate_responses),
+        Endpoint('recipes-list-anonymous-cached', 'get', '/api/recipes/',
+                 {'limit': 6}, 0, 5, 10, anonymous=True),
+        Endpoint('recipes-list-limit-50', 'get', '/api/recipes/',
+                 {'limit': 50}, 4, 500, 800),
+        Endpoint('recipes-list-page-100', 'get', '/api/recipes/',
+                 {'limit': 6, 'page': 100}, 4, 300, 500),
+        Endpoint('recipes-list-cursor', 'get', '/api/recipes/',
+                 {'limit': 6, 'cursor': ''}, 3, 100, 200, check_plan=True),
+        Endpoint('recipes-list-cursor-page-100', 'get', '/api/recipes/',
+                 {'limit': 6, 'cursor': '{deep_cursor}'}, 3, 100, 200,
+                 setup=_deep_cursor),
+        Endpoint('recipes-feed', 'get', '/api/recipes/feed/', {'limit': 6},
+                 3, 100, 200, check_plan=True),
+        Endpoint('recipes-popular', 'get', '/api/recipes/',
+                 {'limit': 6, 'ordering': 'popular'}, 4, 300, 500,
+                 check_plan=True),
+        Endpoint('recipes-trending-cursor', 'get', '/api/recipes/',
+                 {'limit': 6, 'ordering': 'trending', 'cursor': ''},
+                 3, 100, 200, check_plan=True),
+        Endpoint('recipes-filter-tags', 'get', '/api/recipes/',
+                 {'limit': 6, 'tags': ['{tag_slug}', '{tag_slug_2}']},
+                 4, 250, 400, check_plan=True),
+        Endpoint('recipes-filter-ingredients', 'get', '/api/recipes/',
+                 {'limit': 6, 'ingredients': ['{ingredient}']}, 4, 100, 200,
+                 setup=_build_recipe_index),
+        Endpoint('recipes-exclude-ingredients', 'get', '/api/recipes/',
+                 {'limit': 6, 'exclude_ingredients': ['{ingredient}']},
+                 4, 200, 400, setup=_build_recipe_index),
+        Endpoint('recipes-available-ingredients', 'get', '/api/recipes/',
+                 _pantry_query, 4, 100, 200, setup=_build_recipe_index,
+                 check=_has_results),
+        Endpoint('recipes-filter-author', 'get', '/api/recipes/',
+                 {'limit': 6, 'author': '{author}'}, 4, 50, 100,
+                 check_plan=True),
+        Endpoint('recipes-filter-favorited', 'get', '/api/recipes/',
+                 {'limit': 6, 'is_favorited': 1}, 4, 100, 200,
+                 check_plan=True),
+        Endpoint('recipes-filter-not-favorited', 'get', '/api/recipes/',
+                 {'limit': 6, 'is_favorited': 0}, 4, 300, 500,
+                 check_plan=True),
+        Endpoint('recipes-filter-shopping-cart', 'get', '/api/recipes/',
+                 {'limit': 6, 'is_in_shopping_cart': 1}, 4, 100, 200,
+                 check_plan=True),
+        Endpoint('recipes-search', 'get', '/api/recipes/',
+                 {'limit': 6, 'search': 'Ингредиент 15'}, 4, 600, 800),
+        Endpoint('recipes-search-tags', 'get', '/api/recipes/',
+                 {'limit': 6, 'search': 'Рецепт', 'tags': ['{tag_slug}']},
+                 4, 1000, 1500),
+        Endpoint('recipes-detail', 'get', '/api/recipes/{recipe}/', None,
+                 4, 20, 50),
+        Endpoint('recipes-detail-304', 'get', '/api/recipes/{recipe}/', None,
+                 1, 20, 50, 304, setup=_etag('/api/recipes/{recipe}/'),
+                 headers={'HTTP_IF_NONE_MATCH': '{etag}'}),
+        Endpoint('recipes-similar', 'get', '/api/recipes/{recipe}/similar/',
+                 None, 3, 50, 100, setup=_build_similar),
+        Endpoint('recipes-detail-anonymous-cached', 'get',
+                 '/api/recipes/{recipe}/', None, 0, 5, 10, anonymous=True),
+        Endpoint('recipes-create', 'post', '/api/recipes/', _recipe_data,
+                 15, 100, 200, 201, teardown=_delete_created(Recipe)),
+        Endpoint('recipes-update', 'patch', '/api/recipes/{own_recipe}/',
+                 lambda ctx: _recipe_data(ctx, image=False),
+                 13, 100, 200, 200),
+        Endpoint('recipes-update-ingredients', 'patch',
+                 '/api/recipes/{own_recipe}/',
+                 lambda ctx: _recipe_data(ctx, image=False),
+                 21, 100, 200, 200, setup=_reset_own_ingredients),
+        Endpoint('recipes-delete', 'delete', '/api/recipes/{temp_recipe}/',
+                 None, 14, 50, 100, 204, setup=_create_temp_recipe),
+        Endpoint('recipes-favorite', 'post',
+                 '/api/recipes/{recipe}/favorite/', None, 6, 50, 100, 201,
+                 teardown=_orm_delete(FavoriteRecipes, **favorite)),
+        Endpoint('recipes-unfavorite', 'delete',
+                 '/api/recipes/{recipe}/favorite/', None, 3, 50, 100, 204,
+                 setup=_orm_create(FavoriteRecipes, **favorite)),
+        Endpoint('recipes-shopping-cart', 'post',
+                 '/api/recipes/{recipe}/shopping_cart/', None,
+                 9, 50, 100, 201,
+                 teardown=_orm_delete(ShoppingCart, **favorite)),
+        Endpoint('recipes-remove-shopping-cart', 'delete',
+                 '/api/recipes/{recipe}/shopping_cart/', None,
+                 5, 50, 100, 204,
+                 setup=_orm_create(ShoppingCart, **favorite)),
+        Endpoint('recipes-favorite-many', 'post',
+                 '/api/recipes/favorite/',
+                 lambda ctx: _links(ctx, 'meal_plan'), 10, 50, 100,
+                 setup=_remove_links(FavoriteRecipes, 'meal_plan')),
+        Endpoint('recipes-unfavorite-many', 'delete',
+                 '/api/recipes/favorite/',
+                 lambda ctx: _links(ctx, 'meal_plan'), 9, 50, 100,
+                 setup=_add_links(FavoriteRecipes, 'meal_plan')),
+        Endpoint('recipes-shopping-cart-many', 'post',
+                 '/api/recipes/shopping_cart/',
+                 lambda ctx: _links(ctx, 'meal_plan'), 13, 50, 100,
+                 setup=_remove_links(ShoppingCart, 'meal_plan')),
+        Endpoint('recipes-remove-shopping-cart-many', 'delete',
+                 '/api/recipes/shopping_cart/',
+                 lambda ctx: _links(ctx, 'meal_plan'), 11, 50, 100,
+                 setup=_add_links(ShoppingCart, 'meal_plan')),
+        Endpoint('recipes-download-shopping-cart', 'get',
+                 '/api/recipes/download_shopping_cart/', None, 2, 50, 100),
+        Endpoint('recipes-download-shopping-cart-csv', 'get',
+                 '/api/recipes/download_shopping_cart/',
+                 {'file_format': 'csv'}, 2, 50, 100),
+        Endpoint('recipes-download-shopping-cart-json', 'get',
+                 '/api/recipes/download_shopping_cart/',
+                 {'file_format': 'json'}, 2, 50, 100),
+        Endpoint('recipes-download-shopping-cart-pdf', 'get',
+                 '/api/recipes/download_shopping_cart/',
+                 {'file_format': 'pdf'}, 2, 50, 100),
+        Endpoint('recipes-download-shopping-cart-304', 'get',
+                 '/api/recipes/download_shopping_cart/', None,
+                 1, 50, 100, 304, setup=_shopping_list_etag,
+                 headers={'HTTP_IF_NONE_MATCH': '{shopping_list_etag}'}),
+        Endpoint('auth-token-login', 'post', '/api/auth/token/login/',
+                 {'email': '{email}', 'password': PASSWORD},
+                 6, 1000, 2000, 200, anonymous=True),
+        Endpoint('auth-token-logout', 'post', '/api/auth/token/logout/',
+                 None, 2, 50, 100, 204, setup=_create_token),
+    )
+
+
+def _format(value, ctx):
+    if callable(value):
+        return value(ctx)
+    if isinstance(value, str):
+        return value.format(**ctx)
+    if isinstance(value, (list, tuple)):
+        return [_format(item, ctx) for item in value]
+    if isinstance(value, dict):
+        return {key: _format(item, ctx) for key, item in value.items()}
+    return value
+
+
+def full_scans(sql):
+    """
+    Полные чтения таблиц в плане запроса sql. В PostgreSQL
+    последовательное чтение на время EXPLAIN запрещается, поэтому
+    Seq Scan в плане остаётся, только если подходящего индекса нет;
+    в SQLite полное чтение — SCAN без индекса.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute('SET enable_seqscan = off')
+            try:
+                cursor.execute(f'EXPLAIN {sql}')
+                plan = [row[0] for row in cursor.fetchall()]
+            finally:
+                cursor.execute('RESET enable_seqscan')
+            return [
+                match.group() for line in plan
+                for match in POSTGRES_FULL_SCAN.finditer(line)
+            ]
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return [
+            row[-1] for row in cursor.fetchall()
+            if SQLITE_FULL_SCAN.match(row[-1])
+        ]
+
+
+def check_plans(captured):
+    """
+    Полные чтения в планах запросов страницы списка (с LIMIT);
+    COUNT(*) и предзагрузка по id не проверяются.
+    """
+    return [
+        f'полное чтение: {scan}'
+        for query in captured.captured_queries
+        if query['sql'].startswith('SELECT') and ' LIMIT ' in query['sql']
+        for scan in full_scans(query['sql'])
+    ]
+
+
+def _percentile(values, percent):
+    """Процентиль по ближайшему рангу: p95 из 20 замеров — 19-й."""
+    values = sorted(values)
+    index = max(0, math.ceil(percent / 100 * len(values)) - 1)
+    return values[index]
+
+
+def measure(client, anonymous_client, endpoint, ctx, repeat):
+    """
+    Замер числа запросов и задержки одного эндпоинта.
+    Первый запрос прогревочный и в замеры не входит; для эндпоинтов
+    с check_plan по нему проверяются планы запросов.
+    """
+    timings, queries, errors = [], 0, []
+    client = anonymous_client if endpoint.anonymous else client
+    for attempt in range(repeat + 1):
+        if endpoint.setup:
+            endpoint.setup(ctx)
+        path = _format(endpoint.path, ctx)
+        data = _format(endpoint.data, ctx)
+        method = getattr(client, endpoint.method)
+        kwargs = {'format': 'json'} if endpoint.method != 'get' else {}
+        kwargs.update(_format(endpoint.headers or {}, ctx))
+        with CaptureQueriesContext(connection) as captured:
+            start = time.perf_counter()
+            response = method(path, data, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = (time.perf_counter() - start) * 1000
+        if attempt:
+            timings.append(elapsed)
+            queries = max(queries, len(captured.captured_queries))
+        elif endpoint.check_plan:
+            errors.extend(check_plans(captured))
+        if response.status_code != (endpoint.status or 200):
+            errors.append(f'HTTP {response.status_code}')
+            continue
+        if endpoint.check:
+            error = endpoint.check(ctx, response)
+            if error:
+                errors.append(error)
+        if endpoint.teardown:
+            endpoint.teardown(ctx, response)
+    return Result(endpoint, queries, _percentile(timings, 50),
+                  _percentile(timings, 95), sorted(set(errors)))
@@ -0,0 +1,169 @@
+"""
+Снимки справочников тегов и ингридиентов.
+
+Полный список тегов и ингридиентов меняется редко, поэтому он один раз
+рендерится в JSON теми же сериализаторами и рендерером, что и API,
+сжимается gzip и отдаётся из памяти процесса без обращения к базе.
+Версия снимка — хеш содержимого, она же ETag. Актуальность снимка между
+воркерами проверяется по метке версии источника из core.stamps, общей
+для всех процессов, которую меняют сигналы моделей Tag и Ingredient.
+
+Снимки можно выгрузить в STATIC_ROOT/catalogs/ для раздачи nginx:
+файлы с версией в имени не меняются и кешируются навсегда, а
+manifest.json указывает на текущие версии.
+"""
+import gzip
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from hashlib import sha1
+from io import BytesIO
+from uuid import uuid4
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.middleware.gzip import re_accepts_gzip
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from core.stamps import bump_stamp, get_stamp
+from recipes.ingredient_index import fold
+from recipes.models import Ingredient, Tag
+from .serializers import IngredientSerializer, TagSerializer
+
+VERSION_CACHE_KEY = 'api:catalog:{}:version'
+STATIC_DIR = 'catalogs'
+
+Snapshot = namedtuple('Snapshot', 'version body gzipped')
+
+
+def compress(body):
+    """gzip без времени в заголовке, чтобы архив зависел только от данных."""
+    buffer = BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode='wb', mtime=0) as file:
+        file.write(body)
+    return buffer.getvalue()
+
+
+class Catalog:
+    """Снимок справочника: JSON, его gzip и версия по содержимому."""
+    def __init__(self, name, load):
+        self.name = name
+        self._load = load
+        self._version_key = VERSION_CACHE_KEY.format(name)
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._source_version = None
+        self._next_check = 0
+
+    def build(self):
+        """Рендеринг справочника в снимок."""
+        body = JSONRenderer().render(self._load())
+        return Snapshot(
+            sha1(body).hexdigest()[:16], body, compress(body)
+        )
+
+    def snapshot(self):
+        """Актуальный снимок, при необходимости перестроенный."""
+        snapshot, now = self._snapshot, time.monotonic()
+        if snapshot is not None and now < self._next_check:
+            return snapshot
+        with self._lock:
+            version = get_stamp(self._version_key)
+            if self._snapshot is None or version != self._source_version:
+                self._snapshot = self.build()
+                self._source_version = version
+            self._next_check = now + settings.CATALOG_CHECK_INTERVAL
+            return self._snapshot
+
+    def invalidate(self):
+        """Сброс снимка во всех процессах."""
+        bump_stamp(self._version_key)
+        self._snapshot = None
+
+    def respond(self, request):
+        """
+        Ответ со снимком: gzip, если клиент его принимает,
+        или 304, если версия у клиента совпадает.
+        """
+        snapshot = self.snapshot()
+        etag = quote_etag(snapshot.version)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+            if re_accepts_gzip.search(accept_encoding):
+                response = HttpResponse(
+                    snapshot.gzipped, content_type='application/json'
+                )
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = HttpResponse(
+                    snapshot.body, content_type='application/json'
+                )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'public, no-cache'
+        patch_vary_headers(response, ('Accept-Encoding', ))
+        return response
+
+    def static_name(self, snapshot):
+        return f'{STATIC_DIR}/{self.name}.{snapshot.version}.json'
+
+
+def _write(path, content):
+    """Запись файла через временный файл, чтобы nginx не отдал половину."""
+    temp_path = f'{path}.{uuid4().hex}.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(content)
+    os.replace(temp_path, path)
+
+
+def export(root=None):
+    """
+    Выгрузка снимков в root/catalogs/: файлы с версией в имени и их
+    .gz для gzip_static, а также manifest.json с текущими версиями.
+    Возвращает словарь имя справочника -> путь от root.
+    """
+    root = root or settings.STATIC_ROOT
+    os.makedirs(os.path.join(root, STATIC_DIR), exist_ok=True)
+    manifest = {}
+    for catalog in CATALOGS:
+        snapshot = catalog.build()
+        name = catalog.static_name(snapshot)
+        path = os.path.join(root, name)
+        if not os.path.exists(path):
+            _write(f'{path}.gz', snapshot.gzipped)
+            _write(path, snapshot.body)
+        manifest[catalog.name] = name
+    _write(
+        os.path.join(root, STATIC_DIR, 'manifest.json'),
+        json.dumps(manifest, sort_keys=True).encode()
+    )
+    return manifest
+
+
+def export_if_enabled():
+    if settings.CATALOGS_STATIC_EXPORT:
+        export()
+
+
+def load_tags():
+    return TagSerializer(Tag.objects.all(), many=True).data
+
+
+def load_ingredients():
+    """Ингридиенты в том же порядке, что и в индексе для поиска."""
+    return sorted(
+        IngredientSerializer(Ingredient.objects.all(), many=True).data,
+        key=lambda item: (
+            fold(item['name']), item['name'],
+            item['measurement_unit'], item['id']
+        )
+    )
+
+
+tag_catalog = Catalog('tags', load_tags)
+ingredient_catalog = Catalog('ingredients', load_ingredients)
+CATALOGS = (tag_catalog, ingredient_catalog)
@@ -0,0 +1,61 @@
+"""
+Условные GET-запросы (If-None-Match / If-Modified-Since).
+
+Валидаторы ответа (ETag и время изменения) считаются дешёвым запросом
+до сериализации. Если клиент прислал совпадающий валидатор, ответ 304
+отдаётся без обращения к сериализатору.
+"""
+from calendar import timegm
+from hashlib import sha1
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from rest_framework import status
+
+
+def make_etag(request, *parts):
+    """ETag по адресу запроса и частям parts."""
+    parts = (request.get_full_path(), *parts)
+    return quote_etag(
+        sha1(':'.join(str(part) for part in parts).encode()).hexdigest()
+    )
+
+
+def set_validators(response, etag, last_modified=None):
+    response['ETag'] = etag
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(
+            timegm(last_modified.utctimetuple())
+        )
+    return response
+
+
+def not_modified(request, etag, last_modified=None):
+    """Ответ 304, если валидаторы клиента совпадают, иначе None."""
+    timestamp = None
+    if last_modified is not None:
+        timestamp = timegm(last_modified.utctimetuple())
+    response = get_conditional_response(
+        request, etag=etag, last_modified=timestamp
+    )
+    if response is None:
+        return None
+    return set_validators(response, etag, last_modified)
+
+
+def conditional(request, validators, compute):
+    """
+    Ответ 304 по валидаторам из validators() или результат compute()
+    с заголовками ETag и Last-Modified. Если validators() вернул None,
+    ответ отдаётся как есть.
+    """
+    result = validators()
+    if result is None:
+        return compute()
+    etag, last_modified = result
+    response = not_modified(request, etag, last_modified)
+    if response is None:
+        response = compute()
+        if response.status_code == status.HTTP_200_OK:
+            set_validators(response, etag, last_modified)
+    return response
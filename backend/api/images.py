@@ -0,0 +1,117 @@
+"""
+Приём изображений рецептов.
+
+Изображение приходит файлом в multipart/form-data (Django пишет его во
+временный файл по частям) или, как раньше, строкой data:image/...;base64
+в JSON. Base64 декодируется частями сразу во временный файл, без копий
+всей строки. Размер проверяется до декодирования, число пикселей — по
+заголовку изображения, до распаковки, поэтому «бомба» с огромным
+разрешением отклоняется, не занимая память.
+"""
+import binascii
+import os
+from base64 import b64decode
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.utils.text import slugify
+from PIL import Image
+from rest_framework import serializers
+
+BASE64_MARKER = ';base64,'
+CHUNK_SIZE = 64 * 1024
+FORMAT_EXTENSIONS = {
+    'JPEG': 'jpg',
+    'PNG': 'png',
+    'GIF': 'gif',
+    'WEBP': 'webp',
+}
+NAME_MAX_LENGTH = 40
+WHITESPACE = ' \t\n\r\v\f'
+WHITESPACE_TABLE = dict.fromkeys(map(ord, WHITESPACE))
+
+
+def image_name(original, extension):
+    """
+    Имя файла: безопасная часть исходного имени и случайный суффикс,
+    чтобы имена не совпадали и хранилище не дописывало к ним _XXXXXXX.
+    """
+    stem = os.path.splitext(os.path.basename(original or ''))[0]
+    stem = slugify(stem)[:NAME_MAX_LENGTH].strip('-_')
+    if not any(char.isalpha() for char in stem):
+        stem = 'recipe'
+    return f'{stem}-{uuid4().hex[:12]}.{extension}'
+
+
+def check_size(size):
+    if size > settings.RECIPE_IMAGE_MAX_BYTES:
+        raise serializers.ValidationError(
+            'Размер изображения не должен превышать '
+            f'{settings.RECIPE_IMAGE_MAX_BYTES // (1024 * 1024)} МБ.'
+        )
+
+
+def decode_base64(data):
+    """
+    Декодирование data:image/...;base64,... во временный файл.
+    Пробелы и переносы строк (base64 с переносом по 76 символов)
+    пропускаются, части декодируются по границам групп из 4 символов.
+    """
+    marker = data.find(BASE64_MARKER, 0, 100)
+    if marker == -1:
+        raise serializers.ValidationError('Неверный формат изображения.')
+    start = marker + len(BASE64_MARKER)
+    end = len(data.rstrip(WHITESPACE))
+    encoded_size = end - start - sum(
+        data.count(char, start, end) for char in WHITESPACE
+    )
+    check_size(encoded_size // 4 * 3 - data.count('=', end - 2, end))
+    upload = TemporaryUploadedFile(
+        '', data[len('data:'):marker], encoded_size // 4 * 3, None
+    )
+    rest = ''
+    try:
+        for offset in range(start, end, CHUNK_SIZE):
+            chunk = data[offset:offset + CHUNK_SIZE]
+            chunk = rest + chunk.translate(WHITESPACE_TABLE)
+            split = len(chunk) - len(chunk) % 4
+            upload.write(b64decode(chunk[:split], validate=True))
+            rest = chunk[split:]
+        if rest:
+            raise binascii.Error('Incorrect padding')
+    except (binascii.Error, ValueError):
+        upload.close()
+        raise serializers.ValidationError('Неверный формат изображения.')
+    upload.size = upload.tell()
+    upload.seek(0)
+    return upload
+
+
+def check_image(upload):
+    """
+    Проверка размера, формата и числа пикселей по заголовку
+    изображения. Файлу присваивается безопасное имя.
+    """
+    check_size(upload.size)
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            width, height = image.size
+            image_format = image.format
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise serializers.ValidationError(
+            'Загрузите правильное изображение.'
+        )
+    if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+        raise serializers.ValidationError(
+            'Разрешение изображения слишком большое.'
+        )
+    extension = FORMAT_EXTENSIONS.get(image_format)
+    if extension is None:
+        raise serializers.ValidationError(
+            'Поддерживаются изображения JPEG, PNG, GIF и WEBP.'
+        )
+    upload.seek(0)
+    upload.name = image_name(upload.name, extension)
+    return upload
@@ -0,0 +1,114 @@
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (override_settings, setup_test_environment,
+                               teardown_test_environment)
+from rest_framework.test import APIClient
+
+from api.benchmark import get_endpoints, measure, seed
+
+
+class Command(BaseCommand):
+    """
+    Проверка эндпоинтов API на числе запросов к базе и задержке.
+    Работает на отдельной тестовой базе: SQLite локально или PostgreSQL,
+    если он указан в настройках.
+    """
+    help = ('Заполняет тестовую базу и проверяет бюджеты запросов '
+            'и задержки эндпоинтов API.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', type=float, default=1.0,
+            help='Масштаб набора данных (1 = 50k рецептов).'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора данных.'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Количество запросов к каждому эндпоинту.'
+        )
+        parser.add_argument(
+            '--latency-factor', type=float, default=1.0,
+            help='Множитель бюджетов задержки для медленного окружения.'
+        )
+        parser.add_argument(
+            '--only', nargs='*', default=(),
+            help='Проверять только эндпоинты, имя которых содержит строку.'
+        )
+        parser.add_argument(
+            '--noinput', '--no-input', action='store_false',
+            dest='interactive',
+            help='Не спрашивать подтверждение на удаление тестовой базы.'
+        )
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        setup_test_environment()
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=not options['interactive']
+        )
+        try:
+            with tempfile.TemporaryDirectory() as media_root:
+                with override_settings(
+                    MEDIA_ROOT=media_root, RECIPE_IMAGE_VARIANT_WORKERS=0
+                ):
+                    failures = self.run_benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        if failures:
+            raise CommandError(
+                'Превышены бюджеты: ' + ', '.join(failures)
+            )
+        self.stdout.write(self.style.SUCCESS('Все бюджеты соблюдены.'))
+
+    def run_benchmark(self, options):
+        start = time.perf_counter()
+        ctx = seed(scale=options['scale'], seed=options['seed'])
+        self.stdout.write(
+            f'База: {connection.vendor}, данные созданы за '
+            f'{time.perf_counter() - start:.1f} с.'
+        )
+        client = APIClient()
+        client.force_authenticate(ctx['user'])
+        anonymous_client = APIClient()
+        factor = options['latency_factor']
+        failures = []
+        self.stdout.write(
+            f'{"эндпоинт":<40}{"запросы":>10}{"p50, мс":>16}{"p95, мс":>16}'
+        )
+        for endpoint in get_endpoints():
+            if options['only'] and not any(
+                name in endpoint.name for name in options['only']
+            ):
+                continue
+            result = measure(
+                client, anonymous_client, endpoint, ctx,
+                max(options['repeat'], 1)
+            )
+            problems = list(result.errors)
+            if result.queries > endpoint.max_queries:
+                problems.append('запросы')
+            if result.p50 > endpoint.p50 * factor:
+                problems.append('p50')
+            if result.p95 > endpoint.p95 * factor:
+                problems.append('p95')
+            line = (
+                f'{endpoint.name:<40}'
+                f'{f"{result.queries}/{endpoint.max_queries}":>10}'
+                f'{f"{result.p50:.1f}/{endpoint.p50 * factor:.0f}":>16}'
+                f'{f"{result.p95:.1f}/{endpoint.p95 * factor:.0f}":>16}'
+            )
+            if problems:
+                failures.append(endpoint.name)
+                self.stdout.write(self.style.ERROR(
+                    f'{line}  {", ".join(problems)}'
+                ))
+            else:
+                self.stdout.write(line)
+        return failures
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api import response_cache
+from recipes import similarity
+
+
+class Command(BaseCommand):
+    """
+    Расчёт похожих рецептов для рецептов, изменённых после прошлого
+    расчёта. Рассчитан на запуск по расписанию.
+    """
+    help = ('Пересчитывает похожие рецепты для изменённых рецептов '
+            'или, с --all, для всех.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересчитать похожие рецепты у всех рецептов, например '
+                 'после изменения SIMILAR_RECIPES_COUNT.'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = similarity.build(rebuild=options['all'])
+        if count:
+            response_cache.invalidate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Похожие рецепты пересчитаны для {count} рецептов за '
+            f'{time.perf_counter() - start:.1f} с.'
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from api import catalogs
+
+
+class Command(BaseCommand):
+    """Выгрузка снимков справочников в статические файлы."""
+    help = ('Сохраняет JSON и gzip справочников тегов и ингридиентов '
+            'в STATIC_ROOT/catalogs/ для раздачи nginx.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--root',
+            help='Каталог для выгрузки вместо STATIC_ROOT.'
+        )
+
+    def handle(self, *args, **options):
+        manifest = catalogs.export(options['root'])
+        for name, path in manifest.items():
+            self.stdout.write(f'{name}: {path}')
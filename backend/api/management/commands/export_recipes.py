@@ -0,0 +1,122 @@
+import gzip
+import json
+import sys
+import time
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import IngredientInRecipe, Recipe, Tag
+
+BATCH_SIZE = 500
+
+
+def open_output(path):
+    """Файл для записи, сжатый gzip для имён на .gz, или stdout для -."""
+    if path == '-':
+        return open(
+            sys.stdout.fileno(), 'w', encoding='utf-8', closefd=False
+        )
+    if path.endswith('.gz'):
+        return gzip.open(path, 'wt', encoding='utf-8')
+    return open(path, 'w', encoding='utf-8')
+
+
+RECIPE_FIELDS = (
+    'pk', 'author__username', 'name', 'text', 'cooking_time', 'image',
+    'pub_date'
+)
+
+
+def iter_recipes(batch_size):
+    """
+    Рецепты по возрастанию id пачками по batch_size, с тегами
+    и ингридиентами по естественным ключам. На пачку три запроса
+    values_list без создания объектов моделей, память не растёт
+    с числом рецептов.
+    """
+    tags = {
+        pk: {'name': name, 'color': color, 'slug': slug}
+        for pk, name, color, slug in Tag.objects.values_list(
+            'pk', 'name', 'color', 'slug'
+        )
+    }
+    last = 0
+    while True:
+        rows = list(Recipe.objects.filter(pk__gt=last).order_by(
+            'pk'
+        ).values_list(*RECIPE_FIELDS)[:batch_size])
+        if not rows:
+            return
+        pks = [row[0] for row in rows]
+        recipe_tags = defaultdict(list)
+        for recipe_id, tag_id in Recipe.tags.through.objects.filter(
+            recipe_id__in=pks
+        ).order_by('pk').values_list('recipe_id', 'tag_id'):
+            recipe_tags[recipe_id].append(tags[tag_id])
+        ingredients = defaultdict(list)
+        for recipe_id, name, measurement_unit, amount in (
+            IngredientInRecipe.objects.filter(recipe_id__in=pks).order_by(
+                'pk'
+            ).values_list(
+                'recipe_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'amount'
+            )
+        ):
+            ingredients[recipe_id].append({
+                'name': name,
+                'measurement_unit': measurement_unit,
+                'amount': amount,
+            })
+        for pk, author, name, text, cooking_time, image, pub_date in rows:
+            yield {
+                'id': pk,
+                'author': author,
+                'name': name,
+                'text': text,
+                'cooking_time': cooking_time,
+                'image': image,
+                'pub_date': pub_date.isoformat(),
+                'tags': recipe_tags[pk],
+                'ingredients': ingredients[pk],
+            }
+        last = pks[-1]
+
+
+class Command(BaseCommand):
+    """
+    Выгрузка рецептов в NDJSON для переноса между окружениями:
+    по рецепту в строке, авторы, теги и ингридиенты — по
+    естественным ключам, изображения — путями в MEDIA_ROOT.
+    """
+    help = ('Выгружает рецепты с тегами и ингридиентами в NDJSON '
+            '(по умолчанию в stdout, для имён на .gz — со сжатием).')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', default='-',
+            help='Файл для выгрузки, по умолчанию stdout.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Число рецептов, загружаемых из базы за раз.'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = 0
+        try:
+            output = open_output(options['output'])
+        except OSError as error:
+            raise CommandError(error)
+        with output:
+            for recipe in iter_recipes(options['batch_size']):
+                output.write(
+                    json.dumps(recipe, ensure_ascii=False) + '\n'
+                )
+                count += 1
+                if count % (options['batch_size'] * 20) == 0:
+                    self.stderr.write(f'Выгружено рецептов: {count}')
+        self.stderr.write(self.style.SUCCESS(
+            f'Выгружено рецептов: {count} за '
+            f'{time.perf_counter() - start:.1f} с.'
+        ))
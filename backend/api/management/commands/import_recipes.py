@@ -0,0 +1,347 @@
+import gzip
+import json
+import os
+import sys
+import time
+from collections import Counter
+from itertools import islice
+from uuid import uuid4
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from api import catalogs, response_cache
+from recipes.ingredient_index import ingredient_index
+from recipes.recipe_index import recipe_ingredient_index
+from recipes.models import Ingredient, IngredientInRecipe, Recipe, Tag
+from users.models import User
+
+BATCH_SIZE = 500
+MAX_REPORTED = 20
+NAME_MAX_LENGTH = Recipe._meta.get_field('name').max_length
+
+
+def open_input(path):
+    """Файл для чтения, сжатый gzip для имён на .gz, или stdin для -."""
+    if path == '-':
+        return open(sys.stdin.fileno(), encoding='utf-8', closefd=False)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+def positive_int(value):
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        raise ValueError(f'ожидается целое число больше нуля: {value!r}')
+    return value
+
+
+def string(value, max_length=None):
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f'ожидается непустая строка: {value!r}')
+    if max_length is not None and len(value) > max_length:
+        raise ValueError(f'строка длиннее {max_length} символов')
+    return value
+
+
+def parse(line):
+    """Проверенная запись рецепта из строки NDJSON."""
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError('ожидается объект')
+    pub_date = parse_datetime(string(record.get('pub_date')))
+    if pub_date is None:
+        raise ValueError('неверная дата публикации')
+    tags = {}
+    for tag in record.get('tags') or ():
+        tags[string(tag['slug'])] = {
+            'name': string(tag['name']), 'color': string(tag['color'])
+        }
+    ingredients = {}
+    for item in record.get('ingredients') or ():
+        key = (string(item['name']), string(item['measurement_unit']))
+        if key in ingredients:
+            raise ValueError(f'ингридиент {key[0]} повторяется')
+        ingredients[key] = positive_int(item['amount'])
+    return {
+        'author': string(record.get('author')),
+        'name': string(record.get('name'), NAME_MAX_LENGTH),
+        'text': string(record.get('text')),
+        'cooking_time': positive_int(record.get('cooking_time')),
+        'image': string(record.get('image')),
+        'pub_date': pub_date,
+        'tags': tags,
+        'ingredients': ingredients,
+    }
+
+
+class Resolver:
+    """
+    Кеши id авторов, тегов и ингридиентов по естественным ключам.
+    Недостающие ключи ищутся одним запросом на пачку, отсутствующие
+    теги и ингридиенты создаются.
+    """
+    def __init__(self, default_author=None):
+        self.authors = {}
+        self.tags = {}
+        self.ingredients = {}
+        self.default_author = default_author
+        self.catalogs_changed = False
+
+    def load_authors(self, usernames):
+        missing = set(usernames) - self.authors.keys()
+        if self.default_author is not None:
+            missing.add(self.default_author)
+        self.authors.update(User.objects.filter(
+            username__in=missing
+        ).values_list('username', 'pk'))
+
+    def author(self, username):
+        pk = self.authors.get(username)
+        if pk is None and self.default_author is not None:
+            pk = self.authors.get(self.default_author)
+        return pk
+
+    def load_tags(self, tags):
+        missing = {slug: tag for slug, tag in tags.items()
+                   if slug not in self.tags}
+        if not missing:
+            return
+        found = dict(Tag.objects.filter(
+            slug__in=missing
+        ).values_list('slug', 'pk'))
+        new = [
+            Tag(name=tag['name'], color=tag['color'], slug=slug)
+            for slug, tag in missing.items() if slug not in found
+        ]
+        if new:
+            Tag.objects.bulk_create(new, ignore_conflicts=True)
+            self.catalogs_changed = True
+            found.update(Tag.objects.filter(
+                slug__in=[tag.slug for tag in new]
+            ).values_list('slug', 'pk'))
+        self.tags.update(found)
+
+    def _find_ingredients(self, keys):
+        names = {name for name, _ in keys}
+        for name, measurement_unit, pk in Ingredient.objects.filter(
+            name__in=names
+        ).values_list('name', 'measurement_unit', 'pk'):
+            if (name, measurement_unit) in keys:
+                self.ingredients[name, measurement_unit] = pk
+
+    def load_ingredients(self, keys):
+        missing = set(keys) - self.ingredients.keys()
+        if not missing:
+            return
+        self._find_ingredients(missing)
+        missing -= self.ingredients.keys()
+        if missing:
+            Ingredient.objects.insert_missing(sorted(missing))
+            self.catalogs_changed = True
+            self._find_ingredients(missing)
+
+
+class Command(BaseCommand):
+    """
+    Загрузка рецептов из NDJSON, выгруженного export_recipes, пакетами
+    bulk_create. Каждая пачка сохраняется в своей транзакции, номер
+    последней сохранённой строки пишется в файл контрольной точки,
+    с которой загрузка продолжается после перезапуска. Рецепты, которые
+    уже есть (тот же автор, название и дата публикации), пропускаются.
+    """
+    help = ('Загружает рецепты из NDJSON (по умолчанию из stdin), '
+            'с продолжением с контрольной точки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', nargs='?', default='-',
+            help='Файл NDJSON (для имён на .gz — сжатый), '
+                 'по умолчанию stdin.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Число рецептов в одной транзакции.'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл с номером последней загруженной строки.'
+        )
+        parser.add_argument(
+            '--default-author',
+            help='Автор для рецептов, автора которых нет в базе; '
+                 'без него такие рецепты пропускаются.'
+        )
+
+    def read_checkpoint(self, path):
+        if path is None or not os.path.exists(path):
+            return 0
+        with open(path) as file:
+            return int(file.read().strip() or 0)
+
+    def write_checkpoint(self, path, line):
+        if path is None:
+            return
+        temp_path = f'{path}.{uuid4().hex}.tmp'
+        with open(temp_path, 'w') as file:
+            file.write(str(line))
+        os.replace(temp_path, path)
+
+    def report(self, number, error, reason='invalid'):
+        self.stats[reason] += 1
+        if self.stats['invalid'] + self.stats['no_author'] <= MAX_REPORTED:
+            self.stderr.write(f'Строка {number}: {error}')
+
+    def records(self, lines, skip):
+        for number, line in enumerate(lines, 1):
+            if number <= skip or not line.strip():
+                continue
+            try:
+                yield number, parse(line)
+            except (ValueError, KeyError, TypeError) as error:
+                self.report(number, error)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        resolver = Resolver(options['default_author'])
+        skip = self.read_checkpoint(options['checkpoint'])
+        self.stats = dict.fromkeys(
+            ('created', 'existing', 'invalid', 'no_author'), 0
+        )
+        try:
+            file = open_input(options['path'])
+        except OSError as error:
+            raise CommandError(error)
+        with file:
+            records = self.records(file, skip)
+            batch = list(islice(records, options['batch_size']))
+            while batch:
+                with transaction.atomic():
+                    self.save_batch(batch, resolver)
+                self.write_checkpoint(options['checkpoint'], batch[-1][0])
+                self.stderr.write(
+                    f'Строка {batch[-1][0]}: загружено '
+                    f'{self.stats["created"]} '
+                    f'({time.perf_counter() - start:.1f} с)'
+                )
+                batch = list(islice(records, options['batch_size']))
+        self.invalidate(resolver)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено рецептов: {self.stats["created"]}, уже были: '
+            f'{self.stats["existing"]}, без автора: '
+            f'{self.stats["no_author"]}, с ошибками: '
+            f'{self.stats["invalid"]}, за '
+            f'{time.perf_counter() - start:.1f} с.'
+        ))
+
+    def save_batch(self, batch, resolver):
+        """Сохранение пачки рецептов с тегами и ингридиентами."""
+        resolver.load_authors(record['author'] for _, record in batch)
+        records = []
+        for number, record in batch:
+            record['author_id'] = resolver.author(record['author'])
+            if record['author_id'] is None:
+                self.report(
+                    number, f'нет автора {record["author"]}', 'no_author'
+                )
+                continue
+            records.append(record)
+        existing = set(Recipe.objects.filter(
+            author_id__in={record['author_id'] for record in records},
+            pub_date__in={record['pub_date'] for record in records}
+        ).values_list('author_id', 'name', 'pub_date'))
+        new = []
+        for record in records:
+            key = (record['author_id'], record['name'], record['pub_date'])
+            if key in existing:
+                self.stats['existing'] += 1
+                continue
+            existing.add(key)
+            new.append(record)
+        if not new:
+            return
+        tags, ingredients = {}, set()
+        for record in new:
+            tags.update(record['tags'])
+            ingredients.update(record['ingredients'])
+        resolver.load_tags(tags)
+        resolver.load_ingredients(ingredients)
+        now = timezone.now()
+        recipes = [
+            Recipe(
+                author_id=record['author_id'],
+                name=record['name'],
+                text=record['text'],
+                cooking_time=record['cooking_time'],
+                image=record['image'],
+                pub_date=record['pub_date'],
+                updated_at=now,
+                ingredient_names=' '.join(
+                    sorted(name for name, _ in record['ingredients'])
+                ),
+            )
+            for record in new
+        ]
+        self.insert_recipes(recipes)
+        IngredientInRecipe.objects.bulk_create([
+            IngredientInRecipe(
+                recipe_id=recipe.pk,
+                ingredient_id=resolver.ingredients[key],
+                amount=amount
+            )
+            for recipe, record in zip(recipes, new)
+            for key, amount in record['ingredients'].items()
+            if key in resolver.ingredients
+        ])
+        Recipe.tags.through.objects.bulk_create([
+            Recipe.tags.through(
+                recipe_id=recipe.pk, tag_id=resolver.tags[slug]
+            )
+            for recipe, record in zip(recipes, new)
+            for slug in record['tags'] if slug in resolver.tags
+        ])
+        by_delta = {}
+        for author_id, delta in Counter(
+            recipe.author_id for recipe in recipes
+        ).items():
+            by_delta.setdefault(delta, []).append(author_id)
+        for delta, author_ids in by_delta.items():
+            User.objects.filter(pk__in=author_ids).change_counter(
+                'recipes_count', delta
+            )
+        self.stats['created'] += len(recipes)
+
+    def insert_recipes(self, recipes):
+        """
+        Вставка рецептов с исходными датами публикации. Если база
+        возвращает id при bulk_create, рецепты вставляются одним
+        запросом, а даты, перезаписанные auto_now_add, возвращаются
+        вторым. Иначе рецепты сохраняются по одному, как в loaddata.
+        """
+        if not connection.features.can_return_ids_from_bulk_insert:
+            for recipe in recipes:
+                models.Model.save_base(recipe, raw=True)
+            return
+        pub_dates = [recipe.pub_date for recipe in recipes]
+        Recipe.objects.bulk_create(recipes)
+        for recipe, pub_date in zip(recipes, pub_dates):
+            recipe.pub_date = pub_date
+        Recipe.objects.bulk_update(recipes, ('pub_date', ))
+
+    def invalidate(self, resolver):
+        """
+        bulk_create не отправляет сигналы, поэтому кеш ответов, индекс
+        рецептов по ингридиентам и, если появились новые теги
+        и ингридиенты, их индекс и снимки справочников сбрасываются
+        здесь.
+        """
+        if resolver.catalogs_changed:
+            ingredient_index.invalidate()
+            catalogs.tag_catalog.invalidate()
+            catalogs.ingredient_catalog.invalidate()
+            catalogs.export_if_enabled()
+        if self.stats['created']:
+            recipe_ingredient_index.invalidate()
+            response_cache.invalidate()
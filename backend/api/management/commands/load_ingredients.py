@@ -0,0 +1,173 @@
+import csv
+import json
+import os
+import re
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from api import catalogs, response_cache
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Ingredient
+
+BATCH_SIZE = 5000
+JSON_CHUNK_SIZE = 64 * 1024
+MAX_REPORTED = 20
+CSV_HEADER = ['name', 'measurement_unit']
+SEPARATORS = re.compile(r'[\s,\[\]]*')
+
+
+def read_csv(file):
+    """Строки CSV вида название,единица; заголовок пропускается."""
+    for number, row in enumerate(csv.reader(file), 1):
+        if number == 1 and [cell.strip() for cell in row] == CSV_HEADER:
+            continue
+        if row:
+            yield number, row
+
+
+def read_json(file):
+    """
+    Объекты из JSON-массива или по одному в строке, прочитанные
+    по частям, без загрузки всего файла в память.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, number, eof = '', 0, 0, False
+    while True:
+        position = SEPARATORS.match(buffer, position).end()
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except ValueError:
+            if eof:
+                if position < len(buffer):
+                    raise CommandError(
+                        f'Неверный JSON после элемента {number}.'
+                    )
+                return
+            chunk = file.read(JSON_CHUNK_SIZE)
+            buffer, position, eof = buffer[position:] + chunk, 0, not chunk
+            continue
+        number += 1
+        position = end
+        if not isinstance(item, dict):
+            item = {}
+        yield number, [item.get('name'), item.get('measurement_unit')]
+
+
+READERS = {'.csv': read_csv, '.json': read_json, '.ndjson': read_json}
+
+
+MAX_LENGTHS = tuple(
+    Ingredient._meta.get_field(name).max_length
+    for name in ('name', 'measurement_unit')
+)
+
+
+def clean(row):
+    """Название и единица измерения из строки или None, если строка неверна."""
+    if len(row) != 2 or not all(isinstance(value, str) for value in row):
+        return None
+    row = tuple(value.strip() for value in row)
+    if not all(
+        0 < len(value) <= max_length
+        for value, max_length in zip(row, MAX_LENGTHS)
+    ):
+        return None
+    return row
+
+
+class Command(BaseCommand):
+    """
+    Загрузка справочника ингридиентов из CSV или JSON пакетными
+    INSERT без дублей по названию и единице измерения.
+    """
+    help = ('Загружает ингридиенты из CSV (название,единица) или JSON '
+            '(объекты name и measurement_unit), пропуская уже '
+            'существующие.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу .csv или .json.')
+        parser.add_argument(
+            '--format', choices=('csv', 'json'),
+            help='Формат файла, если его не видно по расширению.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=BATCH_SIZE,
+            help='Число ингридиентов в одном INSERT.'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только проверить файл и посчитать новые ингридиенты.'
+        )
+
+    def get_reader(self, options):
+        if options['format']:
+            return READERS['.' + options['format']]
+        extension = os.path.splitext(options['path'])[1].lower()
+        if extension not in READERS:
+            raise CommandError(
+                'Не удалось определить формат файла, укажите --format.'
+            )
+        return READERS[extension]
+
+    def rows(self, file, reader, stats):
+        """Новые ингридиенты из файла: без ошибок и без дублей."""
+        seen = set(Ingredient.objects.values_list(
+            'name', 'measurement_unit'
+        ).iterator())
+        for number, row in reader(file):
+            stats['read'] += 1
+            ingredient = clean(row)
+            if ingredient is None:
+                stats['invalid'] += 1
+                if stats['invalid'] <= MAX_REPORTED:
+                    self.stderr.write(
+                        f'Строка {number}: неверные данные {row}'
+                    )
+                continue
+            if ingredient in seen:
+                stats['duplicates'] += 1
+                continue
+            seen.add(ingredient)
+            yield ingredient
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        reader = self.get_reader(options)
+        stats = dict.fromkeys(('read', 'invalid', 'duplicates', 'created'), 0)
+        try:
+            file = open(options['path'], encoding='utf-8', newline='')
+        except OSError as error:
+            raise CommandError(error)
+        with file, transaction.atomic():
+            rows = self.rows(file, reader, stats)
+            batch = list(islice(rows, options['batch_size']))
+            while batch:
+                if not options['dry_run']:
+                    Ingredient.objects.insert_missing(batch)
+                stats['created'] += len(batch)
+                self.stdout.write(
+                    f'Прочитано {stats["read"]}, новых {stats["created"]} '
+                    f'({time.perf_counter() - start:.1f} с)'
+                )
+                batch = list(islice(rows, options['batch_size']))
+            if stats['created'] and not options['dry_run']:
+                transaction.on_commit(self.invalidate)
+        action = 'Будет добавлено' if options['dry_run'] else 'Добавлено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{action} ингридиентов: {stats["created"]} из {stats["read"]}, '
+            f'уже были: {stats["duplicates"]}, с ошибками: '
+            f'{stats["invalid"]}, за {time.perf_counter() - start:.1f} с.'
+        ))
+
+    def invalidate(self):
+        """
+        Пакетная вставка не отправляет сигналы, поэтому индекс, снимок
+        справочника и кеш ответов сбрасываются здесь.
+        """
+        ingredient_index.invalidate()
+        catalogs.ingredient_catalog.invalidate()
+        catalogs.export_if_enabled()
+        response_cache.invalidate()
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from api import response_cache
+
+
+class Command(BaseCommand):
+    """Счётчики и сброс кеша ответов на чтение рецептов."""
+    help = ('Показывает попадания и промахи кеша ответов, '
+            'сбрасывает счётчики или сам кеш.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--reset-stats', action='store_true',
+            help='Обнулить счётчики после вывода.'
+        )
+        parser.add_argument(
+            '--invalidate', action='store_true',
+            help='Сбросить все закешированные ответы.'
+        )
+
+    def handle(self, *args, **options):
+        stats = response_cache.get_stats()
+        requests = sum(stats.values())
+        hits = stats['hits'] + stats['waits']
+        for name, value in stats.items():
+            self.stdout.write(f'{name}: {value}')
+        if requests:
+            self.stdout.write(f'hit ratio: {hits / requests:.1%}')
+        if options['reset_stats']:
+            response_cache.reset_stats()
+            self.stdout.write('Счётчики обнулены.')
+        if options['invalidate']:
+            response_cache.invalidate()
+            self.stdout.write('Кеш ответов сброшен.')
@@ -1,7 +1,15 @@
-from django.shortcuts import get_object_or_404
+from functools import partial
+
+from django.db import transaction
 from rest_framework import mixins, viewsets, status
+from rest_framework.exceptions import ValidationError
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
 
+from . import conditional, response_cache
+from .paginators import KeysetPagination
+from .serializers import LinkIdsSerializer
+
 
 class ListRetriveViewSet(
     mixins.ListModelMixin,
@@ -14,29 +22,132 @@ class ListRetriveViewSet(
 
 class CreateAndDeleteMixin:
     """
-    Миксин для добавления и удаления подписки,
-    рецепта в избранное, рецепта в список покупок.
+    Миксин для добавления и удаления подписки, рецепта в избранное,
+    рецепта в список покупок: по одному объекту или пачкой. Связь
+    добавляется и удаляется одним запросом без предварительной проверки,
+    поэтому повторные и одновременные запросы не приводят к ошибкам
+    базы. Сообщения об ошибках берутся из словаря errors с ключами
+    exists, missing и unknown.
     """
-    def create_and_delete(self,
-                          pk,
-                          klass,
-                          field):
-        qs_obj = get_object_or_404(self.get_queryset(), pk=pk)
-        kwargs = {
-            'user': self.request.user,
-            field: qs_obj
-        }
+    def check_targets(self, target_ids):
+        """Метод для проверки id объектов перед добавлением связей."""
+        ...
+
+    def invalidate_responses(self):
+        """
+        Связи меняются без сохранения объектов модели и без сигналов,
+        поэтому кеш ответов пользователя сбрасывается здесь.
+        """
+        user_id = self.request.user.pk
+        transaction.on_commit(lambda: response_cache.invalidate(user_id))
+
+    def create_and_delete(self, pk, klass, errors):
+        user_id = self.request.user.pk
         if self.request.method == 'POST':
-            context = self.get_serializer_context()
-            serializer = self.get_serializer_class()(
-                qs_obj, data=kwargs, context=context
+            obj = get_object_or_404(self.get_queryset(), pk=pk)
+            self.check_targets([obj.pk])
+            if not klass.objects.add(user_id, [obj.pk]):
+                raise ValidationError({'errors': errors['exists']})
+            self.invalidate_responses()
+            return Response(
+                self.get_serializer(obj).data,
+                status=status.HTTP_201_CREATED
             )
-            serializer.is_valid(raise_exception=True)
-            klass.objects.create(**kwargs)
-            response = Response(
-                serializer.data,
-                status=status.HTTP_201_CREATED)
-        elif self.request.method == 'DELETE':
-            get_object_or_404(klass, **kwargs).delete()
-            response = Response(status=status.HTTP_204_NO_CONTENT)
-        return response
+        removed = []
+        if pk.isdecimal():
+            removed = klass.objects.remove(user_id, [int(pk)])
+        if not removed:
+            get_object_or_404(self.get_queryset(), pk=pk)
+            raise ValidationError({'errors': errors['missing']})
+        self.invalidate_responses()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def bulk_create_and_delete(self, klass, errors):
+        """
+        Добавление или удаление связей с объектами из списка ids.
+        Отвечает id объектов, связи с которыми изменились, и id тех,
+        с которыми связь уже была (или которых не было при удалении).
+        """
+        serializer = LinkIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = set(serializer.validated_data['ids'])
+        user_id = self.request.user.pk
+        if self.request.method == 'POST':
+            unknown = klass.objects.unknown_targets(ids)
+            if unknown:
+                raise ValidationError({'ids': errors['unknown'] + ', '.join(
+                    str(pk) for pk in unknown
+                )})
+            self.check_targets(ids)
+            changed = klass.objects.add(user_id, ids)
+            data = {'added': changed}
+            data['existing'] = sorted(ids - set(changed))
+        else:
+            changed = klass.objects.remove(user_id, ids)
+            data = {'removed': changed}
+            data['missing'] = sorted(ids - set(changed))
+        if changed:
+            self.invalidate_responses()
+        return Response(data)
+
+
+class CursorPaginationMixin:
+    """
+    Миксин для выбора пагинации: с параметром cursor список отдаётся
+    по курсору, без него — по номеру страницы. Действия из
+    cursor_actions отдаются только по курсору.
+    """
+    cursor_ordering = ('-id', )
+    cursor_actions = ()
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if (
+                'cursor' in self.request.query_params
+                or self.action in self.cursor_actions
+            ):
+                self._paginator = KeysetPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
+
+
+class CachedResponseMixin:
+    """Миксин для кеширования ответов списка и отдельного объекта."""
+    def list(self, request, *args, **kwargs):
+        return response_cache.cached(
+            request, partial(super().list, request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return response_cache.cached(
+            request, partial(super().retrieve, request, *args, **kwargs)
+        )
+
+
+class ConditionalGetMixin:
+    """
+    Миксин для ответа 304 на условные запросы списка и объекта.
+    Вьюсет возвращает пару (ETag, время изменения) из методов
+    get_list_validators и get_object_validators или None.
+    """
+    def get_list_validators(self, request):
+        return None
+
+    def get_object_validators(self, request):
+        return None
+
+    def list(self, request, *args, **kwargs):
+        return conditional.conditional(
+            request,
+            partial(self.get_list_validators, request),
+            partial(super().list, request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional.conditional(
+            request,
+            partial(self.get_object_validators, request),
+            partial(super().retrieve, request, *args, **kwargs)
+        )
@@ -1,6 +1,166 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+from functools import partial
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+PAGE_SIZE = 6
+MAX_PAGE_SIZE = 100
+
+
+class CountedPaginator(Paginator):
+    """Пагинатор Django с заранее посчитанным числом объектов."""
+    def __init__(self, *args, count=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.known_count = count
+
+    @cached_property
+    def count(self):
+        if self.known_count is not None:
+            return self.known_count
+        return super().count
 
 
 class LimitPageNumberPagination(PageNumberPagination):
-    """Пагинатор с параметром limit."""
+    """
+    Пагинатор с параметром limit. Если вьюсет уже посчитал объекты
+    (атрибут queryset_count), повторный COUNT(*) не выполняется.
+    """
+    page_size = PAGE_SIZE
     page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.django_paginator_class = partial(
+            CountedPaginator, count=getattr(view, 'queryset_count', None)
+        )
+        return super().paginate_queryset(queryset, request, view)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинатор по курсору: страница выбирается условием на поля
+    сортировки последнего объекта предыдущей страницы, без COUNT(*)
+    и OFFSET, поэтому любая страница стоит столько же, сколько первая.
+    Поля сортировки берутся из атрибута cursor_ordering вьюсета.
+    """
+    cursor_query_param = 'cursor'
+    page_size = PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    ordering = ('-id', )
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.ordering = getattr(view, 'cursor_ordering', self.ordering)
+        self.page_size = self.get_page_size(request)
+        position, self.reverse = self.decode_cursor(queryset, request)
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [self.invert(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(position))
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def keyset_filter(self, position):
+        """Условие «после позиции» для полей сортировки с учётом порядка."""
+        condition, equal = Q(), {}
+        for field, value in zip(self.ordering, position):
+            name = field.lstrip('-')
+            after = 'lt' if field.startswith('-') != self.reverse else 'gt'
+            condition |= Q(**equal, **{f'{name}__{after}': value})
+            equal[name] = value
+        return condition
+
+    def decode_cursor(self, queryset, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            data = json.loads(urlsafe_b64decode(cursor.encode()).decode())
+            values, reverse = data['p'], bool(data.get('r'))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            position = [
+                queryset.model._meta.get_field(
+                    field.lstrip('-')
+                ).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def get_cursor(self, obj, reverse=False):
+        """Метод для получения курсора на позицию объекта."""
+        values = []
+        for field in self.ordering:
+            value = getattr(obj, field.lstrip('-'))
+            values.append(
+                value.isoformat() if hasattr(value, 'isoformat') else value
+            )
+        data = {'p': values}
+        if reverse:
+            data['r'] = 1
+        return urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+    def encode_cursor(self, obj, reverse):
+        return replace_query_param(
+            self.base_url, self.cursor_query_param,
+            self.get_cursor(obj, reverse)
+        )
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return replace_query_param(
+                self.base_url, self.cursor_query_param, ''
+            )
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
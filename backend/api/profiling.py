@@ -0,0 +1,253 @@
+"""
+Профилирование запросов к API.
+
+ProfilingMiddleware замеряет у доли REQUEST_PROFILING_RATE запросов
+число и время запросов к базе (через connection.execute_wrapper), время
+сериализаторов (получение data и is_valid верхнего уровня), время
+рендеринга ответа и общее время. Замеры отдаются в заголовке
+Server-Timing и складываются в общий кеш по минутам для каждого
+действия вьюсета (например, RecipeViewSet.list); сводку за последние
+REQUEST_PROFILING_WINDOW минут администратор видит на
+/api/debug/profiling/.
+
+При REQUEST_PROFILING_RATE = 0 (по умолчанию) мидлварь отключается
+при загрузке (MiddlewareNotUsed), а сериализаторы не оборачиваются,
+поэтому выключенное профилирование ничего не стоит.
+"""
+import random
+import threading
+import time
+from contextlib import ExitStack
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+STATS_KEY = 'api:profiling:{}:{}:{}'
+VIEWS_KEY = 'api:profiling:views'
+METRICS = ('count', 'total', 'db', 'queries', 'serializer', 'render')
+BUCKET_SECONDS = 60
+
+_local = threading.local()
+_instrument_lock = threading.Lock()
+_instrumented = False
+_registered = {}
+
+
+class Profile:
+    """Замеры одного запроса, времена в секундах."""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.total = 0
+        self.db = 0
+        self.queries = 0
+        self.serializer = 0
+        self.serializer_depth = 0
+        self.render = 0
+        self.render_start = None
+
+    def execute(self, execute, sql, params, many, context):
+        """Обёртка запросов к базе для connection.execute_wrapper."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - start
+            self.queries += 1
+
+    def start_render(self):
+        self.render_start = time.perf_counter()
+
+    def finish_render(self, response):
+        self.render += time.perf_counter() - self.render_start
+
+    def finish(self):
+        self.total = time.perf_counter() - self.start
+
+    def header(self):
+        """Значение заголовка Server-Timing."""
+        return ', '.join((
+            f'db;dur={self.db * 1000:.1f};desc="{self.queries} queries"',
+            f'serializer;dur={self.serializer * 1000:.1f}',
+            f'render;dur={self.render * 1000:.1f}',
+            f'total;dur={self.total * 1000:.1f}',
+        ))
+
+    def values(self):
+        """Замеры для сводки: времена в микросекундах."""
+        return {
+            'count': 1,
+            'total': int(self.total * 1e6),
+            'db': int(self.db * 1e6),
+            'queries': self.queries,
+            'serializer': int(self.serializer * 1e6),
+            'render': int(self.render * 1e6),
+        }
+
+
+def _timed(method):
+    """
+    Учёт времени сериализатора в профиле текущего запроса. Вложенные
+    сериализаторы входят во время внешнего и отдельно не считаются.
+    """
+    @wraps(method)
+    def wrapper(*args, **kwargs):
+        profile = getattr(_local, 'profile', None)
+        if profile is None:
+            return method(*args, **kwargs)
+        start = time.perf_counter()
+        profile.serializer_depth += 1
+        try:
+            return method(*args, **kwargs)
+        finally:
+            profile.serializer_depth -= 1
+            if not profile.serializer_depth:
+                profile.serializer += time.perf_counter() - start
+    return wrapper
+
+
+def instrument_serializers():
+    """Обёртка data и is_valid сериализаторов DRF, один раз за процесс."""
+    global _instrumented
+    with _instrument_lock:
+        if _instrumented:
+            return
+        BaseSerializer.data = property(_timed(BaseSerializer.data.fget))
+        BaseSerializer.is_valid = _timed(BaseSerializer.is_valid)
+        _instrumented = True
+
+
+def get_view_name(request):
+    """
+    Имя действия для сводки: вьюсет и действие, для других
+    представлений — имя маршрута. None, если адрес не найден.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None
+    view = match.func
+    actions = getattr(view, 'actions', None)
+    if actions is not None:
+        action = actions.get(request.method.lower(), request.method.lower())
+        return f'{view.cls.__name__}.{action}'
+    if hasattr(view, 'cls'):
+        return f'{view.cls.__name__}.{request.method.lower()}'
+    return match.view_name
+
+
+def _bucket(now=None):
+    return int((now or time.time()) // BUCKET_SECONDS)
+
+
+def _register(view, bucket):
+    """
+    Добавление view в общий список действий. Каждый процесс проверяет
+    список раз в минуту, поэтому имя, потерянное при одновременной
+    записи, возвращается.
+    """
+    if _registered.get(view) == bucket:
+        return
+    views = cache.get(VIEWS_KEY) or set()
+    if view not in views:
+        cache.set(VIEWS_KEY, views | {view}, None)
+    _registered[view] = bucket
+
+
+def record(view, profile):
+    """Добавление замеров запроса в сводку текущей минуты."""
+    bucket = _bucket()
+    _register(view, bucket)
+    timeout = (settings.REQUEST_PROFILING_WINDOW + 1) * BUCKET_SECONDS
+    for metric, value in profile.values().items():
+        key = STATS_KEY.format(bucket, view, metric)
+        if cache.add(key, value, timeout):
+            continue
+        try:
+            cache.incr(key, value)
+        except ValueError:
+            cache.add(key, value, timeout)
+
+
+def get_stats():
+    """
+    Сводка за последние REQUEST_PROFILING_WINDOW минут: по каждому
+    действию число замеренных запросов и средние времена в мс,
+    от действия с наибольшим суммарным временем.
+    """
+    window = settings.REQUEST_PROFILING_WINDOW
+    current = _bucket()
+    views = sorted(cache.get(VIEWS_KEY) or ())
+    keys = [
+        STATS_KEY.format(bucket, view, metric)
+        for bucket in range(current - window + 1, current + 1)
+        for view in views
+        for metric in METRICS
+    ]
+    values = cache.get_many(keys)
+    stats = []
+    for view in views:
+        sums = dict.fromkeys(METRICS, 0)
+        for bucket in range(current - window + 1, current + 1):
+            for metric in METRICS:
+                sums[metric] += values.get(
+                    STATS_KEY.format(bucket, view, metric), 0
+                )
+        count = sums.pop('count')
+        if not count:
+            continue
+        stats.append({
+            'view': view,
+            'count': count,
+            'total_ms': round(sums['total'] / count / 1000, 1),
+            'db_ms': round(sums['db'] / count / 1000, 1),
+            'queries': round(sums['queries'] / count, 1),
+            'serializer_ms': round(sums['serializer'] / count / 1000, 1),
+            'render_ms': round(sums['render'] / count / 1000, 1),
+            'total_sum_ms': round(sums['total'] / 1000),
+        })
+    stats.sort(key=lambda item: item['total_sum_ms'], reverse=True)
+    return {
+        'sample_rate': settings.REQUEST_PROFILING_RATE,
+        'window_minutes': window,
+        'views': stats,
+    }
+
+
+class ProfilingMiddleware:
+    """Мидлварь профилирования доли REQUEST_PROFILING_RATE запросов."""
+    def __init__(self, get_response):
+        if not settings.REQUEST_PROFILING_RATE:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        instrument_serializers()
+
+    def __call__(self, request):
+        if random.random() >= settings.REQUEST_PROFILING_RATE:
+            return self.get_response(request)
+        profile = _local.profile = Profile()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(profile.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            _local.profile = None
+        profile.finish()
+        response['Server-Timing'] = profile.header()
+        view = get_view_name(request)
+        if view is not None:
+            record(view, profile)
+        return response
+
+    def process_template_response(self, request, response):
+        """Замер рендеринга ответов DRF, которые рендерятся после view."""
+        profile = getattr(_local, 'profile', None)
+        if profile is not None:
+            profile.start_render()
+            response.add_post_render_callback(profile.finish_render)
+        return response
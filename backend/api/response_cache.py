@@ -0,0 +1,185 @@
+"""
+Кеш ответов на чтение рецептов.
+
+В кеше хранятся данные ответа (до рендеринга), ключ строится по адресу
+запроса с упорядоченными параметрами. В ключ входит поколение: при
+изменении рецептов, тегов, ингридиентов или авторов поколение меняется,
+и старые ответы перестают находиться, а затем истекают сами. Для
+пользователей (RESPONSE_CACHE_AUTHENTICATED) есть ещё личное поколение,
+которое меняется вместе с его избранным, списком покупок и подписками.
+
+Пока один запрос считает ответ, остальные с тем же ключом ждут его
+результата, а не считают ответ сами; если ответ не попал в кеш (не 200),
+ожидание прекращается, как только снята блокировка. Бэкенд задаётся
+в CACHES под именем RESPONSE_CACHE_ALIAS. Поколения, ответы и счётчики
+должны быть общими для всех воркеров и команд manage.py, поэтому кеш
+по умолчанию файловый (подойдёт и RedisCache из core.cache), а кеш
+в памяти процесса не пропускает проверка core.stamps.check_shared_caches.
+"""
+import time
+from hashlib import sha1
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from core.stamps import bump_stamp, get_stamp
+
+GENERATION_KEY = 'api:response:generation'
+USER_GENERATION_KEY = 'api:response:generation:{}'
+STATS_KEY = 'api:response:stats:{}'
+STATS = ('hits', 'misses', 'waits')
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified')
+LOCK_TIMEOUT = 10
+WAIT_TIMEOUT = 2
+WAIT_INTERVAL = 0.02
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def is_cacheable(request):
+    """Кешируются ответы анонимам и, если включено, пользователям."""
+    if request.method != 'GET':
+        return False
+    return (
+        request.user.is_anonymous
+        or settings.RESPONSE_CACHE_AUTHENTICATED
+    )
+
+
+def get_generations(request):
+    """Общее поколение и, для пользователя, его личное поколение."""
+    cache = get_cache()
+    generations = [get_stamp(GENERATION_KEY, cache)]
+    if request.user.is_authenticated:
+        generations.append(get_stamp(
+            USER_GENERATION_KEY.format(request.user.pk), cache
+        ))
+    return generations
+
+
+def get_key(request):
+    """Ключ ответа: поколения и адрес с упорядоченными параметрами."""
+    parts = get_generations(request)
+    query = urlencode(sorted(
+        (name, value)
+        for name, values in request.query_params.lists()
+        for value in values
+    ))
+    url = request.build_absolute_uri(request.path)
+    parts.append(sha1(f'{url}?{query}'.encode()).hexdigest())
+    return 'api:response:' + ':'.join(parts)
+
+
+def invalidate(user_id=None):
+    """Смена поколения: общего или только для пользователя user_id."""
+    key = GENERATION_KEY
+    if user_id is not None:
+        key = USER_GENERATION_KEY.format(user_id)
+    bump_stamp(key, get_cache())
+
+
+def _count(cache, name):
+    key = STATS_KEY.format(name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def get_stats():
+    """Счётчики попаданий, промахов и ожиданий чужого расчёта."""
+    cache = get_cache()
+    return {
+        name: cache.get(STATS_KEY.format(name)) or 0 for name in STATS
+    }
+
+
+def reset_stats():
+    cache = get_cache()
+    for name in STATS:
+        cache.delete(STATS_KEY.format(name))
+
+
+def _wait(cache, key, lock_key):
+    """
+    Ожидание ответа, который считает другой запрос. Если блокировка
+    снята, а ответа в кеше нет, ждать больше нечего.
+    """
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        data = cache.get(key)
+        if data is not None:
+            return data
+        if cache.get(lock_key) is None:
+            return cache.get(key)
+    return None
+
+
+def _respond(request, entry):
+    """
+    Ответ из записи кеша. Если в записи есть валидаторы и клиент
+    прислал совпадающие, отдаётся 304.
+    """
+    data, headers = entry
+    headers = dict(headers, **{'X-Cache': 'HIT'})
+    if 'ETag' in headers or 'Last-Modified' in headers:
+        last_modified = headers.get('Last-Modified')
+        response = get_conditional_response(
+            request,
+            etag=headers.get('ETag'),
+            last_modified=last_modified and parse_http_date(last_modified)
+        )
+        if response is not None:
+            for name, value in headers.items():
+                response[name] = value
+            return response
+    return Response(data, headers=headers)
+
+
+def cached(request, compute):
+    """
+    Ответ из кеша или результат compute(), который сохраняется в кеш
+    вместе с ETag и Last-Modified, если это успешный ответ.
+    Заголовок X-Cache показывает, откуда ответ.
+    """
+    if not is_cacheable(request):
+        return compute()
+    cache = get_cache()
+    key = get_key(request)
+    entry = cache.get(key)
+    if entry is not None:
+        _count(cache, 'hits')
+        return _respond(request, entry)
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, LOCK_TIMEOUT):
+        entry = _wait(cache, key, lock_key)
+        if entry is not None:
+            _count(cache, 'waits')
+            return _respond(request, entry)
+        lock_key = None
+    _count(cache, 'misses')
+    try:
+        response = compute()
+        if response.status_code == status.HTTP_200_OK:
+            headers = {
+                name: response[name] for name in VALIDATOR_HEADERS
+                if response.has_header(name)
+            }
+            cache.set(
+                key, (response.data, headers),
+                settings.RESPONSE_CACHE_TIMEOUT
+            )
+    finally:
+        if lock_key:
+            cache.delete(lock_key)
+    response['X-Cache'] = 'MISS'
+    return response
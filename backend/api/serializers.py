@@ -1,21 +1,23 @@
-import base64
-
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import UploadedFile
 from django.contrib.auth.password_validation import validate_password
 from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from djoser.serializers import UserSerializer, UserCreateSerializer
-from django.shortcuts import get_object_or_404
 
 from rest_framework import serializers
 
-from recipes.models import (Tag, Recipe, FavoriteRecipes,
-                            ShoppingCart, Ingredient,
-                            IngredientInRecipe)
+from . import images
+from recipes import image_variants
+from recipes.models import Tag, Recipe, Ingredient, IngredientInRecipe
 from users.models import Follow
 
 User = get_user_model()
 
+LINK_IDS_MAX_LENGTH = 100
+
 
 class CreateUserSerializer(UserCreateSerializer):
     """Сериализатор для создания пользователя."""
@@ -52,6 +54,8 @@ class CustomUserSerializer(UserSerializer):
     is_subscribed = serializers.SerializerMethodField()
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
         request = self.context.get('request')
         if request.user.is_authenticated:
             return Follow.objects.filter(
@@ -96,23 +100,56 @@ class SetPasswordSerializer(serializers.Serializer):
         return validated_data
 
 
+class ImageVariantsField(serializers.Field):
+    """
+    Копии изображения рецепта разной ширины: src в JPEG и webp,
+    а также srcset для каждого формата. Пока копии не построены,
+    src указывает на исходное изображение, а webp и srcset пустые.
+    """
+    def __init__(self, **kwargs):
+        kwargs.update(source='*', read_only=True)
+        super().__init__(**kwargs)
+
+    def get_url(self, name):
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def to_representation(self, recipe):
+        if not recipe.image:
+            return None
+        if not recipe.has_image_variants:
+            src = self.get_url(recipe.image.name)
+            data = {
+                variant: {'width': None, 'src': src, 'webp': None}
+                for variant, _ in settings.RECIPE_IMAGE_VARIANTS
+            }
+            data['srcset'] = None
+            return data
+        data, srcset, widths = {}, {'src': [], 'webp': []}, set()
+        for variant, width, source in image_variants.variant_widths(
+            recipe.image_width
+        ):
+            urls = {
+                key: self.get_url(image_variants.variant_name(
+                    recipe.image.name, source, extension
+                ))
+                for key, extension in (('src', 'jpg'), ('webp', 'webp'))
+            }
+            data[variant] = dict(urls, width=width)
+            if width not in widths:
+                widths.add(width)
+                for key, url in urls.items():
+                    srcset[key].append(f'{url} {width}w')
+        data['srcset'] = {
+            key: ', '.join(items) for key, items in srcset.items()
+        }
+        return data
+
+
 class RecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для работы с избранным и списком покупок."""
-    def validate_is_favorited(self, attrs):
-        recipe = self.instance
-        user = self.context.get('request').user
-        if FavoriteRecipes.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError(
-                {'errors': 'Вы уже добавили этот рецепт в избранное!'})
-        return attrs
-
-    def validateis_in_shopping_cart(self, attrs):
-        recipe = self.instance
-        user = self.context.get('request').user
-        if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError(
-                {'errors': 'Вы уже добавили этот рецепт в список покупок!'})
-        return attrs
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
@@ -120,6 +157,7 @@ class RecipeSerializer(serializers.ModelSerializer):
             'id',
             'name',
             'image',
+            'image_variants',
             'cooking_time'
         )
         read_only_fields = (
@@ -135,23 +173,14 @@ class SubscribeSerializer(CustomUserSerializer):
     recipes = serializers.SerializerMethodField()
     recipes_count = serializers.IntegerField(read_only=True)
 
-    def validate(self, attrs):
-        author = self.instance
-        user = self.context.get('request').user
-        if Follow.objects.filter(author=author, user=user).exists():
-            raise serializers.ValidationError(
-                {'errors': 'Вы уже подписаны на этого пользователя!'})
-        if user == author:
-            raise serializers.ValidationError(
-                {'errors': 'Вы не можете подписаться на самого себя!'})
-        return attrs
-
     def get_recipes(self, author):
-        request = self.context.get('request')
-        recipes = author.recipes.all()
-        if 'recipes_limit' in request.GET:
-            recipes_limit = request.GET.get('recipes_limit')
-            recipes = recipes[:int(recipes_limit)]
+        if hasattr(author, 'latest_recipes'):
+            recipes = author.latest_recipes
+        else:
+            recipes = author.recipes.all()
+            recipes_limit = self.context.get('recipes_limit')
+            if recipes_limit is not None:
+                recipes = recipes[:recipes_limit]
         serializer = RecipeSerializer(recipes, many=True, read_only=True)
         return serializer.data
 
@@ -162,13 +191,28 @@ class SubscribeSerializer(CustomUserSerializer):
         )
 
 
+class LinkIdsSerializer(serializers.Serializer):
+    """
+    Сериализатор списка id рецептов или авторов для добавления
+    и удаления пачкой.
+    """
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=LINK_IDS_MAX_LENGTH
+    )
+
+
 class Base64ImageField(serializers.ImageField):
-    """Поле сериализатора для изображений."""
+    """
+    Поле сериализатора для изображений: файл из multipart/form-data
+    или строка data:image/...;base64 в JSON.
+    """
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = images.decode_base64(data)
+        if isinstance(data, UploadedFile):
+            data = images.check_image(data)
         return super().to_internal_value(data)
 
 
@@ -237,6 +281,12 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
     is_favorited = serializers.BooleanField(read_only=True)
     is_in_shopping_cart = serializers.BooleanField(read_only=True)
     image = Base64ImageField()
+    image_variants = ImageVariantsField()
+
+    def to_representation(self, instance):
+        if hasattr(instance, 'is_subscribed'):
+            instance.author.is_subscribed = instance.is_subscribed
+        return super().to_representation(instance)
 
     class Meta:
         model = Recipe
@@ -249,6 +299,7 @@ class ReadRecipeSerializer(serializers.ModelSerializer):
             'is_in_shopping_cart',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time'
         )
@@ -281,23 +332,44 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {'ingredients': 'Ингредиенты не должны повторяться!'}
             )
+        unknown = ingredients_set - Ingredient.objects.in_bulk(
+            ingredients_set
+        ).keys()
+        if unknown:
+            raise serializers.ValidationError({'ingredients': (
+                'Ингредиенты не найдены: '
+                + ', '.join(str(pk) for pk in sorted(unknown))
+            )})
         attrs.update({
             'author': self.context.get('request').user
         })
         return attrs
 
     def create_ingredients(self, recipe, ingredients):
-        """Метод для добавления ингридиентов в рецепт."""
-        create_ingredients = [
+        """
+        Метод для добавления ингридиентов в рецепт. Ингридиенты уже
+        проверены в validate, поэтому объекты создаются по id.
+        """
+        IngredientInRecipe.objects.bulk_create([
             IngredientInRecipe(
                 recipe=recipe,
-                ingredient=get_object_or_404(
-                    Ingredient, pk=ingredient.get('id')),
+                ingredient_id=ingredient.get('id'),
                 amount=ingredient.get('amount')
             )
             for ingredient in ingredients
-        ]
-        IngredientInRecipe.objects.bulk_create(create_ingredients)
+        ])
+
+    def save(self, **kwargs):
+        """
+        Сохранение рецепта. Временный файл изображения закрывается
+        сразу после того, как хранилище его забрало.
+        """
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
 
     @transaction.atomic
     def create(self, validated_data):
@@ -306,6 +378,7 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(recipe, ingredients)
+        recipe.update_ingredient_names()
         return recipe
 
     @transaction.atomic
@@ -318,9 +391,10 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
             instance.cooking_time
         )
         if 'ingredients' in validated_data:
-            ingredients = validated_data.pop('ingredients')
-            instance.ingredients.clear()
-            self.create_ingredients(instance, ingredients)
+            instance.set_ingredients({
+                ingredient.get('id'): ingredient.get('amount')
+                for ingredient in validated_data.pop('ingredients')
+            })
         if 'tags' in validated_data:
             tags = validated_data.pop('tags')
             instance.tags.set(tags)
@@ -328,6 +402,20 @@ class CreateRecipeSerializer(serializers.ModelSerializer):
         return instance
 
     def to_representation(self, instance):
+        """
+        Ответ с рецептом: теги и ингридиенты загружаются двумя
+        запросами, а не по запросу на каждый ингридиент.
+        """
+        prefetch_related_objects(
+            [instance],
+            'tags',
+            Prefetch(
+                'recipe',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                )
+            )
+        )
         return ReadRecipeSerializer(
             instance,
             context=self.context
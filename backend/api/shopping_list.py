@@ -0,0 +1,215 @@
+"""
+Выгрузка списка покупок в разных форматах.
+
+Строки списка читаются из таблицы ShoppingListItem итератором и сразу
+отдаются клиенту, поэтому размер списка покупок не влияет на память
+воркера. Ингридиенты сгруппированы по единицам измерения. ETag — хеш
+содержимого списка, повторное скачивание неизменённого списка
+отвечает 304.
+"""
+import csv
+import hashlib
+import json
+from itertools import groupby
+
+from recipes.models import ShoppingListItem
+
+TITLE = 'Список покупок'
+CHUNK_SIZE = 2000
+
+PDF_PAGE_WIDTH = 595
+PDF_PAGE_HEIGHT = 842
+PDF_MARGIN = 50
+PDF_FONT_SIZE = 11
+PDF_TITLE_FONT_SIZE = 16
+PDF_LEADING = 16
+PDF_LINES_PER_PAGE = (PDF_PAGE_HEIGHT - 2 * PDF_MARGIN) // PDF_LEADING
+PDF_ENCODING = 'cp1251'
+
+
+def _cyrillic_glyph(char):
+    """Имя глифа кириллической буквы по Adobe Glyph List."""
+    if char == 'Ё':
+        return 'afii10023'
+    if char == 'ё':
+        return 'afii10071'
+    index = (ord(char) - ord('А')) % 32
+    base = 10017 if char.isupper() else 10065
+    return f'afii{base + index + (index >= 6)}'
+
+
+PDF_DIFFERENCES = ' '.join(
+    f'{char.encode(PDF_ENCODING)[0]} /{_cyrillic_glyph(char)}'
+    for char in 'ЁёАБВГДЕЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯ'
+                'абвгдежзийклмнопрстуфхцчшщъыьэюя'
+)
+
+
+def get_rows(user_id):
+    """Строки списка покупок: единица измерения, название, количество."""
+    return ShoppingListItem.objects.for_user(user_id).iterator(
+        chunk_size=CHUNK_SIZE
+    )
+
+
+def get_etag(user_id, file_format):
+    """Хеш содержимого списка покупок пользователя для заданного формата."""
+    digest = hashlib.sha1(file_format.encode())
+    for row in get_rows(user_id):
+        digest.update(json.dumps(row, ensure_ascii=False).encode())
+    return digest.hexdigest()
+
+
+def _group(rows):
+    for unit, items in groupby(rows, key=lambda row: row[0]):
+        yield unit, ((name, total) for _, name, total in items)
+
+
+def render_txt(rows):
+    yield f'{TITLE}\n'
+    for unit, items in _group(rows):
+        yield f'\n{unit}:\n'
+        for name, total in items:
+            yield f'{name} - {total}\n'
+
+
+class _Echo:
+    """Буфер для csv.writer, который возвращает записанную строку."""
+    def write(self, value):
+        return value
+
+
+def render_csv(rows):
+    writer = csv.writer(_Echo())
+    yield '\ufeff'
+    yield writer.writerow(('name', 'measurement_unit', 'amount'))
+    for unit, name, total in rows:
+        yield writer.writerow((name, unit, total))
+
+
+def render_json(rows):
+    yield '['
+    for index, (unit, items) in enumerate(_group(rows)):
+        ingredients = ', '.join(
+            json.dumps({'name': name, 'amount': total}, ensure_ascii=False)
+            for name, total in items
+        )
+        separator = ', ' if index else ''
+        unit = json.dumps(unit, ensure_ascii=False)
+        yield (f'{separator}{{"measurement_unit": {unit}, '
+               f'"ingredients": [{ingredients}]}}')
+    yield ']'
+
+
+def _pdf_lines(rows):
+    yield 'F2', PDF_TITLE_FONT_SIZE, TITLE
+    for unit, items in _group(rows):
+        yield 'F2', PDF_FONT_SIZE, f'{unit}:'
+        for name, total in items:
+            yield 'F1', PDF_FONT_SIZE, f'    {name} - {total}'
+
+
+def _pdf_text(value):
+    value = value.encode(PDF_ENCODING, errors='replace')
+    return value.replace(b'\\', b'\\\\').replace(
+        b'(', b'\\('
+    ).replace(b')', b'\\)')
+
+
+class _PdfWriter:
+    """Запись объектов PDF с учётом их смещений для таблицы xref."""
+    def __init__(self):
+        self.offsets = []
+        self.size = 0
+
+    def write(self, data):
+        self.size += len(data)
+        return data
+
+    def reserve(self):
+        """Номер объекта, который будет записан позже."""
+        self.offsets.append(None)
+        return len(self.offsets)
+
+    def object(self, body, stream=None, number=None):
+        if number is None:
+            number = self.reserve()
+        self.offsets[number - 1] = self.size
+        data = b'%d 0 obj\n' % number + body
+        if stream is not None:
+            data += b'\nstream\n' + stream + b'\nendstream'
+        return self.write(data + b'\nendobj\n')
+
+    def page(self, pages, fonts, lines):
+        content = [b'BT']
+        y = PDF_PAGE_HEIGHT - PDF_MARGIN
+        for font, size, text in lines:
+            content.append(
+                b'/%s %d Tf 1 0 0 1 %d %d Tm (%s) Tj'
+                % (font.encode(), size, PDF_MARGIN, y, _pdf_text(text))
+            )
+            y -= PDF_LEADING
+        content.append(b'ET')
+        content = b'\n'.join(content)
+        data = self.object(b'<< /Length %d >>' % len(content), content)
+        number = self.reserve()
+        pages.append(number)
+        return data + self.object(
+            b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] '
+            b'/Resources << /Font << /F1 %d 0 R /F2 %d 0 R >> >> '
+            b'/Contents %d 0 R >>'
+            % (PDF_PAGE_WIDTH, PDF_PAGE_HEIGHT, *fonts, number - 1),
+            number=number
+        )
+
+    def trailer(self):
+        xref = [b'xref\n0 %d\n0000000000 65535 f \n'
+                % (len(self.offsets) + 1)]
+        xref.extend(b'%010d 00000 n \n' % offset for offset in self.offsets)
+        return b''.join(xref) + (
+            b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%EOF\n'
+            % (len(self.offsets) + 1, self.size)
+        )
+
+
+def render_pdf(rows):
+    """
+    Простой PDF со стандартными шрифтами Helvetica и кириллической
+    кодировкой. Страницы пишутся по мере заполнения, каталог страниц
+    и таблица смещений — в конце файла.
+    """
+    writer = _PdfWriter()
+    yield writer.write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+    yield writer.object(b'<< /Type /Catalog /Pages 2 0 R >>')
+    pages_number = writer.reserve()
+    fonts = []
+    for font in (b'Helvetica', b'Helvetica-Bold'):
+        yield writer.object(
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /%s '
+            b'/Encoding << /Type /Encoding /BaseEncoding /WinAnsiEncoding '
+            b'/Differences [%s] >> >>' % (font, PDF_DIFFERENCES.encode())
+        )
+        fonts.append(len(writer.offsets))
+    pages, lines = [], []
+    for line in _pdf_lines(rows):
+        lines.append(line)
+        if len(lines) == PDF_LINES_PER_PAGE:
+            yield writer.page(pages, fonts, lines)
+            lines = []
+    if lines or not pages:
+        yield writer.page(pages, fonts, lines)
+    yield writer.object(
+        b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            b' '.join(b'%d 0 R' % page for page in pages), len(pages)
+        ),
+        number=pages_number
+    )
+    yield writer.trailer()
+
+
+FORMATS = {
+    'txt': ('text/plain; charset=utf-8', render_txt),
+    'csv': ('text/csv; charset=utf-8', render_csv),
+    'json': ('application/json', render_json),
+    'pdf': ('application/pdf', render_pdf),
+}
@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from recipes.models import (FavoriteRecipes, Ingredient, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow, User
+from . import catalogs, response_cache
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=Tag)
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_recipe_responses(**kwargs):
+    """
+    Сброс кеша ответов после изменения рецептов и справочников.
+    Теги и ингридиенты рецепта меняются вместе с сохранением
+    самого рецепта, поэтому отдельные сигналы для них не нужны.
+    """
+    transaction.on_commit(response_cache.invalidate)
+
+
+@receiver((post_save, post_delete), sender=User)
+def invalidate_author_responses(update_fields=None, **kwargs):
+    """
+    Сброс кеша ответов после изменения пользователя, кроме записи
+    времени последнего входа.
+    """
+    if update_fields is None or set(update_fields) - {'last_login'}:
+        transaction.on_commit(response_cache.invalidate)
+
+
+@receiver((post_save, post_delete), sender=FavoriteRecipes)
+@receiver((post_save, post_delete), sender=ShoppingCart)
+@receiver((post_save, post_delete), sender=Follow)
+def invalidate_user_responses(instance, **kwargs):
+    """
+    Сброс кеша ответов пользователя после изменения его избранного,
+    списка покупок или подписок.
+    """
+    transaction.on_commit(
+        lambda: response_cache.invalidate(instance.user_id)
+    )
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def invalidate_tag_catalog(**kwargs):
+    """Пересборка снимка тегов после изменения справочника."""
+    transaction.on_commit(catalogs.tag_catalog.invalidate)
+    transaction.on_commit(catalogs.export_if_enabled)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_catalog(**kwargs):
+    """Пересборка снимка ингридиентов после изменения справочника."""
+    transaction.on_commit(catalogs.ingredient_catalog.invalidate)
+    transaction.on_commit(catalogs.export_if_enabled)
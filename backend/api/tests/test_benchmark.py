@@ -0,0 +1,18 @@
+from django.test import SimpleTestCase
+
+from api.benchmark import _percentile
+
+
+class PercentileTest(SimpleTestCase):
+    """Процентили замеров по ближайшему рангу."""
+    def test_nearest_rank(self):
+        values = list(range(20, 0, -1))
+        self.assertEqual(_percentile(values, 50), 10)
+        self.assertEqual(_percentile(values, 95), 19)
+        self.assertEqual(_percentile(values, 100), 20)
+        self.assertEqual(_percentile(values, 0), 1)
+
+    def test_few_values(self):
+        self.assertEqual(_percentile([7], 95), 7)
+        self.assertEqual(_percentile([3, 1], 50), 1)
+        self.assertEqual(_percentile([3, 1], 95), 3)
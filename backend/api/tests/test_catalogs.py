@@ -0,0 +1,30 @@
+import json
+
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from api.catalogs import Catalog, load_tags
+from recipes.models import Tag
+from .test_query_budget import LOCMEM_CACHES
+
+
+@override_settings(CACHES=LOCMEM_CACHES, CATALOG_CHECK_INTERVAL=0)
+class CatalogTest(TestCase):
+    """
+    Снимок тегов в двух процессах: общий кеш меток здесь один
+    LocMemCache на оба экземпляра справочника.
+    """
+    def setUp(self):
+        caches['stamps'].clear()
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+
+    def test_invalidate_reaches_other_catalog(self):
+        first, second = Catalog('tags', load_tags), Catalog('tags', load_tags)
+        self.assertEqual(len(json.loads(second.snapshot().body)), 1)
+        Tag.objects.create(name='Обед', color='#49B64E', slug='lunch')
+        self.assertEqual(len(json.loads(second.snapshot().body)), 1)
+        first.invalidate()
+        self.assertEqual(len(json.loads(second.snapshot().body)), 2)
+        self.assertEqual(
+            first.snapshot().version, second.snapshot().version
+        )
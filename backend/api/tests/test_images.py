@@ -0,0 +1,45 @@
+from base64 import b64encode, encodebytes
+from io import BytesIO
+from unittest import mock
+
+from django.test import SimpleTestCase
+from PIL import Image
+from rest_framework import serializers
+
+from api.images import decode_base64
+
+
+def make_png():
+    buffer = BytesIO()
+    Image.new('RGB', (40, 30), '#E26C2D').save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+class DecodeBase64Test(SimpleTestCase):
+    """Декодирование изображения из строки data:image/...;base64."""
+    png = make_png()
+
+    def decode(self, encoded):
+        upload = decode_base64('data:image/png;base64,' + encoded)
+        self.assertEqual(upload.size, len(self.png))
+        self.assertEqual(upload.read(), self.png)
+
+    def test_plain(self):
+        self.decode(b64encode(self.png).decode())
+
+    def test_line_wrapped(self):
+        for chunk_size in (7, 64 * 1024):
+            with self.subTest(chunk_size=chunk_size), mock.patch(
+                'api.images.CHUNK_SIZE', chunk_size
+            ):
+                self.decode(encodebytes(self.png).decode())
+                self.decode(
+                    ' \r\n'.join(encodebytes(self.png).decode().split())
+                )
+
+    def test_invalid(self):
+        encoded = b64encode(self.png).decode()
+        for data in (encoded[:-1], encoded[:10] + '*' + encoded[10:]):
+            with self.subTest(data=data[:20]):
+                with self.assertRaises(serializers.ValidationError):
+                    decode_base64('data:image/png;base64,' + data)
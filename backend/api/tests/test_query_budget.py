@@ -0,0 +1,159 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import (Ingredient, Recipe, ShoppingCart, Tag,
+                            ShoppingListItem)
+from users.models import Follow
+
+User = get_user_model()
+
+LOCMEM_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': f'tests-{alias}'}
+    for alias in ('default', 'stamps', 'responses')
+}
+LIST_QUERIES = 4
+DETAIL_QUERIES = 4
+SUBSCRIPTIONS_QUERIES = 3
+SHOPPING_LIST_QUERIES = 2
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryBudgetTest(TestCase):
+    """
+    Число запросов к базе на основных эндпоинтах чтения не зависит
+    от числа рецептов, тегов, ингридиентов и авторов на странице.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@foodgram.ru', password='pass',
+            first_name='Имя', last_name='Фамилия'
+        )
+        cls.tags = [
+            Tag.objects.create(name=name, color=color, slug=slug)
+            for name, color, slug in (
+                ('Завтрак', '#E26C2D', 'breakfast'),
+                ('Обед', '#49B64E', 'lunch'),
+            )
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {i}', measurement_unit='г'
+            )
+            for i in range(5)
+        ]
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_recipes(self, count, author=None):
+        author = author or User.objects.create_user(
+            username=f'author{User.objects.count()}',
+            email=f'author{User.objects.count()}@foodgram.ru',
+            first_name='Имя', last_name='Фамилия'
+        )
+        recipes = []
+        for i in range(count):
+            recipe = Recipe.objects.create(
+                author=author, name=f'Рецепт {i}', text='Описание',
+                image='recipes/images/test.png', cooking_time=10
+            )
+            recipe.tags.set(self.tags)
+            recipe.set_ingredients(
+                {ingredient.pk: i + 1 for ingredient in self.ingredients}
+            )
+            recipes.append(recipe)
+        return recipes
+
+    def assert_constant_queries(self, num, request, grow):
+        """Запрос укладывается в num запросов до и после grow()."""
+        for _ in range(2):
+            with self.assertNumQueries(num):
+                response = request()
+            self.assertEqual(response.status_code, 200)
+            grow()
+            for cache in caches.all():
+                cache.clear()
+
+    def test_recipe_list(self):
+        self.create_recipes(2)
+        self.assert_constant_queries(
+            LIST_QUERIES,
+            lambda: self.client.get('/api/recipes/', {'limit': 6}),
+            lambda: self.create_recipes(4)
+        )
+
+    def test_recipe_list_anonymous(self):
+        self.create_recipes(2)
+        self.assert_constant_queries(
+            LIST_QUERIES,
+            lambda: APIClient().get('/api/recipes/', {'limit': 6}),
+            lambda: self.create_recipes(4)
+        )
+
+    def test_recipe_detail(self):
+        recipe = self.create_recipes(1)[0]
+
+        def grow():
+            number = Tag.objects.count()
+            Tag.objects.create(
+                name=f'Ужин {number}', color='#8775D2', slug=f'dinner{number}'
+            )
+            recipe.tags.set(Tag.objects.all())
+            recipe.set_ingredients({
+                ingredient.pk: 1 for ingredient in Ingredient.objects.all()
+            })
+            Ingredient.objects.create(
+                name=f'Ингредиент {Ingredient.objects.count()}',
+                measurement_unit='г'
+            )
+
+        self.assert_constant_queries(
+            DETAIL_QUERIES,
+            lambda: self.client.get(f'/api/recipes/{recipe.pk}/'),
+            grow
+        )
+
+    def test_subscriptions(self):
+        def grow():
+            author = self.create_recipes(4)[0].author
+            Follow.objects.create(user=self.user, author=author)
+
+        grow()
+        self.assert_constant_queries(
+            SUBSCRIPTIONS_QUERIES,
+            lambda: self.client.get(
+                '/api/users/subscriptions/',
+                {'limit': 6, 'recipes_limit': 3}
+            ),
+            grow
+        )
+
+    def test_download_shopping_cart(self):
+        def grow():
+            for recipe in self.create_recipes(2):
+                ShoppingCart.objects.create(user=self.user, recipe=recipe)
+
+        grow()
+        self.assertTrue(
+            ShoppingListItem.objects.filter(user=self.user).exists()
+        )
+        for file_format in ('txt', 'csv', 'json', 'pdf'):
+            with self.subTest(file_format=file_format):
+                def download():
+                    response = self.client.get(
+                        '/api/recipes/download_shopping_cart/',
+                        {'file_format': file_format}
+                    )
+                    b''.join(response.streaming_content)
+                    return response
+
+                self.assert_constant_queries(
+                    SHOPPING_LIST_QUERIES, download, grow
+                )
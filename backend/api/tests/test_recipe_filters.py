@@ -0,0 +1,106 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from api.benchmark import check_plans
+from api.tests.test_query_budget import LOCMEM_CACHES
+from recipes.models import FavoriteRecipes, Recipe, ShoppingCart
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeFilterTest(TestCase):
+    """
+    Фильтры is_favorited и is_in_shopping_cart списка рецептов:
+    1 — только отмеченные рецепты, 0 — только не отмеченные,
+    другие значения не фильтруют.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='reader', email='reader@foodgram.ru'
+        )
+        cls.author = User.objects.create_user(
+            username='author', email='author@foodgram.ru'
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {i}', text='Описание',
+                image='recipes/images/test.png', cooking_time=10
+            ).pk
+            for i in range(4)
+        ]
+        FavoriteRecipes.objects.add(cls.user.pk, cls.recipes[:2])
+        ShoppingCart.objects.add(cls.user.pk, cls.recipes[1:3])
+
+    def setUp(self):
+        for cache in caches.all():
+            cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get_ids(self, **params):
+        response = self.client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return sorted(recipe['id'] for recipe in response.data['results'])
+
+    def test_queryset_filters(self):
+        recipes = Recipe.objects.add_annotations(self.user.pk)
+        for method, value, expected in (
+            ('filter_in_favorite', '1', self.recipes[:2]),
+            ('filter_in_favorite', '0', self.recipes[2:]),
+            ('filter_in_favorite', 'true', self.recipes),
+            ('filter_in_shopping_cart', '1', self.recipes[1:3]),
+            ('filter_in_shopping_cart', '0', self.recipes[::3]),
+            ('filter_in_shopping_cart', '2', self.recipes),
+        ):
+            with self.subTest(method=method, value=value):
+                self.assertEqual(sorted(
+                    getattr(recipes, method)(value).values_list(
+                        'pk', flat=True
+                    )
+                ), expected)
+
+    def test_api_filters(self):
+        self.assertEqual(self.get_ids(is_favorited=1), self.recipes[:2])
+        self.assertEqual(self.get_ids(is_favorited=0), self.recipes[2:])
+        self.assertEqual(
+            self.get_ids(is_in_shopping_cart=0), self.recipes[::3]
+        )
+        self.assertEqual(
+            self.get_ids(is_favorited=1, is_in_shopping_cart=0),
+            self.recipes[:1]
+        )
+        self.assertEqual(self.get_ids(is_favorited='yes'), self.recipes)
+
+    @skipUnless(connection.vendor == 'sqlite', 'План запроса SQLite.')
+    def test_plans_use_indexes(self):
+        for params, index in (
+            ({}, 'recipe_pub_date_idx'),
+            ({'is_favorited': 0}, 'recipes_favoriterecipes_1 (user_id=?'),
+            ({'is_favorited': 1}, 'recipes_favoriterecipes_1 (user_id=?'),
+            ({'is_in_shopping_cart': 0}, 'recipes_shoppingcart_1 (user_id=?'),
+            ({'is_in_shopping_cart': 1}, 'recipes_shoppingcart_1 (user_id=?'),
+            ({'author': self.author.pk}, 'recipe_author_pub_date_idx'),
+        ):
+            with self.subTest(params=params):
+                with CaptureQueriesContext(connection) as captured:
+                    self.get_ids(**params)
+                self.assertEqual(check_plans(captured), [])
+                self.assertIn(index, self.list_plan(captured))
+
+    def list_plan(self, captured):
+        """План запроса страницы списка (с LIMIT)."""
+        sql = next(
+            query['sql'] for query in captured.captured_queries
+            if query['sql'].startswith('SELECT') and ' LIMIT ' in query['sql']
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            return '\n'.join(row[-1] for row in cursor.fetchall())
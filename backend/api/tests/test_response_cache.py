@@ -0,0 +1,64 @@
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from api import response_cache
+from recipes.models import Recipe
+from .test_query_budget import LOCMEM_CACHES
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ResponseCacheTest(TestCase):
+    """Кеш ответов на чтение рецептов анонимам."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='author', email='author@foodgram.ru',
+            first_name='Имя', last_name='Фамилия'
+        )
+        cls.recipe = Recipe.objects.create(
+            author=cls.author, name='Рецепт', text='Описание',
+            image='recipes/images/test.png', cooking_time=10
+        )
+
+    def setUp(self):
+        caches['responses'].clear()
+        self.client = APIClient()
+
+    def test_hit_after_miss(self):
+        url = f'/api/recipes/{self.recipe.pk}/'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        response_cache.invalidate()
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(
+            response_cache.get_stats(), {'hits': 1, 'misses': 2, 'waits': 0}
+        )
+
+    def test_waiter_falls_through_after_error(self):
+        """
+        Запрос, ждавший чужого расчёта, который закончился ошибкой,
+        считает ответ сам сразу после снятия блокировки.
+        """
+        url = '/api/recipes/0/'
+        request = Request(self.client.get(url).wsgi_request)
+        caches['responses'].clear()
+        lock_key = f'{response_cache.get_key(request)}:lock'
+        caches['responses'].add(lock_key, 1, response_cache.LOCK_TIMEOUT)
+        release = threading.Timer(
+            0.1, caches['responses'].delete, (lock_key, )
+        )
+        release.start()
+        start = time.monotonic()
+        response = self.client.get(url)
+        elapsed = time.monotonic() - start
+        release.join()
+        self.assertEqual(response.status_code, 404)
+        self.assertLess(elapsed, response_cache.WAIT_TIMEOUT / 2)
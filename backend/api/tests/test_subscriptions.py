@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from recipes.models import Recipe
+from users.models import Follow
+from .test_query_budget import LOCMEM_CACHES
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SubscriptionsRecipesLimitTest(TestCase):
+    """Параметр recipes_limit в подписках."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.author, cls.other = (
+            User.objects.create_user(
+                username=name, email=f'{name}@foodgram.ru',
+                first_name='Имя', last_name='Фамилия'
+            )
+            for name in ('reader', 'author', 'other')
+        )
+        Follow.objects.create(user=cls.user, author=cls.author)
+        for i in range(3):
+            Recipe.objects.create(
+                author=cls.author, name=f'Рецепт {i}', text='Описание',
+                image='recipes/images/test.png', cooking_time=10
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_limit(self):
+        for recipes_limit, expected in (('2', 2), ('0', 0), ('', 3)):
+            with self.subTest(recipes_limit=recipes_limit):
+                response = self.client.get(
+                    '/api/users/subscriptions/',
+                    {'recipes_limit': recipes_limit}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(
+                    len(response.data['results'][0]['recipes']), expected
+                )
+
+    def test_invalid_limit(self):
+        for recipes_limit in ('abc', '-1', '1.5'):
+            with self.subTest(recipes_limit=recipes_limit):
+                response = self.client.get(
+                    '/api/users/subscriptions/',
+                    {'recipes_limit': recipes_limit}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('recipes_limit', response.data)
+
+    def test_subscribe_invalid_limit(self):
+        response = self.client.post(
+            f'/api/users/{self.other.pk}/subscribe/?recipes_limit=abc'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(
+            Follow.objects.filter(user=self.user, author=self.other).exists()
+        )
+
+    def test_subscribe_limit(self):
+        response = self.client.post(
+            f'/api/users/{self.author.pk}/subscribe/?recipes_limit=1'
+        )
+        self.assertEqual(response.status_code, 400)
+        Follow.objects.filter(user=self.user, author=self.author).delete()
+        response = self.client.post(
+            f'/api/users/{self.author.pk}/subscribe/?recipes_limit=1'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data['recipes']), 1)
+
+    def test_no_follows(self):
+        self.client.force_authenticate(self.other)
+        for params in ({}, {'recipes_limit': '3'}):
+            with self.subTest(params=params):
+                response = self.client.get(
+                    '/api/users/subscriptions/', params
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data['results'], [])
@@ -13,4 +13,5 @@ router.register(r'recipes', views.RecipeViewSet, basename='recipes')
 urlpatterns = [
     path('', include(router.urls)),
     path(r'auth/', include('djoser.urls.authtoken')),
+    path('debug/profiling/', views.profiling_stats, name='profiling'),
 ]
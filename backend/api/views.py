@@ -1,32 +1,71 @@
-from django.db.models import F, Sum
+from collections import defaultdict
+from functools import partial
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.http import HttpResponse
+from django.http import Http404, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from djoser.views import UserViewSet
 
 from rest_framework import viewsets
-from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import (action, api_view,
+                                       permission_classes)
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.response import Response
 
-from .mixins import (CreateAndDeleteMixin, ListRetriveViewSet)
-from .paginators import LimitPageNumberPagination
+from . import conditional, profiling, response_cache, shopping_list
+from .catalogs import ingredient_catalog, tag_catalog
+from .mixins import (CachedResponseMixin, ConditionalGetMixin,
+                     CreateAndDeleteMixin, CursorPaginationMixin,
+                     ListRetriveViewSet)
+from .paginators import KeysetPagination, LimitPageNumberPagination
 from .permissions import (IsAdminOrOwner, IsAdminOrReadOnly,
                           IsAuthenticatedOrAdminOrReadOnly)
 from .serializers import (TagSerializer, SubscribeSerializer,
                           RecipeSerializer, IngredientSerializer,
                           CreateRecipeSerializer, ReadRecipeSerializer,)
 from users.models import Follow
-from recipes.models import (Tag, Recipe, Ingredient, IngredientInRecipe,
+from recipes.ingredient_index import ingredient_index
+from recipes.models import (Tag, Recipe, Ingredient,
                             FavoriteRecipes, ShoppingCart)
 
 User = get_user_model()
 
+FOLLOW_ERRORS = {
+    'exists': 'Вы уже подписаны на этого пользователя!',
+    'missing': 'Вы не подписаны на этого пользователя!',
+    'unknown': 'Пользователи не найдены: ',
+}
+FAVORITE_ERRORS = {
+    'exists': 'Вы уже добавили этот рецепт в избранное!',
+    'missing': 'Этого рецепта нет в избранном!',
+    'unknown': 'Рецепты не найдены: ',
+}
+SHOPPING_CART_ERRORS = {
+    'exists': 'Вы уже добавили этот рецепт в список покупок!',
+    'missing': 'Этого рецепта нет в списке покупок!',
+    'unknown': 'Рецепты не найдены: ',
+}
+MAX_FILTER_INGREDIENTS = 100
+MAX_MISSING_INGREDIENTS = 10
+
 
-class CustomUserViewSet(UserViewSet, CreateAndDeleteMixin):
+class CustomUserViewSet(CursorPaginationMixin, UserViewSet,
+                        CreateAndDeleteMixin):
     """Вьюсет для работы с пользователями и подписками."""
     pagination_class = LimitPageNumberPagination
+    cursor_ordering = ('id', )
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            qs = qs.add_is_subscribed(self.request.user.pk)
+        return qs
 
     def get_permissions(self):
-        if self.action in ('subscriptions', 'subscribe'):
+        if self.action in ('subscriptions', 'subscribe', 'subscribe_many'):
             return (IsAuthenticated(), )
         return super().get_permissions()
 
@@ -35,40 +74,107 @@ class CustomUserViewSet(UserViewSet, CreateAndDeleteMixin):
             return SubscribeSerializer
         return super().get_serializer_class()
 
+    def check_targets(self, target_ids):
+        if self.request.user.pk in target_ids:
+            raise ValidationError(
+                {'errors': 'Вы не можете подписаться на самого себя!'}
+            )
+
     @action(
         detail=False,
         methods=['get'],
     )
     def subscriptions(self, request):
         """Метод для отображения подписок пользователя."""
-        queryset = User.objects.filter(following__user=request.user)
+        queryset = User.objects.filter(
+            following__user=request.user
+        ).add_is_subscribed(request.user.pk).order_by('id')
         context = self.get_serializer_context()
         page = self.paginate_queryset(queryset)
+        self.add_latest_recipes(page)
         serializer = self.get_serializer_class()(
             page, many=True,
             context=context
         )
         return self.get_paginated_response(serializer.data)
 
+    def get_recipes_limit(self):
+        """
+        Число последних рецептов автора из параметра recipes_limit
+        или None, если параметр не передан.
+        """
+        recipes_limit = self.request.query_params.get('recipes_limit')
+        if not recipes_limit:
+            return None
+        if not recipes_limit.isdecimal():
+            raise ValidationError({'recipes_limit': [
+                'Ожидается целое неотрицательное число.'
+            ]})
+        return int(recipes_limit)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.action in ('subscriptions', 'subscribe'):
+            context['recipes_limit'] = self.get_recipes_limit()
+        return context
+
+    def add_latest_recipes(self, authors):
+        """Метод для загрузки последних рецептов всех авторов страницы."""
+        recipes = Recipe.objects.latest_by_authors(
+            [author.pk for author in authors], self.get_recipes_limit()
+        )
+        recipes_by_author = defaultdict(list)
+        for recipe in recipes:
+            recipes_by_author[recipe.author_id].append(recipe)
+        for author in authors:
+            author.latest_recipes = recipes_by_author[author.pk]
+
     @action(
         detail=True,
         methods=['post', 'delete'],
     )
     def subscribe(self, request, id):
         """Метод для подписки на пользователя."""
+        self.get_recipes_limit()
         return self.create_and_delete(
             pk=id,
             klass=Follow,
-            field='author'
+            errors=FOLLOW_ERRORS
+        )
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='subscribe',
+        url_name='subscribe-many'
+    )
+    def subscribe_many(self, request):
+        """Метод для подписки на нескольких пользователей сразу."""
+        return self.bulk_create_and_delete(
+            klass=Follow,
+            errors=FOLLOW_ERRORS
         )
 
 
-class TagViewSet(ListRetriveViewSet):
+class TagViewSet(ConditionalGetMixin, ListRetriveViewSet):
     """Вьюсет для работы с тегами."""
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly, )
 
+    def list(self, request, *args, **kwargs):
+        """Список тегов из готового снимка, без запросов к базе."""
+        return tag_catalog.respond(request)
+
+    def get_object_validators(self, request):
+        pk = self.kwargs[self.lookup_field]
+        row = Tag.objects.filter(pk=pk).values_list(
+            'id', 'name', 'color', 'slug'
+        ).first() if pk.isdigit() else None
+        if row is None:
+            return None
+        return conditional.make_etag(request, *row), None
+
 
 class IngredientViewSet(ListRetriveViewSet):
     """Вьюсет для работы с ингридиентами."""
@@ -82,12 +188,145 @@ class IngredientViewSet(ListRetriveViewSet):
             qs = qs.filter_by_name(name)
         return qs.all()
 
+    def get_validators(self, request):
+        """ETag по версии индекса ингридиентов."""
+        return conditional.make_etag(request, ingredient_index.version()), None
 
-class RecipeViewSet(viewsets.ModelViewSet, CreateAndDeleteMixin):
+    def list(self, request, *args, **kwargs):
+        """
+        Полный список ингридиентов из готового снимка, поиск по названию
+        из индекса в памяти, без запросов к базе.
+        """
+        if not request.query_params.get('name'):
+            return ingredient_catalog.respond(request)
+        return conditional.conditional(
+            request,
+            partial(self.get_validators, request),
+            partial(self.list_from_index, request)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return conditional.conditional(
+            request,
+            partial(self.get_validators, request),
+            partial(self.retrieve_from_index, kwargs[self.lookup_field])
+        )
+
+    def list_from_index(self, request):
+        return Response(
+            ingredient_index.search(request.query_params['name'])
+        )
+
+    def retrieve_from_index(self, pk):
+        ingredient = ingredient_index.get(int(pk)) if pk.isdigit() else None
+        if ingredient is None:
+            raise Http404
+        return Response(ingredient)
+
+
+class RecipeViewSet(CachedResponseMixin, ConditionalGetMixin,
+                    CursorPaginationMixin, viewsets.ModelViewSet,
+                    CreateAndDeleteMixin):
     """Вьюсет для работы с рецептами."""
     pagination_class = LimitPageNumberPagination
+    cursor_actions = ('feed', )
+
+    def get_ingredient_ids(self, name):
+        """Id ингридиентов из параметра name, повторяющегося в запросе."""
+        values = self.request.query_params.getlist(name)
+        if len(values) > MAX_FILTER_INGREDIENTS or not all(
+            value.isdigit() for value in values
+        ):
+            raise ValidationError({name: [
+                'Ожидается список id ингредиентов, не больше '
+                f'{MAX_FILTER_INGREDIENTS}.'
+            ]})
+        return [int(value) for value in values]
+
+    def get_ingredient_filter(self):
+        """
+        Параметры подбора по ингридиентам: ingredients — рецепты со всеми
+        указанными, exclude_ingredients — без указанных,
+        available_ingredients и max_missing — рецепты, для которых
+        не хватает не больше max_missing ингридиентов из имеющихся.
+        """
+        params = self.request.query_params
+        ingredient_filter = {
+            'include': self.get_ingredient_ids('ingredients'),
+            'exclude': self.get_ingredient_ids('exclude_ingredients'),
+        }
+        if 'available_ingredients' in params:
+            ingredient_filter['available'] = self.get_ingredient_ids(
+                'available_ingredients'
+            )
+            max_missing = params.get('max_missing', '0')
+            if not max_missing.isdigit() or (
+                int(max_missing) > MAX_MISSING_INGREDIENTS
+            ):
+                raise ValidationError({'max_missing': [
+                    f'Ожидается число от 0 до {MAX_MISSING_INGREDIENTS}.'
+                ]})
+            ingredient_filter['max_missing'] = int(max_missing)
+        return ingredient_filter
+
+    def get_score_ordering(self):
+        """
+        Сортировка по оценке популярности из параметра ordering
+        (popular, trending) или None для сортировки по дате.
+        """
+        ordering = self.request.query_params.get('ordering')
+        if not ordering or self.action not in ('list', 'feed'):
+            return None
+        if ordering not in settings.RECIPE_SCORE_HALF_LIVES:
+            raise ValidationError({'ordering': [
+                'Доступные сортировки: '
+                + ', '.join(settings.RECIPE_SCORE_HALF_LIVES) + '.'
+            ]})
+        return ordering
+
+    @property
+    def cursor_ordering(self):
+        ordering = self.get_score_ordering()
+        if ordering is None:
+            return ('-pub_date', '-id')
+        return (f'-{ordering}_score', '-id')
+
+    def get_list_validators(self, request):
+        """
+        ETag по числу рецептов в выборке и времени последнего изменения.
+        Поколения кеша ответов учитывают изменения авторов, тегов,
+        ингридиентов и избранного пользователя. Страницы по курсору
+        не считают число рецептов и отдаются без валидаторов.
+        """
+        if isinstance(self.paginator, KeysetPagination):
+            return None
+        version = self.get_queryset().get_version()
+        self.queryset_count = version['count']
+        return conditional.make_etag(
+            request, version['count'], version['modified'],
+            *response_cache.get_generations(request)
+        ), None
+
+    def get_object_validators(self, request):
+        """ETag и Last-Modified по времени изменения рецепта."""
+        pk = self.kwargs[self.lookup_field]
+        modified = Recipe.objects.filter(pk=pk).values_list(
+            'updated_at', flat=True
+        ).first() if pk.isdigit() else None
+        if modified is None:
+            return None
+        etag = conditional.make_etag(
+            request, modified, *response_cache.get_generations(request)
+        )
+        if request.user.is_authenticated:
+            return etag, None
+        return etag, modified
 
     def get_queryset(self):
+        if self.action == 'similar':
+            return Recipe.objects.add_annotations(
+                self.request.user.pk
+            ).similar(self.kwargs['pk'])
         qs = Recipe.objects
         tags = self.request.query_params.getlist('tags', None)
         user = self.request.user
@@ -97,33 +336,74 @@ class RecipeViewSet(viewsets.ModelViewSet, CreateAndDeleteMixin):
             'is_in_shopping_cart',
             None
         )
+        search = self.request.query_params.get('search', None)
 
+        qs = qs.filter_by_ingredients(**self.get_ingredient_filter())
         if tags:
             qs = qs.filter_by_tags(tags)
         qs = qs.add_annotations(user.pk)
         if author:
             qs = qs.filter_by_author(author)
-        if user.is_anonymous:
-            return qs
-
-        if is_favorited:
-            qs = qs.filter_in_favorite(is_favorited)
-        if is_in_shopping_cart:
-            qs = qs.filter_in_shopping_cart(is_in_shopping_cart)
+        if not user.is_anonymous:
+            if is_favorited:
+                qs = qs.filter_in_favorite(is_favorited)
+            if is_in_shopping_cart:
+                qs = qs.filter_in_shopping_cart(is_in_shopping_cart)
+        if search:
+            qs = qs.search(search)
+        if self.action == 'feed':
+            qs = qs.feed(user.pk)
+        ordering = self.get_score_ordering()
+        if ordering:
+            qs = qs.order_by_score(ordering)
         return qs
 
     def get_permissions(self):
         if self.action in ('partial_update', 'destroy'):
             return (IsAdminOrOwner(), )
+        if self.action == 'feed':
+            return (IsAuthenticated(), )
         return (IsAuthenticatedOrAdminOrReadOnly(), )
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'feed', 'similar'):
             return ReadRecipeSerializer
         elif self.action in ('favorite', 'shopping_cart'):
             return RecipeSerializer
         return CreateRecipeSerializer
 
+    @action(
+        detail=False,
+        methods=['get']
+    )
+    def feed(self, request):
+        """
+        Метод для ленты рецептов авторов, на которых подписан
+        пользователь, от новых к старым, по курсору.
+        """
+        return self.list(request)
+
+    @action(
+        detail=True,
+        methods=['get']
+    )
+    def similar(self, request, pk=None):
+        """
+        Метод для рецептов, похожих на рецепт по ингридиентам и тегам,
+        от более похожих к менее.
+        """
+        return response_cache.cached(
+            request, partial(self.similar_response, pk)
+        )
+
+    def similar_response(self, pk):
+        if not pk.isdecimal():
+            raise Http404
+        recipes = list(self.get_queryset())
+        if not recipes and not Recipe.objects.filter(pk=pk).exists():
+            raise Http404
+        return Response(self.get_serializer(recipes, many=True).data)
+
     @action(
         detail=True,
         methods=['post', 'delete']
@@ -133,7 +413,20 @@ class RecipeViewSet(viewsets.ModelViewSet, CreateAndDeleteMixin):
         return self.create_and_delete(
             pk=pk,
             klass=FavoriteRecipes,
-            field='recipe'
+            errors=FAVORITE_ERRORS
+        )
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='favorite',
+        url_name='favorite-many'
+    )
+    def favorite_many(self, request):
+        """Метод для добавления/удаления нескольких рецептов в избранное."""
+        return self.bulk_create_and_delete(
+            klass=FavoriteRecipes,
+            errors=FAVORITE_ERRORS
         )
 
     @action(
@@ -145,7 +438,23 @@ class RecipeViewSet(viewsets.ModelViewSet, CreateAndDeleteMixin):
         return self.create_and_delete(
             pk=pk,
             klass=ShoppingCart,
-            field='recipe'
+            errors=SHOPPING_CART_ERRORS
+        )
+
+    @action(
+        detail=False,
+        methods=['post', 'delete'],
+        url_path='shopping_cart',
+        url_name='shopping_cart-many'
+    )
+    def shopping_cart_many(self, request):
+        """
+        Метод для добавления/удаления нескольких рецептов в список
+        покупок, например всех рецептов плана питания.
+        """
+        return self.bulk_create_and_delete(
+            klass=ShoppingCart,
+            errors=SHOPPING_CART_ERRORS
         )
 
     @action(
@@ -154,21 +463,33 @@ class RecipeViewSet(viewsets.ModelViewSet, CreateAndDeleteMixin):
     )
     def download_shopping_cart(self, request):
         """Метод для скачивания списка покупок."""
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__shopping_cart_recipe__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(
-            name=F('ingredient__name'),
-            units=F('ingredient__measurement_unit'),
-            total=Sum('amount')
-        ).order_by('-total')
-
-        text = '\n'.join([
-            f"{ing['name']} {ing['units']} - {ing['total']}"
-            for ing in ingredients
-        ])
-        filename = 'foodgram-shopping-cart.txt'
-        response = HttpResponse(text, content_type='text/plain')
-        response['Content-Disposition'] = f'attachment; filename={filename}'
+        file_format = request.query_params.get('file_format', 'txt')
+        if file_format not in shopping_list.FORMATS:
+            raise ValidationError({'file_format': [
+                'Доступные форматы: '
+                + ', '.join(shopping_list.FORMATS) + '.'
+            ]})
+        etag = quote_etag(
+            shopping_list.get_etag(request.user.pk, file_format)
+        )
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            content_type, render = shopping_list.FORMATS[file_format]
+            response = StreamingHttpResponse(
+                render(shopping_list.get_rows(request.user.pk)),
+                content_type=content_type
+            )
+            filename = f'foodgram-shopping-cart.{file_format}'
+            response['Content-Disposition'] = (
+                f'attachment; filename={filename}'
+            )
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
         return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def profiling_stats(request):
+    """Сводка профилирования запросов по действиям за последние минуты."""
+    return Response(profiling.get_stats())
@@ -0,0 +1,22 @@
+from django.contrib import admin
+
+from .paginators import EstimatedCountPaginator
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Базовая настройка админки для больших таблиц: без полного
+    COUNT(*) всей таблицы на каждой странице списка.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+class ObjectDeleteAdmin(LargeTableAdmin):
+    """
+    Админка моделей, которые при удалении обновляют счётчики:
+    выбранные объекты удаляются по одному через delete() модели.
+    """
+    def delete_queryset(self, request, queryset):
+        for obj in queryset:
+            obj.delete()
@@ -0,0 +1,124 @@
+"""
+Бэкенд кеша Django поверх Redis-совместимого сервера.
+
+В Django 2.2 нет встроенного бэкенда для Redis. Клиент создаётся через
+CLIENT_CLASS.from_url(LOCATION), по умолчанию это redis.Redis из пакета
+redis. Подойдёт любой клиент с тем же набором команд, например
+заглушка в памяти для локальной проверки.
+
+    CACHES = {
+        'responses': {
+            'BACKEND': 'core.cache.RedisCache',
+            'LOCATION': 'redis://localhost:6379/0',
+        }
+    }
+"""
+import pickle
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+DEFAULT_CLIENT_CLASS = 'redis.Redis'
+
+
+class RedisCache(BaseCache):
+    """Кеш в Redis: целые числа хранятся как есть, остальное в pickle."""
+    def __init__(self, server, params):
+        super().__init__(params)
+        self._server = server
+        self._client = None
+        options = params.get('OPTIONS', {})
+        self._client_class = options.get('CLIENT_CLASS', DEFAULT_CLIENT_CLASS)
+
+    @property
+    def client(self):
+        if self._client is None:
+            try:
+                client_class = import_string(self._client_class)
+            except ImportError:
+                raise ImproperlyConfigured(
+                    f'Не удалось импортировать {self._client_class}: '
+                    'для RedisCache нужен пакет redis.'
+                )
+            self._client = client_class.from_url(self._server)
+        return self._client
+
+    def _timeout(self, timeout):
+        """Время жизни в секундах или None, если ключ вечный."""
+        if timeout == DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        if timeout is None:
+            return None
+        return max(int(timeout), 0)
+
+    @staticmethod
+    def _dumps(value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def _loads(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return pickle.loads(value)
+
+    def _set(self, key, value, timeout, nx=False):
+        timeout = self._timeout(timeout)
+        if timeout == 0:
+            if nx:
+                return False
+            self.client.delete(key)
+            return True
+        return bool(self.client.set(
+            key, self._dumps(value), ex=timeout, nx=nx
+        ))
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._set(key, value, timeout, nx=True)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        value = self.client.get(key)
+        if value is None:
+            return default
+        return self._loads(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._set(key, value, timeout)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        timeout = self._timeout(timeout)
+        if timeout is None:
+            return bool(self.client.persist(key))
+        return bool(self.client.expire(key, timeout))
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self.client.delete(key)
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return bool(self.client.exists(key))
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        if not self.client.exists(key):
+            raise ValueError(f"Key '{key}' not found")
+        return self.client.incrby(key, delta)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.make_key('*')))
+        if keys:
+            self.client.delete(*keys)
@@ -0,0 +1,27 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+ESTIMATE_THRESHOLD = 100000
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для админки больших таблиц. Для списка без фильтров
+    в PostgreSQL количество строк берётся из статистики планировщика
+    вместо COUNT(*) по всей таблице.
+    """
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        connection = connections[self.object_list.db]
+        if connection.vendor == 'postgresql' and not query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE relname = %s',
+                    (query.model._meta.db_table, )
+                )
+                row = cursor.fetchone()
+            if row is not None and row[0] >= ESTIMATE_THRESHOLD:
+                return int(row[0])
+        return super().count
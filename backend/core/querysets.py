@@ -0,0 +1,167 @@
+from django.db import connections, models, transaction
+from django.db.models.functions import Coalesce
+
+
+class CounterQuerySet(models.QuerySet):
+    """QuerySet с методами для денормализованных счётчиков."""
+    def change_counter(self, field, delta):
+        """
+        Метод для атомарного изменения счётчика на delta.
+        Счётчик не уменьшается ниже нуля.
+        """
+        qs = self
+        if delta < 0:
+            qs = qs.filter(**{f'{field}__gte': -delta})
+        return qs.update(**{field: models.F(field) + delta})
+
+    def reconcile_counter(self, field, related, lookup, fix=True):
+        """
+        Метод для сверки счётчика field с количеством объектов related,
+        связанных через поле lookup. Расхождения исправляются, если fix.
+        Возвращает число объектов с расхождением.
+        """
+        actual = Coalesce(
+            models.Subquery(
+                related.filter(**{lookup: models.OuterRef('pk')}).order_by(
+                ).values(lookup).annotate(
+                    count=models.Count('pk')
+                ).values('count'),
+                output_field=models.IntegerField()
+            ),
+            0
+        )
+        drifted = self.annotate(actual_count=actual).exclude(
+            **{field: models.F('actual_count')}
+        ).values('pk')
+        count = drifted.count()
+        if count and fix:
+            self.filter(pk__in=drifted).update(**{field: actual})
+        return count
+
+
+class UserLinkQuerySet(models.QuerySet):
+    """
+    QuerySet для связей пользователя с объектами: избранного, списка
+    покупок и подписок. Связь с объектом target_field добавляется
+    и удаляется одним запросом без создания объектов модели, повторное
+    добавление или удаление ничего не меняет, поэтому одновременные
+    запросы не упираются в ограничение уникальности. Счётчик
+    counter_field объекта меняется на число изменённых связей.
+    """
+    target_field = None
+    counter_field = None
+
+    @property
+    def target_model(self):
+        return self.model._meta.get_field(self.target_field).related_model
+
+    def unknown_targets(self, target_ids):
+        """Метод для поиска id из target_ids, которых нет в базе."""
+        found = set(self.target_model._default_manager.filter(
+            pk__in=target_ids
+        ).values_list('pk', flat=True))
+        return sorted(set(target_ids) - found)
+
+    def _execute(self, sql, params, target_ids):
+        """
+        Выполнение запроса sql(число id) с параметрами params(id) для
+        каждого id или, если база возвращает строки из INSERT и DELETE
+        (RETURNING), одного запроса на все id. Возвращает id объектов,
+        связи с которыми изменились.
+        """
+        connection = connections[self.db]
+        target_column = self._columns()[2]
+        with connection.cursor() as cursor:
+            if connection.features.can_return_ids_from_bulk_insert:
+                cursor.execute(
+                    sql(len(target_ids)) + f' RETURNING {target_column}',
+                    params(target_ids)
+                )
+                return sorted(row[0] for row in cursor.fetchall())
+            changed = []
+            for pk in target_ids:
+                cursor.execute(sql(1), params([pk]))
+                if cursor.rowcount:
+                    changed.append(pk)
+            return changed
+
+    def _columns(self):
+        quote_name = connections[self.db].ops.quote_name
+        return (
+            quote_name(self.model._meta.db_table),
+            quote_name(self.model._meta.get_field('user').column),
+            quote_name(
+                self.model._meta.get_field(self.target_field).column
+            ),
+        )
+
+    def add(self, user_id, target_ids):
+        """
+        Метод для добавления связей пользователя user_id с объектами
+        target_ids. Остальные поля связи получают значения по умолчанию.
+        Возвращает id объектов, связи с которыми добавлены.
+        """
+        target_ids = sorted(set(target_ids))
+        if not target_ids:
+            return []
+        connection = connections[self.db]
+        ops = connection.ops
+        table, user_column, target_column = self._columns()
+        opts = self.model._meta
+        fields = [
+            field for field in opts.concrete_fields
+            if field.name not in ('user', self.target_field)
+            and not field.primary_key
+        ]
+        columns = [user_column, target_column] + [
+            ops.quote_name(field.column) for field in fields
+        ]
+        defaults = [
+            field.get_db_prep_save(field.get_default(), connection)
+            for field in fields
+        ]
+        row = '({})'.format(', '.join(['%s'] * len(columns)))
+
+        def sql(count):
+            return '{} {} ({}) VALUES {} {}'.format(
+                ops.insert_statement(ignore_conflicts=True),
+                table, ', '.join(columns), ', '.join([row] * count),
+                ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)
+            )
+
+        def params(ids):
+            return [
+                value for pk in ids for value in (user_id, pk, *defaults)
+            ]
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            added = self._execute(sql, params, target_ids)
+            self.target_model._default_manager.filter(
+                pk__in=added
+            ).change_counter(self.counter_field, 1)
+        return added
+
+    def remove(self, user_id, target_ids):
+        """
+        Метод для удаления связей пользователя user_id с объектами
+        target_ids. Возвращает id объектов, связи с которыми удалены.
+        """
+        target_ids = sorted(set(target_ids))
+        if not target_ids:
+            return []
+        table, user_column, target_column = self._columns()
+
+        def sql(count):
+            return 'DELETE FROM {} WHERE {} = %s AND {} IN ({})'.format(
+                table, user_column, target_column, ', '.join(['%s'] * count)
+            )
+
+        def params(ids):
+            return [user_id, *ids]
+
+        with transaction.atomic(using=self.db, savepoint=False):
+            removed = self._execute(sql, params, target_ids)
+            self.target_model._default_manager.filter(
+                pk__in=removed
+            ).change_counter(self.counter_field, -1)
+        return removed
@@ -0,0 +1,58 @@
+"""
+Метки версий, общие для всех процессов.
+
+Индексы и снимки в памяти процесса сверяют свою версию с меткой,
+а изменение данных в любом процессе (воркере gunicorn или команде
+manage.py) меняет метку. Поэтому метки хранятся в кеше
+STAMP_CACHE_ALIAS, который видят все процессы: по умолчанию это
+файловый кеш, подойдёт и RedisCache из core.cache. Кеш в памяти
+процесса для меток не годится, это проверяет check_shared_caches.
+"""
+from uuid import uuid4
+
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def get_stamp_cache():
+    return caches[settings.STAMP_CACHE_ALIAS]
+
+
+def get_stamp(key, cache=None):
+    """Текущая метка key; если её нет, создаётся новая."""
+    cache = cache or get_stamp_cache()
+    stamp = cache.get(key)
+    if stamp is None:
+        cache.add(key, uuid4().hex, None)
+        stamp = cache.get(key)
+    return stamp
+
+
+def bump_stamp(key, cache=None):
+    """Смена метки key во всех процессах."""
+    (cache or get_stamp_cache()).set(key, uuid4().hex, None)
+
+
+@checks.register(checks.Tags.caches)
+def check_shared_caches(app_configs, **kwargs):
+    """Кеши с метками и ответами должны быть общими для всех процессов."""
+    return [
+        checks.Error(
+            f'Кеш {alias} хранится в памяти процесса: изменения '
+            'из других воркеров и команд manage.py в нём не видны.',
+            hint='Используйте общий бэкенд: FileBasedCache, '
+                 'DatabaseCache или core.cache.RedisCache.',
+            id='core.E001',
+        )
+        for alias in (
+            settings.STAMP_CACHE_ALIAS, settings.RESPONSE_CACHE_ALIAS
+        )
+        if settings.CACHES.get(alias, {}).get('BACKEND')
+        in PROCESS_LOCAL_BACKENDS
+    ]
@@ -0,0 +1,30 @@
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.http.multipartparser import MultiPartParserError
+
+
+class LimitedTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    """
+    Загрузка файлов сразу во временный файл, без копии в памяти.
+    Загрузка прерывается, как только файл превысил FILE_UPLOAD_MAX_SIZE.
+    """
+    def new_file(self, field_name, file_name, content_type, content_length,
+                 *args, **kwargs):
+        if content_length and content_length > settings.FILE_UPLOAD_MAX_SIZE:
+            self.file_too_large(file_name)
+        super().new_file(
+            field_name, file_name, content_type, content_length,
+            *args, **kwargs
+        )
+
+    def receive_data_chunk(self, raw_data, start):
+        if start + len(raw_data) > settings.FILE_UPLOAD_MAX_SIZE:
+            self.file_too_large(self.file_name)
+        return super().receive_data_chunk(raw_data, start)
+
+    @staticmethod
+    def file_too_large(file_name):
+        raise MultiPartParserError(
+            f'Файл {file_name} больше '
+            f'{settings.FILE_UPLOAD_MAX_SIZE // (1024 * 1024)} МБ.'
+        )
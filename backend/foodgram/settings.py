@@ -1,4 +1,6 @@
 import os
+from datetime import timedelta
+
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -30,6 +32,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -72,6 +75,99 @@ DATABASES = {
 
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
+    },
+    'stamps': {
+        'BACKEND': os.getenv(
+            'STAMP_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'STAMP_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'stamps')
+        ),
+        'TIMEOUT': None,
+    },
+    'responses': {
+        'BACKEND': os.getenv(
+            'RESPONSE_CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache'
+        ),
+        'LOCATION': os.getenv(
+            'RESPONSE_CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache', 'responses')
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+}
+
+STAMP_CACHE_ALIAS = 'stamps'
+
+RESPONSE_CACHE_ALIAS = 'responses'
+
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', 300))
+
+RESPONSE_CACHE_AUTHENTICATED = (
+    os.getenv('RESPONSE_CACHE_AUTHENTICATED', 'False') == 'True'
+)
+
+INGREDIENT_INDEX_CHECK_INTERVAL = 1
+
+RECIPE_INGREDIENT_INDEX_CHECK_INTERVAL = 1
+
+CATALOG_CHECK_INTERVAL = 1
+
+REQUEST_PROFILING_RATE = float(os.getenv('REQUEST_PROFILING_RATE', 0))
+
+REQUEST_PROFILING_WINDOW = int(os.getenv('REQUEST_PROFILING_WINDOW', 15))
+
+RECIPE_IMAGE_MAX_BYTES = int(
+    os.getenv('RECIPE_IMAGE_MAX_BYTES', 10 * 1024 * 1024)
+)
+
+RECIPE_IMAGE_MAX_PIXELS = int(os.getenv('RECIPE_IMAGE_MAX_PIXELS', 40000000))
+
+RECIPE_IMAGE_VARIANTS = (
+    ('thumbnail', 240),
+    ('card', 600),
+    ('full', 1200),
+)
+
+RECIPE_IMAGE_VARIANT_QUALITY = 80
+
+RECIPE_IMAGE_VARIANT_WORKERS = int(
+    os.getenv('RECIPE_IMAGE_VARIANT_WORKERS', 1)
+)
+
+SIMILAR_RECIPES_COUNT = 10
+
+SIMILAR_RECIPES_MAX_FEATURE_RECIPES = 1000
+
+RECIPE_SCORE_HALF_LIVES = {
+    'popular': timedelta(days=30),
+    'trending': timedelta(days=1),
+}
+
+RECIPE_SCORE_WEIGHTS = {
+    'favorite': 1.0,
+    'shopping_cart': 0.5,
+}
+
+FILE_UPLOAD_HANDLERS = (
+    'core.uploadhandlers.LimitedTemporaryFileUploadHandler',
+)
+
+FILE_UPLOAD_MAX_SIZE = RECIPE_IMAGE_MAX_BYTES
+
+CATALOGS_STATIC_EXPORT = (
+    os.getenv('CATALOGS_STATIC_EXPORT', 'False') == 'True'
+)
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -1,7 +1,9 @@
 from django.contrib import admin
+from django.utils.html import format_html
 
+from core.admin import LargeTableAdmin, ObjectDeleteAdmin
 from .models import (Tag, Ingredient, IngredientInRecipe, Recipe,
-                     FavoriteRecipes, ShoppingCart)
+                     FavoriteRecipes, ShoppingCart, ShoppingListItem)
 
 
 @admin.register(Tag)
@@ -37,25 +39,27 @@ class IngredientAdmin(admin.ModelAdmin):
 class IngInRecipeAdmin(admin.TabularInline):
     """Чтобы добавлять ингридиенты на странице рецепта."""
     model = IngredientInRecipe
+    autocomplete_fields = ('ingredient', )
     min_num = 1
     extra = 0
 
 
 @admin.register(Recipe)
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     """Настройка рецепта для админке."""
     list_display = (
         'name',
-        'author',
+        'author_link',
         'added_favorites'
     )
+    list_select_related = ('author', )
     list_filter = (
-        'author',
-        'tags__name'
+        'tags__name',
     )
     search_fields = (
         'name__istartswith',
     )
+    autocomplete_fields = ('author', )
     filter_horizontal = ('tags', )
     inlines = (IngInRecipeAdmin, )
     fields = (
@@ -67,44 +71,79 @@ class RecipeAdmin(admin.ModelAdmin):
     )
     readonly_fields = ('added_favorites', )
 
+    def save_related(self, request, form, formsets, change):
+        ShoppingListItem.objects.remove_recipe(form.instance.pk)
+        super().save_related(request, form, formsets, change)
+        ShoppingListItem.objects.add_recipe(form.instance.pk)
+        form.instance.update_ingredient_names()
+
+    def author_link(self, obj):
+        return format_html(
+            '<a href="?author__id__exact={}">{}</a>',
+            obj.author_id, obj.author
+        )
+
     def added_favorites(self, obj):
-        return obj.favorite_recipe.count()
+        return obj.favorites_count
 
+    author_link.short_description = 'Автор рецепта'
+    author_link.admin_order_field = 'author'
     added_favorites.short_description = 'Добавили в избранное'
+    added_favorites.admin_order_field = 'favorites_count'
 
 
 @admin.register(IngredientInRecipe)
-class IngredientInRecipeAdmin(admin.ModelAdmin):
-    """Настройка ингридиента в рецепте для админке."""
+class IngredientInRecipeAdmin(LargeTableAdmin):
+    """
+    Настройка ингридиента в рецепте для админке: только просмотр.
+    Ингридиенты меняются на странице рецепта, где вместе с ними
+    обновляются списки покупок, названия для поиска и updated_at.
+    """
     list_display = (
         'recipe',
         'ingredient',
         'amount'
     )
+    list_select_related = ('recipe', 'ingredient')
     search_fields = (
-        'recipe__istartswith',
+        'recipe__name__istartswith',
     )
 
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 
 @admin.register(FavoriteRecipes)
-class FavoriteRecipesAdmin(admin.ModelAdmin):
+class FavoriteRecipesAdmin(ObjectDeleteAdmin):
     """Настройка избранного для админке."""
     list_display = (
         'user',
-        'recipe'
+        'recipe',
+        'created_at'
     )
+    list_select_related = ('user', 'recipe')
     search_fields = (
-        'user__istartswith',
+        'user__username__istartswith',
     )
+    autocomplete_fields = ('user', 'recipe')
 
 
 @admin.register(ShoppingCart)
-class ShoppingCartAdmin(admin.ModelAdmin):
+class ShoppingCartAdmin(ObjectDeleteAdmin):
     """Настройка списка покупок для админке."""
     list_display = (
         'user',
-        'recipe'
+        'recipe',
+        'created_at'
     )
+    list_select_related = ('user', 'recipe')
     search_fields = (
-        'user__istartswith',
+        'user__username__istartswith',
     )
+    autocomplete_fields = ('user', 'recipe')
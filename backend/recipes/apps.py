@@ -1,5 +1,12 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class RecipesConfig(AppConfig):
     name = 'recipes'
+
+    def ready(self):
+        from core import stamps  # noqa: F401
+        from . import signals
+
+        post_migrate.connect(signals.install_search_indexes, sender=self)
@@ -0,0 +1,171 @@
+"""
+Уменьшенные копии изображений рецептов.
+
+Для изображения рецепта строятся копии нескольких ширин (миниатюра,
+карточка, полный размер) в WebP и JPEG. Копии строятся после сохранения
+рецепта в пуле потоков, вне обработки запроса; пока они не готовы,
+клиенты получают исходное изображение. Копии, которые не успели
+построиться (например, процесс перезапустился), достраивает команда
+build_image_variants.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'recipes/variants'
+FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def variant_name(image_name, variant, extension):
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    return f'{VARIANTS_DIR}/{stem}.{variant}.{extension}'
+
+
+def variant_widths(image_width):
+    """
+    Копии изображения: тройки (копия, ширина, копия с файлом).
+    Файлы строятся для копий уже исходного изображения и для одной
+    копии исходной ширины, более широкие копии ссылаются на её файл.
+    """
+    variants, source = [], None
+    for variant, width in settings.RECIPE_IMAGE_VARIANTS:
+        if source is not None:
+            variants.append((variant, image_width, source))
+        elif width < image_width:
+            variants.append((variant, width, variant))
+        else:
+            source = variant
+            variants.append((variant, image_width, variant))
+    return tuple(variants)
+
+
+def _encode(image, image_format):
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        if 'A' in image.getbands():
+            background = Image.new('RGB', image.size, 'white')
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(
+        buffer, image_format,
+        quality=settings.RECIPE_IMAGE_VARIANT_QUALITY, optimize=True
+    )
+    return buffer.getvalue()
+
+
+def _save(name, content):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(content))
+
+
+def build(image_name):
+    """
+    Построение копий изображения image_name. Копии уменьшаются
+    от большей к меньшей, каждая из предыдущей. Возвращает ширину
+    исходного изображения.
+    """
+    largest = max(width for _, width in settings.RECIPE_IMAGE_VARIANTS)
+    with default_storage.open(image_name) as file:
+        with Image.open(file) as image:
+            image.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(image)
+            if image.mode not in ('RGB', 'RGBA'):
+                transparent = (
+                    'A' in image.getbands() or 'transparency' in image.info
+                )
+                image = image.convert('RGBA' if transparent else 'RGB')
+    image_width = image.width
+    widths = sorted(
+        (
+            (variant, width)
+            for variant, width, source in variant_widths(image_width)
+            if variant == source
+        ),
+        key=lambda item: item[1], reverse=True
+    )
+    for variant, width in widths:
+        if width < image.width:
+            image = image.resize(
+                (width, max(1, round(image.height * width / image.width))),
+                Image.LANCZOS
+            )
+        for extension, image_format in FORMATS:
+            _save(
+                variant_name(image_name, variant, extension),
+                _encode(image, image_format)
+            )
+    return image_width
+
+
+def delete(image_name):
+    """Удаление копий изображения image_name."""
+    for variant, _ in settings.RECIPE_IMAGE_VARIANTS:
+        for extension, _ in FORMATS:
+            default_storage.delete(
+                variant_name(image_name, variant, extension)
+            )
+
+
+def build_for_recipe(pk, force=False):
+    """
+    Построение копий изображения рецепта pk, если их ещё нет
+    или если force. Возвращает True, если копии построены.
+    """
+    from .models import Recipe
+
+    recipe = Recipe.objects.filter(pk=pk).first()
+    if recipe is None or not recipe.image:
+        return False
+    if recipe.has_image_variants and not force:
+        return False
+    stale = recipe.image_variants_for
+    image_width = build(recipe.image.name)
+    Recipe.objects.filter(pk=pk, image=recipe.image.name).update(
+        image_width=image_width, image_variants_for=recipe.image.name
+    )
+    if stale and stale != recipe.image.name:
+        delete(stale)
+    return True
+
+
+def _run(pk):
+    try:
+        build_for_recipe(pk)
+    except Exception:
+        logger.exception('Не удалось построить копии изображения '
+                         'рецепта %s', pk)
+    finally:
+        connections.close_all()
+
+
+def schedule(pk):
+    """
+    Построение копий изображения рецепта pk в фоновом потоке.
+    При RECIPE_IMAGE_VARIANT_WORKERS = 0 копии строит только команда.
+    """
+    global _executor
+    if not settings.RECIPE_IMAGE_VARIANT_WORKERS:
+        return
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                settings.RECIPE_IMAGE_VARIANT_WORKERS,
+                thread_name_prefix='image-variants'
+            )
+    _executor.submit(_run, pk)
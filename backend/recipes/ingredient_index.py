@@ -0,0 +1,108 @@
+"""
+Индекс ингридиентов в памяти процесса для автодополнения.
+
+Каталог ингридиентов небольшой и меняется редко, поэтому поиск по имени
+выполняется без обращения к базе: сначала совпадения по началу названия,
+затем совпадения по подстроке. Актуальность индекса между воркерами
+проверяется по метке версии из core.stamps, общей для всех процессов,
+которую меняют сигналы модели Ingredient.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+
+from core.stamps import bump_stamp, get_stamp
+
+VERSION_CACHE_KEY = 'recipes:ingredient_index:version'
+PREFIX_END = '\U0010ffff'
+
+
+def fold(value):
+    """Приведение строки к виду для сравнения без учёта регистра и ё."""
+    return value.casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """Отсортированный индекс названий ингридиентов."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+        self._version = None
+        self._next_check = 0
+
+    def _build(self):
+        from .models import Ingredient
+
+        rows = sorted(
+            (fold(name), name, measurement_unit, pk)
+            for pk, name, measurement_unit in Ingredient.objects.values_list(
+                'pk', 'name', 'measurement_unit'
+            )
+        )
+        items = tuple(
+            {'id': pk, 'name': name, 'measurement_unit': measurement_unit}
+            for _, name, measurement_unit, pk in rows
+        )
+        keys = [row[0] for row in rows]
+        by_id = {item['id']: item for item in items}
+        return keys, items, by_id
+
+    def _current(self):
+        """Актуальные данные индекса, при необходимости перестроенные."""
+        data, now = self._data, time.monotonic()
+        if data is not None and now < self._next_check:
+            return data
+        with self._lock:
+            version = get_stamp(VERSION_CACHE_KEY)
+            if self._data is None or version != self._version:
+                self._data = self._build()
+                self._version = version
+            self._next_check = now + settings.INGREDIENT_INDEX_CHECK_INTERVAL
+            return self._data
+
+    def invalidate(self):
+        """Сброс индекса во всех процессах."""
+        bump_stamp(VERSION_CACHE_KEY)
+        self._data = None
+
+    def version(self):
+        """Версия индекса, меняется вместе с каталогом."""
+        self._current()
+        return self._version
+
+    def all(self):
+        """Все ингридиенты в порядке названия."""
+        return list(self._current()[1])
+
+    def get(self, pk):
+        """Ингридиент по id или None."""
+        return self._current()[2].get(pk)
+
+    def search(self, name):
+        """
+        Поиск по названию: сначала ингридиенты, название которых
+        начинается с name, затем содержащие name, причём совпадения
+        с начала слова идут раньше совпадений внутри слова.
+        """
+        keys, items, _ = self._current()
+        query = fold(name)
+        start = bisect_left(keys, query)
+        end = bisect_right(keys, query + PREFIX_END, lo=start)
+        ranked = []
+        for index, key in enumerate(keys):
+            if start <= index < end:
+                continue
+            position = key.find(query)
+            if position > 0:
+                word_start = not key[position - 1].isalnum()
+                ranked.append((not word_start, position, index))
+        ranked.sort()
+        return (
+            list(items[start:end])
+            + [items[index] for _, _, index in ranked]
+        )
+
+
+ingredient_index = IngredientIndex()
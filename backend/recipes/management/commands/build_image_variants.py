@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes import image_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Построение копий изображений рецептов, для которых их ещё нет:
+    загруженных до появления копий или не обработанных в фоне.
+    """
+    help = ('Строит уменьшенные копии изображений рецептов, у которых '
+            'их нет, или, с --all, у всех рецептов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Перестроить копии у всех рецептов, например после '
+                 'изменения RECIPE_IMAGE_VARIANTS.'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        qs = Recipe.objects.exclude(image='') if options['all'] else (
+            Recipe.objects.without_image_variants()
+        )
+        built = failed = 0
+        for pk in qs.order_by('pk').values_list('pk', flat=True).iterator():
+            try:
+                built += image_variants.build_for_recipe(
+                    pk, force=options['all']
+                )
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {pk}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Копии построены для {built} рецептов за '
+            f'{time.perf_counter() - start:.1f} с.'
+        ))
+        if failed:
+            self.stderr.write(f'Не удалось обработать рецептов: {failed}')
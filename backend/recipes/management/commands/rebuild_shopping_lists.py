@@ -0,0 +1,55 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from recipes.models import ShoppingListItem
+
+MAX_REPORTED = 20
+
+
+class Command(BaseCommand):
+    """
+    Пересчёт таблицы списков покупок по рецептам в списках покупок
+    или проверка её на расхождения.
+    """
+    help = ('Пересчитывает суммарные списки покупок или, с --verify, '
+            'проверяет их на расхождения.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только проверить списки покупок, ничего не изменяя.'
+        )
+        parser.add_argument(
+            '--users', nargs='+', type=int,
+            help='id пользователей, для которых выполнить команду.'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        if options['verify']:
+            self.verify(options['users'])
+            return
+        count = ShoppingListItem.objects.rebuild(options['users'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Списки покупок пересчитаны: {count} строк '
+            f'за {time.perf_counter() - start:.1f} с.'
+        ))
+
+    def verify(self, user_ids):
+        count = 0
+        for user, ingredient, expected, actual in (
+            ShoppingListItem.objects.diff(user_ids)
+        ):
+            count += 1
+            if count <= MAX_REPORTED:
+                self.stdout.write(
+                    f'Пользователь {user}, ингридиент {ingredient}: '
+                    f'ожидается {expected}, в таблице {actual}'
+                )
+        if count:
+            raise CommandError(
+                f'Расхождений в списках покупок: {count}. '
+                'Запустите команду без --verify для пересчёта.'
+            )
+        self.stdout.write(self.style.SUCCESS('Расхождений не найдено.'))
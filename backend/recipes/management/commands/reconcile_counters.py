@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from recipes.models import FavoriteRecipes, Recipe, ShoppingCart
+from users.models import Follow, User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', FavoriteRecipes, 'recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Follow, 'author'),
+)
+
+
+class Command(BaseCommand):
+    """
+    Сверка денормализованных счётчиков рецептов и пользователей
+    с данными и исправление расхождений.
+    """
+    help = ('Пересчитывает счётчики избранного, списков покупок, рецептов '
+            'и подписчиков там, где они разошлись с данными.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только проверить счётчики, ничего не изменяя.'
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        fix = not options['verify']
+        total = 0
+        for model, field, related, lookup in COUNTERS:
+            with transaction.atomic():
+                count = model.objects.reconcile_counter(
+                    field, related.objects.all(), lookup, fix=fix
+                )
+            total += count
+            self.stdout.write(
+                f'{model._meta.label}.{field}: расхождений {count}'
+            )
+        if total and not fix:
+            raise CommandError(
+                f'Расхождений в счётчиках: {total}. '
+                'Запустите команду без --verify для исправления.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики сверены за {time.perf_counter() - start:.1f} с.'
+        ))
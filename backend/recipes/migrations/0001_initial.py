@@ -0,0 +1,143 @@
+# Generated by Django 2.2.19 on 2026-10-18 21:01
+
+import colorfield.fields
+import core.enum
+import django.core.validators
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FavoriteRecipes',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления')),
+            ],
+            options={
+                'verbose_name': 'Избранный рецепт',
+                'verbose_name_plural': 'Избранные рецепты',
+            },
+        ),
+        migrations.CreateModel(
+            name='Ingredient',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Название ингридиента')),
+                ('measurement_unit', models.SlugField(max_length=200, verbose_name='Единица измерения')),
+            ],
+            options={
+                'verbose_name': 'Ингридиент',
+                'verbose_name_plural': 'Ингридиенты',
+                'ordering': ('name',),
+            },
+        ),
+        migrations.CreateModel(
+            name='IngredientInRecipe',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(limit_value=core.enum.MinLimit(1), message=core.enum.Message('Количество ингридиента должно быть >= 1'))], verbose_name='Количество')),
+            ],
+            options={
+                'verbose_name': 'Ингридиент в рецепте',
+                'verbose_name_plural': 'Ингридиенты в рецепте',
+                'ordering': ('recipe',),
+            },
+        ),
+        migrations.CreateModel(
+            name='Recipe',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Название рецепта')),
+                ('image', models.ImageField(upload_to='recipes/images/', verbose_name='Изображение рецепта')),
+                ('image_width', models.PositiveIntegerField(editable=False, null=True, verbose_name='Ширина изображения')),
+                ('image_variants_for', models.CharField(blank=True, default='', editable=False, max_length=100, verbose_name='Изображение, для которого построены копии')),
+                ('text', models.TextField(verbose_name='Описание рецепта')),
+                ('cooking_time', models.PositiveIntegerField(validators=[django.core.validators.MinValueValidator(limit_value=core.enum.MinLimit(1), message=core.enum.Message('Время приготовление должно быть >= 1'))], verbose_name='Время приготовления')),
+                ('pub_date', models.DateTimeField(auto_now_add=True, verbose_name='Дата публикации рецепта')),
+                ('updated_at', models.DateTimeField(auto_now=True, db_index=True, verbose_name='Дата изменения рецепта')),
+                ('ingredient_names', models.TextField(blank=True, default='', editable=False, verbose_name='Названия ингридиентов для поиска')),
+                ('favorites_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавили в избранное')),
+                ('in_carts_count', models.PositiveIntegerField(default=0, editable=False, verbose_name='Добавили в список покупок')),
+                ('similar_updated_at', models.DateTimeField(editable=False, null=True, verbose_name='Дата расчёта похожих рецептов')),
+                ('popular_score', models.FloatField(default=0, editable=False, verbose_name='Популярность')),
+                ('trending_score', models.FloatField(default=0, editable=False, verbose_name='Популярность за последние дни')),
+            ],
+            options={
+                'verbose_name': 'Рецепт',
+                'verbose_name_plural': 'Рецепты',
+                'ordering': ('-pub_date', '-id'),
+            },
+        ),
+        migrations.CreateModel(
+            name='ScoreUpdate',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('calculated_at', models.DateTimeField(verbose_name='Время пересчёта')),
+            ],
+            options={
+                'verbose_name': 'Пересчёт популярности',
+                'verbose_name_plural': 'Пересчёты популярности',
+            },
+        ),
+        migrations.CreateModel(
+            name='ShoppingCart',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Дата добавления')),
+            ],
+            options={
+                'verbose_name': 'Список покупок',
+                'verbose_name_plural': 'Списки покупок',
+            },
+        ),
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, unique=True, validators=[django.core.validators.RegexValidator(message=core.enum.Message('Название должно начинаться с заглавной буквы и только буквы русского алфавита'), regex=core.enum.Regex('^[А-ЯЁ][а-яё]+$'))], verbose_name='Название тега')),
+                ('color', colorfield.fields.ColorField(default='#FFFFFF', image_field=None, max_length=25, samples=None, verbose_name='Цвет тега')),
+                ('slug', models.SlugField(max_length=200, unique=True, verbose_name='Описание тега')),
+            ],
+            options={
+                'verbose_name': 'Тег',
+                'verbose_name_plural': 'Теги',
+                'ordering': ('name',),
+            },
+        ),
+        migrations.CreateModel(
+            name='SimilarRecipe',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Похожесть')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Место')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_recipes', to='recipes.Recipe', verbose_name='Рецепт')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_to', to='recipes.Recipe', verbose_name='Похожий рецепт')),
+            ],
+            options={
+                'verbose_name': 'Похожий рецепт',
+                'verbose_name_plural': 'Похожие рецепты',
+                'ordering': ('recipe', 'rank'),
+            },
+        ),
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total', models.IntegerField(default=0, verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to='recipes.Ingredient', verbose_name='Ингридиент')),
+            ],
+            options={
+                'verbose_name': 'Ингридиент в списке покупок',
+                'verbose_name_plural': 'Ингридиенты в списках покупок',
+            },
+        ),
+    ]
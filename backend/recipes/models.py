@@ -1,10 +1,25 @@
+from itertools import islice
+
 from colorfield.fields import ColorField
 
-from django.db import models
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce, RowNumber
+from django.utils import timezone
 from django.core.validators import RegexValidator, MinValueValidator
 
-from users.models import User
+from users.models import User, Follow
 from core.enum import Regex, Message, MinLimit
+from core.querysets import CounterQuerySet, UserLinkQuerySet
+from .recipe_index import recipe_ingredient_index
+from .search import get_search_sql
+
+REBUILD_BATCH_SIZE = 5000
+SCORE_BATCH_SIZE = 5000
+SCORE_MIN = 0.001
+SCORE_HISTORY_HALF_LIVES = 10
+SCORE_REBUILD_STEPS = 4
 
 
 class IngredientQuerySet(models.QuerySet):
@@ -13,6 +28,30 @@ class IngredientQuerySet(models.QuerySet):
         """Метод для фильтрации по названию ингридиента."""
         return self.filter(name__istartswith=name).order_by('name')
 
+    def insert_missing(self, rows):
+        """
+        Метод для вставки пар (название, единица измерения) пакетами
+        без создания объектов модели. Уже существующие пары пропускаются
+        базой по ограничению уникальности.
+        """
+        connection = connections[self.db]
+        ops = connection.ops
+        fields = ('name', 'measurement_unit')
+        sql = '{} {} ({}) VALUES {{}} {}'.format(
+            ops.insert_statement(ignore_conflicts=True),
+            ops.quote_name(self.model._meta.db_table),
+            ', '.join(ops.quote_name(field) for field in fields),
+            ops.ignore_conflicts_suffix_sql(ignore_conflicts=True)
+        )
+        batch_size = ops.bulk_batch_size(fields, rows) or len(rows)
+        with connection.cursor() as cursor:
+            for start in range(0, len(rows), batch_size):
+                batch = rows[start:start + batch_size]
+                cursor.execute(
+                    sql.format(', '.join(['(%s, %s)'] * len(batch))),
+                    [value for row in batch for value in row]
+                )
+
 
 class Ingredient(models.Model):
     """Модель ингридиента."""
@@ -71,19 +110,97 @@ class Tag(models.Model):
         return self.name
 
 
-class RecipeQuerySet(models.QuerySet):
+class RankedSubquery(models.Subquery):
+    """
+    Подзапрос id строк queryset с номером row_number не больше limit
+    для фильтра pk__in. Запрос компилируется вместе с внешним,
+    а не заранее; скобки вокруг него добавляет сам поиск __in.
+    """
+    template = (
+        'SELECT "id" FROM (%(subquery)s) AS "ranked" '
+        'WHERE "row_number" <= %%s'
+    )
+
+    def __init__(self, queryset, limit, **extra):
+        super().__init__(queryset, **extra)
+        self.limit = limit
+
+    def as_sql(self, *args, **kwargs):
+        sql, params = super().as_sql(*args, **kwargs)
+        return sql, (*params, self.limit)
+
+
+class RecipeQuerySet(CounterQuerySet):
     """QuerySet для рецепта."""
     def filter_by_tags(self, tags):
-        """Метод для фильтрации по тегам."""
-        return self.filter(
-            tags__slug__in=tags).distinct().order_by('-pub_date')
+        """
+        Метод для фильтрации по тегам: EXISTS по связям рецепта
+        с тегами вместо JOIN, поэтому DISTINCT не нужен.
+        """
+        return self.annotate(has_tags=models.Exists(
+            self.model.tags.through.objects.filter(
+                recipe_id=models.OuterRef('pk'), tag__slug__in=tags
+            )
+        )).filter(has_tags=True)
+
+    def filter_by_ids(self, recipe_ids, exclude=False):
+        """
+        Метод для фильтрации по списку id рецептов (или, с exclude,
+        для исключения). В PostgreSQL список передаётся одним
+        параметром-массивом, а не параметром на каждый id.
+        """
+        recipe_ids = sorted(recipe_ids)
+        if connections[self.db].vendor != 'postgresql':
+            if exclude:
+                return self.exclude(pk__in=recipe_ids)
+            return self.filter(pk__in=recipe_ids)
+        condition = '<> ALL(%s)' if exclude else '= ANY(%s)'
+        return self.extra(
+            where=[f'"{self.model._meta.db_table}"."id" {condition}'],
+            params=(recipe_ids, )
+        )
+
+    def filter_by_ingredients(self, include=(), exclude=(), available=None,
+                              max_missing=0):
+        """
+        Метод для подбора рецептов по ингридиентам: со всеми include,
+        без exclude и, если передан available, с не больше чем
+        max_missing ингридиентами не из available. Множества считаются
+        по индексу в памяти, в запрос попадают только id рецептов.
+        """
+        if not (include or exclude or available is not None):
+            return self
+        recipe_ids, excluded = recipe_ingredient_index.match(
+            include, exclude, available, max_missing
+        )
+        if recipe_ids is not None:
+            if not recipe_ids:
+                return self.none()
+            return self.filter_by_ids(recipe_ids)
+        if excluded:
+            return self.filter_by_ids(excluded, exclude=True)
+        return self
 
     def add_annotations(self, user_id):
         """
         Метод для добавления новых полей в модель рецепта при помощи annotate.
+        Автор, теги и ингридиенты загружаются заранее, чтобы число
+        запросов не зависело от количества рецептов на странице.
         """
-        return self.annotate(
-            recipes_count=models.Count('recipe'),
+        return self.select_related('author').prefetch_related(
+            'tags',
+            models.Prefetch(
+                'recipe',
+                queryset=IngredientInRecipe.objects.select_related(
+                    'ingredient'
+                ).order_by('pk')
+            )
+        ).annotate(
+            is_subscribed=models.Exists(
+                Follow.objects.filter(
+                    user_id=user_id, author=models.OuterRef('author')
+                )
+            ),
             is_favorited=models.Exists(
                 FavoriteRecipes.objects.filter(
                     user_id=user_id, recipe__pk=models.OuterRef('pk')
@@ -97,26 +214,202 @@ class RecipeQuerySet(models.QuerySet):
         )
 
     def filter_in_favorite(self, is_favorited):
-        """Метод для фильтрации по избранным."""
-        if is_favorited == '1':
-            return self.filter(
-                is_favorited=True).order_by('-pub_date')
-        elif is_favorited == '0':
-            return self.exclude(
-                is_favorited=False).order_by('-pub_date')
+        """
+        Метод для фильтрации по избранному: 1 — только избранные
+        рецепты, 0 — только не избранные. Условие — EXISTS
+        из add_annotations, другие значения не фильтруют.
+        """
+        if is_favorited not in ('0', '1'):
+            return self
+        return self.filter(is_favorited=is_favorited == '1')
 
     def filter_in_shopping_cart(self, is_in_shopping_cart):
-        """Метод для фильтрации по списку покупок."""
-        if is_in_shopping_cart == '1':
-            return self.filter(
-                is_in_shopping_cart=True).order_by('-pub_date')
-        elif is_in_shopping_cart == '0':
-            return self.exclude(
-                is_in_shopping_cart=False).order_by('-pub_date')
+        """
+        Метод для фильтрации по списку покупок: 1 — только рецепты
+        из списка, 0 — только не из списка. Условие — EXISTS
+        из add_annotations, другие значения не фильтруют.
+        """
+        if is_in_shopping_cart not in ('0', '1'):
+            return self
+        return self.filter(is_in_shopping_cart=is_in_shopping_cart == '1')
 
     def filter_by_author(self, author):
         """Метод для фильтрации по автору."""
-        return self.filter(author=author).order_by('-pub_date')
+        return self.filter(author=author)
+
+    def feed(self, user_id):
+        """
+        Метод для ленты рецептов авторов, на которых подписан
+        пользователь: полусоединение с подписками по индексу
+        (автор, дата публикации).
+        """
+        return self.filter(author_id__in=Follow.objects.filter(
+            user_id=user_id
+        ).values('author_id')).order_by('-pub_date', '-id')
+
+    def search(self, query):
+        """
+        Метод для полнотекстового поиска по названию, ингридиентам
+        и описанию с сортировкой по релевантности.
+        """
+        search_sql = get_search_sql(connections[self.db], query)
+        if search_sql is None:
+            return self.none()
+        match, match_params, rank, rank_params = search_sql
+        return self.extra(where=[match], params=match_params).annotate(
+            search_rank=RawSQL(
+                rank, rank_params, output_field=models.FloatField()
+            )
+        ).order_by('-search_rank', '-pub_date')
+
+    def get_version(self):
+        """
+        Метод для получения числа рецептов и времени последнего
+        изменения среди них, без загрузки самих рецептов. Аннотации
+        из add_annotations для подсчёта не нужны (условия WHERE
+        содержат свои копии выражений) и убираются, иначе агрегат
+        считался бы по подзапросу с EXISTS для каждой строки.
+        """
+        qs = self.order_by()
+        qs.query.annotations.clear()
+        qs.query.set_annotation_mask(None)
+        return qs.aggregate(
+            count=models.Count('pk'), modified=models.Max('updated_at')
+        )
+
+    def order_by_score(self, name):
+        """Метод для сортировки по оценке популярности name."""
+        return self.order_by(f'-{name}_score', '-id')
+
+    def decay_scores(self, since, until):
+        """
+        Метод для пересчёта оценок популярности на момент until:
+        оценки на момент since уменьшаются вдвое за каждый период
+        полураспада из RECIPE_SCORE_HALF_LIVES, к ним добавляются
+        добавления в избранное и списки покупок за это время, считая
+        их сделанными в середине промежутка. Рецепты обновляются
+        запросами UPDATE по диапазонам id; оценки меньше SCORE_MIN
+        обнуляются, и рецепты без оценок и активности не обновляются.
+        """
+        activity = []
+        active = models.Q()
+        for model, name in (
+            (FavoriteRecipes, 'favorite'), (ShoppingCart, 'shopping_cart')
+        ):
+            added = model.objects.filter(
+                created_at__gt=since, created_at__lte=until
+            )
+            active |= models.Q(pk__in=added.values('recipe_id'))
+            activity.append(Coalesce(models.Subquery(
+                added.filter(recipe_id=models.OuterRef('pk')).order_by(
+                ).values('recipe_id').annotate(
+                    count=models.Count('pk')
+                ).values('count'),
+                output_field=models.IntegerField()
+            ), 0) * settings.RECIPE_SCORE_WEIGHTS[name])
+        activity = models.ExpressionWrapper(
+            activity[0] + activity[1], output_field=models.FloatField()
+        )
+        elapsed = (until - since).total_seconds()
+        scores = {}
+        for name, half_life in settings.RECIPE_SCORE_HALF_LIVES.items():
+            field = f'{name}_score'
+            active |= models.Q(**{f'{field}__gt': 0})
+            decay = 0.5 ** (elapsed / half_life.total_seconds())
+            added = activity * decay ** 0.5
+            if decay * SCORE_MIN == 0:
+                scores[field] = added
+                continue
+            scores[field] = models.Case(
+                models.When(
+                    **{f'{field}__lt': SCORE_MIN / decay}, then=added
+                ),
+                default=models.F(field) * decay + added,
+                output_field=models.FloatField()
+            )
+        bounds = self.aggregate(
+            first=models.Min('pk'), last=models.Max('pk')
+        )
+        if bounds['first'] is None:
+            return 0
+        updated = 0
+        for start in range(
+            bounds['first'], bounds['last'] + 1, SCORE_BATCH_SIZE
+        ):
+            updated += self.filter(
+                active, pk__gte=start, pk__lt=start + SCORE_BATCH_SIZE
+            ).update(**scores)
+        return updated
+
+    def rebuild_scores(self, until):
+        """
+        Метод для расчёта оценок популярности заново по истории
+        добавлений: оценки обнуляются, и активность учитывается окнами
+        в SCORE_REBUILD_STEPS раз короче самого короткого периода
+        полураспада. Добавления старше SCORE_HISTORY_HALF_LIVES самых
+        длинных периодов не учитываются.
+        """
+        half_lives = settings.RECIPE_SCORE_HALF_LIVES.values()
+        step = min(half_lives) / SCORE_REBUILD_STEPS
+        since = until - max(half_lives) * SCORE_HISTORY_HALF_LIVES
+        first = min(
+            (
+                value for value in (
+                    model.objects.filter(created_at__gt=since).aggregate(
+                        first=models.Min('created_at')
+                    )['first']
+                    for model in (FavoriteRecipes, ShoppingCart)
+                ) if value is not None
+            ),
+            default=until
+        )
+        since = max(since, first - step)
+        self.update(**{
+            f'{name}_score': 0 for name in settings.RECIPE_SCORE_HALF_LIVES
+        })
+        while since < until:
+            window_end = min(since + step, until)
+            self.decay_scores(since, window_end)
+            since = window_end
+
+    def similar(self, recipe_id):
+        """Метод для выборки рецептов, похожих на рецепт recipe_id."""
+        return self.filter(similar_to__recipe_id=recipe_id).order_by(
+            'similar_to__rank'
+        )
+
+    def without_similar(self):
+        """
+        Метод для выборки рецептов, изменённых после расчёта похожих
+        или ещё без него.
+        """
+        return self.filter(
+            models.Q(similar_updated_at__isnull=True)
+            | models.Q(similar_updated_at__lt=models.F('updated_at'))
+        )
+
+    def without_image_variants(self):
+        """Метод для выборки рецептов без копий текущего изображения."""
+        return self.exclude(image='').exclude(
+            image_variants_for=models.F('image')
+        )
+
+    def latest_by_authors(self, author_ids, limit=None):
+        """
+        Метод для выборки последних limit рецептов каждого автора
+        одним запросом с ROW_NUMBER() по автору.
+        """
+        qs = self.filter(author_id__in=author_ids).order_by('-pub_date', '-pk')
+        if limit is None:
+            return qs
+        ranked = self.filter(author_id__in=author_ids).annotate(
+            row_number=models.Window(
+                expression=RowNumber(),
+                partition_by=[models.F('author_id')],
+                order_by=[models.F('pub_date').desc(), models.F('pk').desc()]
+            )
+        ).order_by().values('pk', 'row_number')
+        return qs.filter(pk__in=RankedSubquery(ranked, limit))
 
 
 class Recipe(models.Model):
@@ -145,6 +438,18 @@ class Recipe(models.Model):
         verbose_name='Изображение рецепта',
         upload_to='recipes/images/',
     )
+    image_width = models.PositiveIntegerField(
+        verbose_name='Ширина изображения',
+        null=True,
+        editable=False
+    )
+    image_variants_for = models.CharField(
+        verbose_name='Изображение, для которого построены копии',
+        max_length=100,
+        blank=True,
+        default='',
+        editable=False
+    )
     text = models.TextField(
         verbose_name='Описание рецепта'
     )
@@ -158,17 +463,146 @@ class Recipe(models.Model):
         verbose_name='Дата публикации рецепта',
         auto_now_add=True
     )
+    updated_at = models.DateTimeField(
+        verbose_name='Дата изменения рецепта',
+        auto_now=True,
+        db_index=True
+    )
+    ingredient_names = models.TextField(
+        verbose_name='Названия ингридиентов для поиска',
+        blank=True,
+        default='',
+        editable=False
+    )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='Добавили в избранное',
+        default=0,
+        editable=False
+    )
+    in_carts_count = models.PositiveIntegerField(
+        verbose_name='Добавили в список покупок',
+        default=0,
+        editable=False
+    )
+    similar_updated_at = models.DateTimeField(
+        verbose_name='Дата расчёта похожих рецептов',
+        null=True,
+        editable=False
+    )
+    popular_score = models.FloatField(
+        verbose_name='Популярность',
+        default=0,
+        editable=False
+    )
+    trending_score = models.FloatField(
+        verbose_name='Популярность за последние дни',
+        default=0,
+        editable=False
+    )
 
     objects = RecipeQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('-popular_score', '-id'),
+                name='recipe_popular_score_idx'
+            ),
+            models.Index(
+                fields=('-trending_score', '-id'),
+                name='recipe_trending_score_idx'
+            ),
+        )
 
     def __str__(self):
         return self.name
 
+    @transaction.atomic(savepoint=False)
+    def save(self, *args, **kwargs):
+        previous = None
+        if not self._state.adding:
+            previous = Recipe.objects.filter(pk=self.pk).values_list(
+                'author_id', flat=True
+            ).first()
+        super().save(*args, **kwargs)
+        if previous == self.author_id:
+            return
+        if previous is not None:
+            User.objects.filter(pk=previous).change_counter(
+                'recipes_count', -1
+            )
+        User.objects.filter(pk=self.author_id).change_counter(
+            'recipes_count', 1
+        )
+
+    @property
+    def has_image_variants(self):
+        """Построены ли копии текущего изображения."""
+        return bool(self.image) and self.image_variants_for == self.image.name
+
+    def set_ingredients(self, amounts):
+        """
+        Метод для замены ингридиентов рецепта, amounts — словарь
+        id ингридиента -> количество. Удаляются, добавляются и меняются
+        только отличающиеся строки; списки покупок и названия для поиска
+        обновляются, только если ингридиенты изменились.
+        """
+        current = {
+            ingredient_id: (pk, amount)
+            for pk, ingredient_id, amount in IngredientInRecipe.objects.filter(
+                recipe=self
+            ).values_list('pk', 'ingredient_id', 'amount')
+        }
+        removed = [
+            pk for ingredient_id, (pk, _) in current.items()
+            if ingredient_id not in amounts
+        ]
+        added = [
+            IngredientInRecipe(
+                recipe=self, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        ]
+        changed = [
+            IngredientInRecipe(pk=current[ingredient_id][0], amount=amount)
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id in current
+            and current[ingredient_id][1] != amount
+        ]
+        if not (removed or added or changed):
+            return
+        ShoppingListItem.objects.remove_recipe(self.pk)
+        if removed:
+            IngredientInRecipe.objects.filter(pk__in=removed).delete()
+        if changed:
+            IngredientInRecipe.objects.bulk_update(changed, ('amount', ))
+        if added:
+            IngredientInRecipe.objects.bulk_create(added)
+        ShoppingListItem.objects.add_recipe(self.pk)
+        if removed or added:
+            self.update_ingredient_names()
+
+    def update_ingredient_names(self):
+        """Метод для обновления названий ингридиентов для поиска."""
+        self.ingredient_names = ' '.join(
+            self.ingredients.values_list('name', flat=True)
+        )
+        Recipe.objects.filter(pk=self.pk).update(
+            ingredient_names=self.ingredient_names
+        )
+
 
 class IngredientInRecipe(models.Model):
     """Модель ингридиента в рецепте."""
@@ -208,6 +642,48 @@ class IngredientInRecipe(models.Model):
                 f'{self.ingredient.measurement_unit}')
 
 
+class SimilarRecipe(models.Model):
+    """Модель похожего рецепта, рассчитанного заранее."""
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_recipes',
+        verbose_name='Рецепт'
+    )
+    similar = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='similar_to',
+        verbose_name='Похожий рецепт'
+    )
+    score = models.FloatField(
+        verbose_name='Похожесть'
+    )
+    rank = models.PositiveSmallIntegerField(
+        verbose_name='Место'
+    )
+
+    class Meta:
+        verbose_name = 'Похожий рецепт'
+        verbose_name_plural = 'Похожие рецепты'
+        ordering = ('recipe', 'rank')
+        constraints = [
+            models.UniqueConstraint(
+                fields=['recipe', 'rank'],
+                name='unique_similar_recipe_rank'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe_id} похож на {self.similar_id}'
+
+
+class FavoriteQuerySet(UserLinkQuerySet):
+    """QuerySet для избранного."""
+    target_field = 'recipe'
+    counter_field = 'favorites_count'
+
+
 class FavoriteRecipes(models.Model):
     """Модель избранного."""
     user = models.ForeignKey(
@@ -222,6 +698,13 @@ class FavoriteRecipes(models.Model):
         related_name='favorite_recipe',
         verbose_name='Рецепт в избранном'
     )
+    created_at = models.DateTimeField(
+        verbose_name='Дата добавления',
+        default=timezone.now,
+        db_index=True
+    )
+
+    objects = FavoriteQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Избранный рецепт'
@@ -236,6 +719,50 @@ class FavoriteRecipes(models.Model):
     def __str__(self):
         return f'{self.user.username} добавил {self.recipe.name} в избранное'
 
+    @transaction.atomic(savepoint=False)
+    def save(self, *args, **kwargs):
+        previous = None
+        if not self._state.adding:
+            previous = FavoriteRecipes.objects.filter(
+                pk=self.pk
+            ).values_list('recipe_id', flat=True).first()
+        super().save(*args, **kwargs)
+        if previous is not None:
+            Recipe.objects.filter(pk=previous).change_counter(
+                'favorites_count', -1
+            )
+        Recipe.objects.filter(pk=self.recipe_id).change_counter(
+            'favorites_count', 1
+        )
+
+    @transaction.atomic(savepoint=False)
+    def delete(self, *args, **kwargs):
+        Recipe.objects.filter(pk=self.recipe_id).change_counter(
+            'favorites_count', -1
+        )
+        return super().delete(*args, **kwargs)
+
+
+class ShoppingCartQuerySet(UserLinkQuerySet):
+    """
+    QuerySet для списка покупок. Вместе с рецептами в суммарном
+    списке покупок пользователя меняются их ингридиенты.
+    """
+    target_field = 'recipe'
+    counter_field = 'in_carts_count'
+
+    def add(self, user_id, target_ids):
+        with transaction.atomic(using=self.db, savepoint=False):
+            added = super().add(user_id, target_ids)
+            ShoppingListItem.objects.add_recipes(added, user_id)
+        return added
+
+    def remove(self, user_id, target_ids):
+        with transaction.atomic(using=self.db, savepoint=False):
+            removed = super().remove(user_id, target_ids)
+            ShoppingListItem.objects.remove_recipes(removed, user_id)
+        return removed
+
 
 class ShoppingCart(models.Model):
     """Модель списка покупок."""
@@ -251,6 +778,13 @@ class ShoppingCart(models.Model):
         related_name='shopping_cart_recipe',
         verbose_name='Рецепт в списке покупок'
     )
+    created_at = models.DateTimeField(
+        verbose_name='Дата добавления',
+        default=timezone.now,
+        db_index=True
+    )
+
+    objects = ShoppingCartQuerySet.as_manager()
 
     class Meta:
         verbose_name = 'Список покупок'
@@ -265,3 +799,251 @@ class ShoppingCart(models.Model):
     def __str__(self):
         return (f'{self.user.username} добавил '
                 f'{self.recipe.name} в список покупок')
+
+    @transaction.atomic(savepoint=False)
+    def save(self, *args, **kwargs):
+        previous = None
+        if not self._state.adding:
+            previous = ShoppingCart.objects.filter(pk=self.pk).values_list(
+                'recipe_id', 'user_id'
+            ).first()
+        super().save(*args, **kwargs)
+        if previous is not None:
+            ShoppingListItem.objects.remove_recipe(*previous)
+            Recipe.objects.filter(pk=previous[0]).change_counter(
+                'in_carts_count', -1
+            )
+        ShoppingListItem.objects.add_recipe(self.recipe_id, self.user_id)
+        Recipe.objects.filter(pk=self.recipe_id).change_counter(
+            'in_carts_count', 1
+        )
+
+    @transaction.atomic(savepoint=False)
+    def delete(self, *args, **kwargs):
+        ShoppingListItem.objects.remove_recipe(self.recipe_id, self.user_id)
+        Recipe.objects.filter(pk=self.recipe_id).change_counter(
+            'in_carts_count', -1
+        )
+        return super().delete(*args, **kwargs)
+
+
+class ShoppingListQuerySet(models.QuerySet):
+    """
+    QuerySet для суммарного списка покупок. Строки меняются
+    на количество ингридиентов рецепта при добавлении рецепта в список
+    покупок, удалении из него и изменении ингридиентов рецепта.
+    """
+    def for_user(self, user_id):
+        """Метод для чтения списка покупок по единицам измерения."""
+        return self.filter(user_id=user_id).values_list(
+            'ingredient__measurement_unit', 'ingredient__name', 'total'
+        ).order_by('ingredient__measurement_unit', 'ingredient__name')
+
+    def _recipe_rows(self, recipe_ids, user_id):
+        """
+        Строки с ингридиентами рецептов у пользователя user_id или,
+        если он не указан, у всех, у кого рецепт в списке покупок
+        (тогда рецепт один).
+        """
+        if user_id is None:
+            qs = self.filter(user_id__in=ShoppingCart.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values('user_id'))
+        else:
+            qs = self.filter(user_id=user_id)
+        return qs.filter(ingredient_id__in=IngredientInRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).values('ingredient_id'))
+
+    def _change_totals(self, recipe_ids, user_id, increase):
+        amount = models.Subquery(IngredientInRecipe.objects.filter(
+            recipe_id__in=recipe_ids,
+            ingredient_id=models.OuterRef('ingredient_id')
+        ).order_by().values('ingredient_id').annotate(
+            recipes_total=models.Sum('amount')
+        ).values('recipes_total'))
+        total = models.F('total')
+        return self._recipe_rows(recipe_ids, user_id).update(
+            total=models.ExpressionWrapper(
+                total + amount if increase else total - amount,
+                output_field=models.IntegerField()
+            )
+        )
+
+    def add_recipes(self, recipe_ids, user_id):
+        """
+        Метод для добавления ингридиентов рецептов recipe_ids в список
+        покупок пользователя user_id.
+        """
+        if not recipe_ids:
+            return
+        ingredient_ids = set(IngredientInRecipe.objects.filter(
+            recipe_id__in=recipe_ids
+        ).order_by().values_list('ingredient_id', flat=True))
+        if not ingredient_ids:
+            return
+        self.bulk_create(
+            [
+                ShoppingListItem(user_id=user_id, ingredient_id=ingredient)
+                for ingredient in ingredient_ids
+            ],
+            ignore_conflicts=True
+        )
+        self._change_totals(recipe_ids, user_id, increase=True)
+
+    def remove_recipes(self, recipe_ids, user_id):
+        """
+        Метод для удаления ингридиентов рецептов recipe_ids из списка
+        покупок пользователя user_id или, если он не указан, из всех
+        списков с этим рецептом.
+        """
+        if recipe_ids and self._change_totals(
+            recipe_ids, user_id, increase=False
+        ):
+            self._recipe_rows(recipe_ids, user_id).filter(
+                total__lte=0
+            ).delete()
+
+    def add_recipe(self, recipe_id, user_id=None):
+        """Метод для добавления ингридиентов рецепта в списки покупок."""
+        if user_id is not None:
+            self.add_recipes((recipe_id, ), user_id)
+            return
+        ingredient_ids = list(IngredientInRecipe.objects.filter(
+            recipe_id=recipe_id
+        ).order_by().values_list('ingredient_id', flat=True))
+        if not ingredient_ids:
+            return
+        self.bulk_create(
+            [
+                ShoppingListItem(user_id=user, ingredient_id=ingredient)
+                for user in ShoppingCart.objects.filter(
+                    recipe_id=recipe_id
+                ).values_list('user_id', flat=True)
+                for ingredient in ingredient_ids
+            ],
+            ignore_conflicts=True
+        )
+        self._change_totals((recipe_id, ), None, increase=True)
+
+    def remove_recipe(self, recipe_id, user_id=None):
+        """Метод для удаления ингридиентов рецепта из списков покупок."""
+        self.remove_recipes((recipe_id, ), user_id)
+
+    def expected(self, user_ids=None):
+        """
+        Метод для подсчёта списков покупок заново по рецептам
+        в списке покупок, в порядке пользователя и ингридиента.
+        """
+        if user_ids is None:
+            lookup = {'recipe__shopping_cart_recipe__isnull': False}
+        else:
+            lookup = {'recipe__shopping_cart_recipe__user_id__in': user_ids}
+        return IngredientInRecipe.objects.filter(**lookup).values_list(
+            'recipe__shopping_cart_recipe__user_id', 'ingredient_id'
+        ).annotate(
+            total=models.Sum('amount')
+        ).order_by('recipe__shopping_cart_recipe__user_id', 'ingredient_id')
+
+    def rebuild(self, user_ids=None):
+        """
+        Метод для пересчёта списков покупок пользователей user_ids
+        или всех пользователей. Возвращает число созданных строк.
+        """
+        qs = self.all() if user_ids is None else self.filter(
+            user_id__in=user_ids
+        )
+        rows = (
+            ShoppingListItem(user_id=user, ingredient_id=ingredient,
+                             total=total)
+            for user, ingredient, total in self.expected(user_ids).iterator()
+        )
+        count = 0
+        with transaction.atomic(using=self.db):
+            qs.delete()
+            batch = list(islice(rows, REBUILD_BATCH_SIZE))
+            while batch:
+                self.bulk_create(batch)
+                count += len(batch)
+                batch = list(islice(rows, REBUILD_BATCH_SIZE))
+        return count
+
+    def diff(self, user_ids=None):
+        """
+        Метод для поиска расхождений с пересчитанными списками покупок.
+        Возвращает кортежи (пользователь, ингридиент, ожидаемое
+        количество, количество в таблице).
+        """
+        actual = self.all() if user_ids is None else self.filter(
+            user_id__in=user_ids
+        )
+        actual = actual.values_list(
+            'user_id', 'ingredient_id', 'total'
+        ).order_by('user_id', 'ingredient_id').iterator()
+        expected = self.expected(user_ids).iterator()
+        expected_row, actual_row = next(expected, None), next(actual, None)
+        while expected_row is not None or actual_row is not None:
+            if actual_row is None or (
+                expected_row is not None
+                and expected_row[:2] < actual_row[:2]
+            ):
+                yield (*expected_row, 0)
+                expected_row = next(expected, None)
+            elif expected_row is None or actual_row[:2] < expected_row[:2]:
+                yield (*actual_row[:2], 0, actual_row[2])
+                actual_row = next(actual, None)
+            else:
+                if expected_row[2] != actual_row[2]:
+                    yield (*expected_row, actual_row[2])
+                expected_row = next(expected, None)
+                actual_row = next(actual, None)
+
+
+class ShoppingListItem(models.Model):
+    """Модель суммарного количества ингридиента в списке покупок."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Ингридиент'
+    )
+    total = models.IntegerField(
+        verbose_name='Количество',
+        default=0
+    )
+
+    objects = ShoppingListQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Ингридиент в списке покупок'
+        verbose_name_plural = 'Ингридиенты в списках покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            ),
+        ]
+
+    def __str__(self):
+        return (f'{self.user.username}: {self.ingredient.name} - '
+                f'{self.total} {self.ingredient.measurement_unit}')
+
+
+class ScoreUpdate(models.Model):
+    """Модель времени последнего пересчёта оценок популярности."""
+    calculated_at = models.DateTimeField(
+        verbose_name='Время пересчёта'
+    )
+
+    class Meta:
+        verbose_name = 'Пересчёт популярности'
+        verbose_name_plural = 'Пересчёты популярности'
+
+    def __str__(self):
+        return f'{self.calculated_at:%Y-%m-%d %H:%M}'
@@ -0,0 +1,189 @@
+"""
+Обратный индекс ингридиент → рецепты в памяти процесса.
+
+Для поиска «что приготовить» рецепты отбираются по множествам
+ингридиентов: со всеми указанными, без указанных и такие, для которых
+не хватает не больше N ингридиентов из имеющихся. Через соединения
+с IngredientInRecipe и HAVING такие запросы медленные, поэтому множества
+считаются в памяти по отсортированным массивам id рецептов, а в базу
+уходит только итоговый список id для аннотаций, фильтров и пагинации.
+
+Индекс строится из IngredientInRecipe при первом обращении. После
+сохранения рецептов меняется метка версии из core.stamps, общая для
+всех процессов, и каждый процесс перечитывает только рецепты,
+изменённые с прошлой проверки (по updated_at с запасом REFRESH_OVERLAP
+на долгие транзакции). После удаления рецептов или ингридиентов индекс
+перестраивается целиком.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.stamps import bump_stamp, get_stamp
+
+VERSION_CACHE_KEY = 'recipes:recipe_index:version'
+GENERATION_CACHE_KEY = 'recipes:recipe_index:generation'
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+
+class RecipeIngredientIndex:
+    """Индекс рецептов по ингридиентам с запросами по множествам."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings = None
+        self._recipes = None
+        self._sizes = None
+        self._generation = None
+        self._version = None
+        self._synced_at = None
+        self._next_check = 0
+
+    def _build(self):
+        from .models import IngredientInRecipe
+
+        self._synced_at = timezone.now()
+        postings, recipes = defaultdict(list), defaultdict(list)
+        for recipe_id, ingredient_id in IngredientInRecipe.objects.order_by(
+        ).values_list('recipe_id', 'ingredient_id').iterator():
+            postings[ingredient_id].append(recipe_id)
+            recipes[recipe_id].append(ingredient_id)
+        self._postings = {
+            ingredient_id: array('I', sorted(recipe_ids))
+            for ingredient_id, recipe_ids in postings.items()
+        }
+        self._recipes = {
+            recipe_id: tuple(ingredient_ids)
+            for recipe_id, ingredient_ids in recipes.items()
+        }
+        self._sizes = defaultdict(set)
+        for recipe_id, ingredient_ids in self._recipes.items():
+            self._sizes[len(ingredient_ids)].add(recipe_id)
+
+    def _refresh(self):
+        """Перечитывание рецептов, изменённых с прошлой проверки."""
+        from .models import Recipe
+
+        since = self._synced_at - REFRESH_OVERLAP
+        self._synced_at = timezone.now()
+        changed = defaultdict(set)
+        for recipe_id, ingredient_id in Recipe.objects.filter(
+            updated_at__gte=since
+        ).order_by().values_list('pk', 'recipe__ingredient_id').iterator():
+            ingredient_ids = changed[recipe_id]
+            if ingredient_id is not None:
+                ingredient_ids.add(ingredient_id)
+        for recipe_id, ingredient_ids in changed.items():
+            self._replace(recipe_id, ingredient_ids)
+
+    def _replace(self, recipe_id, ingredient_ids):
+        old = self._recipes.pop(recipe_id, ())
+        self._sizes[len(old)].discard(recipe_id)
+        for ingredient_id in set(old) - ingredient_ids:
+            posting = self._postings[ingredient_id]
+            position = bisect_left(posting, recipe_id)
+            if position < len(posting) and posting[position] == recipe_id:
+                del posting[position]
+        for ingredient_id in ingredient_ids - set(old):
+            insort(
+                self._postings.setdefault(ingredient_id, array('I')),
+                recipe_id
+            )
+        if ingredient_ids:
+            self._recipes[recipe_id] = tuple(ingredient_ids)
+            self._sizes[len(ingredient_ids)].add(recipe_id)
+
+    def _sync(self):
+        """Проверка общих меток версии, при необходимости обновление."""
+        now = time.monotonic()
+        if self._postings is not None and now < self._next_check:
+            return
+        generation = get_stamp(GENERATION_CACHE_KEY)
+        version = get_stamp(VERSION_CACHE_KEY)
+        if self._postings is None or generation != self._generation:
+            self._build()
+        elif version != self._version:
+            self._refresh()
+        self._generation, self._version = generation, version
+        self._next_check = (
+            now + settings.RECIPE_INGREDIENT_INDEX_CHECK_INTERVAL
+        )
+
+    def invalidate(self):
+        """Обновление изменённых рецептов во всех процессах."""
+        bump_stamp(VERSION_CACHE_KEY)
+        self._next_check = 0
+
+    def reset(self):
+        """Перестроение индекса во всех процессах."""
+        bump_stamp(GENERATION_CACHE_KEY)
+        self._next_check = 0
+
+    def _posting(self, ingredient_id):
+        return self._postings.get(ingredient_id, ())
+
+    def _with_all(self, ingredient_ids):
+        """Рецепты со всеми ингридиентами, от самого редкого."""
+        postings = sorted(map(self._posting, ingredient_ids), key=len)
+        recipe_ids = set(postings[0])
+        for posting in postings[1:]:
+            if not recipe_ids:
+                break
+            recipe_ids.intersection_update(posting)
+        return recipe_ids
+
+    def _cookable(self, available, max_missing, candidates=None):
+        """
+        Рецепты, которым не хватает не больше max_missing ингридиентов
+        из available. Без candidates совпадения с available считаются
+        по спискам имеющихся ингридиентов, а рецепты без совпадений
+        берутся по числу ингридиентов.
+        """
+        if candidates is not None:
+            return {
+                recipe_id for recipe_id in candidates
+                if sum(
+                    ingredient_id not in available
+                    for ingredient_id in self._recipes.get(recipe_id, ())
+                ) <= max_missing
+            }
+        matches = Counter()
+        for ingredient_id in available:
+            matches.update(self._posting(ingredient_id))
+        recipe_ids = {
+            recipe_id for recipe_id, count in matches.items()
+            if len(self._recipes[recipe_id]) - count <= max_missing
+        }
+        for size in range(max_missing + 1):
+            recipe_ids.update(self._sizes.get(size, ()))
+        return recipe_ids
+
+    def match(self, include=(), exclude=(), available=None, max_missing=0):
+        """
+        Отбор рецептов: со всеми ингридиентами include, без ингридиентов
+        exclude и, если передан available, с не больше чем max_missing
+        ингридиентами не из available. Возвращает пару: множество
+        подходящих id рецептов (None, если условия только на исключение)
+        и множество id рецептов, которые нужно исключить.
+        """
+        with self._lock:
+            self._sync()
+            recipe_ids = self._with_all(set(include)) if include else None
+            if available is not None:
+                recipe_ids = self._cookable(
+                    set(available), max_missing, recipe_ids
+                )
+            excluded = set()
+            for ingredient_id in set(exclude):
+                excluded.update(self._posting(ingredient_id))
+        if recipe_ids is not None:
+            return recipe_ids - excluded, set()
+        return None, excluded
+
+
+recipe_ingredient_index = RecipeIngredientIndex()
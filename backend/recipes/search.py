@@ -0,0 +1,138 @@
+"""
+Полнотекстовый поиск рецептов.
+
+В PostgreSQL используется GIN-индекс по tsvector из названия,
+ингридиентов и описания рецепта и триграммный индекс по названию.
+Для локального запуска на SQLite создаётся таблица FTS5, которая
+поддерживается в актуальном состоянии триггерами; ё в ней и в запросе
+заменяется на е, релевантность оценивается по тому, в каком поле
+найдены слова запроса.
+Кроме того, в PostgreSQL создаются индексы по UPPER(...) для поиска
+по началу названия, имени пользователя и почты (istartswith) в админке.
+Индексы создаются после migrate, так как зависят от базы данных.
+"""
+import re
+
+from django.db import NotSupportedError
+
+POSTGRES_VECTOR = (
+    "setweight(to_tsvector('russian', {table}\"name\"), 'A') || "
+    "setweight(to_tsvector('russian', {table}\"ingredient_names\"), 'B') || "
+    "setweight(to_tsvector('russian', {table}\"text\"), 'C')"
+)
+POSTGRES_COLUMN_VECTOR = POSTGRES_VECTOR.format(table='')
+POSTGRES_TABLE_VECTOR = POSTGRES_VECTOR.format(table='"recipes_recipe".')
+POSTGRES_SETUP = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_idx '
+    f'ON recipes_recipe USING gin (({POSTGRES_COLUMN_VECTOR}))',
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_name_trgm_idx '
+    'ON recipes_recipe USING gin (name gin_trgm_ops)',
+) + tuple(
+    f'CREATE INDEX IF NOT EXISTS {table}_{column}_upper_idx '
+    f'ON {table} ((UPPER({column}::text)) text_pattern_ops)'
+    for table, column in (
+        ('recipes_recipe', 'name'),
+        ('recipes_ingredient', 'name'),
+        ('users_user', 'username'),
+        ('users_user', 'email'),
+    )
+)
+POSTGRES_MATCH = (
+    f"({POSTGRES_TABLE_VECTOR}) @@ plainto_tsquery('russian', %s) "
+    'OR %s <%% "recipes_recipe"."name"'
+)
+POSTGRES_RANK = (
+    f"ts_rank({POSTGRES_TABLE_VECTOR}, plainto_tsquery('russian', %s)) "
+    '+ word_similarity(%s, "recipes_recipe"."name")'
+)
+
+SQLITE_COLUMNS = ('name', 'ingredient_names', 'text')
+
+
+def _sqlite_fold(row):
+    """
+    Значения полей строки row для FTS5 с заменой ё на е: токенизатор
+    unicode61 не считает их одной буквой, в отличие от PostgreSQL.
+    """
+    return ', '.join(
+        f"REPLACE(REPLACE({row}{column}, 'Ё', 'Е'), 'ё', 'е')"
+        for column in SQLITE_COLUMNS
+    )
+
+
+SQLITE_INSERT = (
+    'INSERT INTO recipes_recipe_fts(rowid, name, ingredient_names, text) '
+    'VALUES (new.id, {}); '.format(_sqlite_fold('new.'))
+)
+SQLITE_DELETE = (
+    'INSERT INTO recipes_recipe_fts'
+    '(recipes_recipe_fts, rowid, name, ingredient_names, text) '
+    "VALUES ('delete', old.id, {}); ".format(_sqlite_fold('old.'))
+)
+SQLITE_SETUP = (
+    'CREATE VIRTUAL TABLE IF NOT EXISTS recipes_recipe_fts USING fts5('
+    "name, ingredient_names, text, content='recipes_recipe', "
+    "content_rowid='id', tokenize='unicode61 remove_diacritics 2')",
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_insert',
+    'CREATE TRIGGER recipes_recipe_fts_insert '
+    f'AFTER INSERT ON recipes_recipe BEGIN {SQLITE_INSERT}END',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_delete',
+    'CREATE TRIGGER recipes_recipe_fts_delete '
+    f'AFTER DELETE ON recipes_recipe BEGIN {SQLITE_DELETE}END',
+    'DROP TRIGGER IF EXISTS recipes_recipe_fts_update',
+    'CREATE TRIGGER recipes_recipe_fts_update '
+    'AFTER UPDATE OF name, ingredient_names, text ON recipes_recipe '
+    f'BEGIN {SQLITE_DELETE}{SQLITE_INSERT}END',
+    "INSERT INTO recipes_recipe_fts(recipes_recipe_fts) VALUES ('delete-all')",
+    'INSERT INTO recipes_recipe_fts(rowid, name, ingredient_names, text) '
+    'SELECT id, {} FROM recipes_recipe'.format(_sqlite_fold('')),
+)
+SQLITE_MATCH = (
+    '"recipes_recipe"."id" IN (SELECT rowid FROM recipes_recipe_fts '
+    'WHERE recipes_recipe_fts MATCH %s)'
+)
+SQLITE_RANK = (
+    '1 + CASE WHEN "recipes_recipe"."id" IN (SELECT rowid '
+    'FROM recipes_recipe_fts WHERE recipes_recipe_fts MATCH %s) '
+    'THEN 10 ELSE 0 END + CASE WHEN "recipes_recipe"."id" IN (SELECT rowid '
+    'FROM recipes_recipe_fts WHERE recipes_recipe_fts MATCH %s) '
+    'THEN 5 ELSE 0 END'
+)
+
+
+def install(connection):
+    """Создание поисковых индексов для текущей базы данных."""
+    if connection.vendor == 'postgresql':
+        statements = POSTGRES_SETUP
+    elif connection.vendor == 'sqlite':
+        statements = SQLITE_SETUP
+    else:
+        return
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def get_search_sql(connection, query):
+    """
+    SQL условия поиска и оценки релевантности с параметрами.
+    Возвращает None, если в запросе нет ни одного слова.
+    """
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    if connection.vendor == 'postgresql':
+        query = ' '.join(words)
+        return (POSTGRES_MATCH, (query, query),
+                POSTGRES_RANK, (query, query))
+    if connection.vendor == 'sqlite':
+        match = ' '.join(
+            '"{}"*'.format(word.replace('Ё', 'Е').replace('ё', 'е'))
+            for word in words
+        )
+        return (SQLITE_MATCH, (match, ), SQLITE_RANK,
+                (f'name : ({match})', f'ingredient_names : ({match})'))
+    raise NotSupportedError(
+        'Поиск рецептов поддерживается только в PostgreSQL и SQLite.'
+    )
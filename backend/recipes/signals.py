@@ -0,0 +1,94 @@
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from users.models import User
+from . import image_variants, similarity
+from .ingredient_index import ingredient_index
+from .models import Ingredient, Recipe, ShoppingListItem
+from .recipe_index import recipe_ingredient_index
+from .search import install
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_index(**kwargs):
+    """Сброс индекса ингридиентов после изменения каталога."""
+    transaction.on_commit(ingredient_index.invalidate)
+
+
+@receiver(post_save, sender=Recipe)
+def refresh_recipe_ingredient_index(**kwargs):
+    """Обновление изменённых рецептов в индексе по ингридиентам."""
+    transaction.on_commit(recipe_ingredient_index.invalidate)
+
+
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Ingredient)
+def reset_recipe_ingredient_index(**kwargs):
+    """
+    Перестроение индекса по ингридиентам после удаления рецепта
+    или ингридиента: удалённые строки не видны по updated_at.
+    """
+    transaction.on_commit(recipe_ingredient_index.reset)
+
+
+@receiver(post_save, sender=Recipe)
+def build_image_variants(instance, raw=False, **kwargs):
+    """
+    Построение копий нового изображения рецепта в фоне. При загрузке
+    данных (raw) файлы изображений могут быть ещё не скопированы,
+    копии для них строит команда build_image_variants.
+    """
+    if raw:
+        return
+    if instance.image and not instance.has_image_variants:
+        transaction.on_commit(lambda: image_variants.schedule(instance.pk))
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_variants(instance, **kwargs):
+    """Удаление копий изображения удалённого рецепта."""
+    if instance.image_variants_for:
+        transaction.on_commit(
+            lambda: image_variants.delete(instance.image_variants_for)
+        )
+
+
+@receiver(pre_delete, sender=Recipe)
+def remove_recipe_from_shopping_lists(instance, **kwargs):
+    """
+    Вычитание ингридиентов удаляемого рецепта из списков покупок
+    и уменьшение счётчика рецептов автора.
+    """
+    ShoppingListItem.objects.remove_recipe(instance.pk)
+    User.objects.filter(pk=instance.author_id).change_counter(
+        'recipes_count', -1
+    )
+
+
+@receiver(pre_delete, sender=Recipe)
+def forget_similar_recipe(instance, **kwargs):
+    """Пересчёт похожих у рецептов, в списках которых был удаляемый."""
+    similarity.forget(instance.pk)
+
+
+@receiver(pre_delete, sender=User)
+def release_user_counters(instance, **kwargs):
+    """
+    Уменьшение счётчиков рецептов и авторов, которые пользователь
+    добавил в избранное, список покупок или на которых подписан.
+    """
+    Recipe.objects.filter(favorite_recipe__user=instance).change_counter(
+        'favorites_count', -1
+    )
+    Recipe.objects.filter(shopping_cart_recipe__user=instance).change_counter(
+        'in_carts_count', -1
+    )
+    User.objects.filter(following__user=instance).change_counter(
+        'followers_count', -1
+    )
+
+
+def install_search_indexes(using, **kwargs):
+    """Создание поисковых индексов рецептов после migrate."""
+    install(connections[using])
@@ -0,0 +1,199 @@
+"""
+Похожие рецепты.
+
+Рецепт описывается множеством признаков — своих ингридиентов и тегов,
+похожесть двух рецептов — коэффициент Жаккара этих множеств. Для
+каждого рецепта заранее сохраняются SIMILAR_RECIPES_COUNT самых похожих
+(модель SimilarRecipe), и эндпоинт читает их одним запросом по индексу.
+
+Соседи ищутся по обратному индексу признак → рецепты, поэтому каждый
+рецепт сравнивается только с рецептами, у которых есть общие признаки,
+а не со всеми. Признаки, которые есть больше чем у
+SIMILAR_RECIPES_MAX_FEATURE_RECIPES рецептов (соль, популярные теги),
+кандидатов не добавляют, но учитываются в коэффициенте.
+
+Команда build_similar_recipes пересчитывает рецепты, изменённые после
+прошлого расчёта (similar_updated_at раньше updated_at), и только те
+списки других рецептов, в которых они были или в которые теперь
+попадают. Рецепты, из списков которых удалён рецепт, отмечаются для
+пересчёта при удалении.
+"""
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+SAVE_BATCH_SIZE = 500
+
+
+def load_features():
+    """
+    Признаки всех рецептов: ингридиент с id n — число 2n,
+    тег с id n — число 2n + 1.
+    """
+    from .models import IngredientInRecipe, Recipe
+
+    features = defaultdict(set)
+    for recipe_id, ingredient_id in IngredientInRecipe.objects.values_list(
+        'recipe_id', 'ingredient_id'
+    ).iterator():
+        features[recipe_id].add(2 * ingredient_id)
+    for recipe_id, tag_id in Recipe.tags.through.objects.values_list(
+        'recipe_id', 'tag_id'
+    ).iterator():
+        features[recipe_id].add(2 * tag_id + 1)
+    return {pk: frozenset(items) for pk, items in features.items()}
+
+
+class SimilarityIndex:
+    """Обратный индекс признаков для поиска похожих рецептов."""
+    def __init__(self, features, max_feature_recipes=None):
+        if max_feature_recipes is None:
+            max_feature_recipes = settings.SIMILAR_RECIPES_MAX_FEATURE_RECIPES
+        self.features = features
+        postings = defaultdict(list)
+        for pk, items in features.items():
+            for feature in items:
+                postings[feature].append(pk)
+        self.postings = {
+            feature: pks for feature, pks in postings.items()
+            if len(pks) <= max_feature_recipes
+        }
+
+    def candidates(self, pk):
+        """Рецепты с общими с рецептом pk признаками из индекса."""
+        candidates = set()
+        for feature in self.features.get(pk, ()):
+            candidates.update(self.postings.get(feature, ()))
+        candidates.discard(pk)
+        return candidates
+
+    def score(self, pk, other):
+        """Коэффициент Жаккара признаков рецептов pk и other."""
+        features, other_features = self.features[pk], self.features[other]
+        common = len(features & other_features)
+        return common / (len(features) + len(other_features) - common)
+
+    def neighbours(self, pk, count=None):
+        """
+        Пары (похожесть, id) не больше count самых похожих на рецепт pk
+        рецептов, от более похожих к менее, при равной похожести —
+        по возрастанию id.
+        """
+        if count is None:
+            count = settings.SIMILAR_RECIPES_COUNT
+        return heapq.nlargest(
+            count,
+            ((self.score(pk, other), other) for other in self.candidates(pk)),
+            key=rank_key
+        )
+
+
+def rank_key(item):
+    score, pk = item
+    return score, -pk
+
+
+def affected(index, changed, changed_qs):
+    """
+    Рецепты, на списки похожих которых влияют изменённые рецепты
+    changed (выборка changed_qs): те, в чьих списках они есть, и те,
+    в чьи списки они теперь попадают, вытесняя последний.
+    """
+    from .models import SimilarRecipe
+
+    count = settings.SIMILAR_RECIPES_COUNT
+    result = set(SimilarRecipe.objects.filter(
+        similar_id__in=changed_qs.values('pk')
+    ).values_list('recipe_id', flat=True))
+    candidates = defaultdict(list)
+    for pk in changed:
+        for other in index.candidates(pk) - changed - result:
+            candidates[other].append(pk)
+    pks = iter(sorted(candidates))
+    batch = list(islice(pks, SAVE_BATCH_SIZE))
+    while batch:
+        lowest = {
+            recipe_id: (score, similar_id)
+            for recipe_id, score, similar_id in SimilarRecipe.objects.filter(
+                recipe_id__in=batch, rank=count
+            ).values_list('recipe_id', 'score', 'similar_id')
+        }
+        for other in batch:
+            if other not in lowest or any(
+                rank_key((index.score(other, pk), pk))
+                > rank_key(lowest[other])
+                for pk in candidates[other]
+            ):
+                result.add(other)
+        batch = list(islice(pks, SAVE_BATCH_SIZE))
+    return result - changed
+
+
+def forget(pk):
+    """
+    Отметка рецептов, в списках похожих которых есть удаляемый рецепт
+    pk, для пересчёта: без него в их списках остаются пропуски мест,
+    и следующий расчёт заполняет их заново.
+    """
+    from .models import Recipe
+
+    Recipe.objects.filter(similar_recipes__similar_id=pk).update(
+        similar_updated_at=None
+    )
+
+
+def save(neighbours, built_at):
+    """
+    Сохранение соседей {id рецепта: пары (похожесть, id)} пачками,
+    каждая в своей транзакции, с отметкой времени расчёта built_at.
+    """
+    from .models import Recipe, SimilarRecipe
+
+    items = iter(sorted(neighbours.items()))
+    batch = list(islice(items, SAVE_BATCH_SIZE))
+    while batch:
+        pks = [pk for pk, _ in batch]
+        with transaction.atomic():
+            SimilarRecipe.objects.filter(recipe_id__in=pks).delete()
+            SimilarRecipe.objects.bulk_create([
+                SimilarRecipe(
+                    recipe_id=pk, similar_id=other, score=score, rank=rank
+                )
+                for pk, rows in batch
+                for rank, (score, other) in enumerate(rows, 1)
+            ])
+            Recipe.objects.filter(pk__in=pks).update(
+                similar_updated_at=built_at
+            )
+        batch = list(islice(items, SAVE_BATCH_SIZE))
+
+
+def build(rebuild=False):
+    """
+    Пересчёт похожих рецептов: всех, если rebuild или изменилась
+    больше чем половина рецептов, иначе изменённых после прошлого
+    расчёта и тех, на чьи списки они влияют. Возвращает число
+    пересчитанных рецептов.
+    """
+    from .models import Recipe
+
+    built_at = timezone.now()
+    features = load_features()
+    index = SimilarityIndex(features)
+    qs = Recipe.objects.without_similar()
+    changed = set(qs.values_list('pk', flat=True))
+    if rebuild or len(changed) * 2 > len(features):
+        changed = set(Recipe.objects.values_list('pk', flat=True))
+        neighbours = {pk: index.neighbours(pk) for pk in changed}
+    elif changed:
+        neighbours = {pk: index.neighbours(pk) for pk in changed}
+        for pk in affected(index, changed, qs):
+            neighbours[pk] = index.neighbours(pk)
+    else:
+        return 0
+    save(neighbours, built_at)
+    return len(neighbours)
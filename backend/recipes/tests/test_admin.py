@@ -0,0 +1,48 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from api.tests.test_query_budget import LOCMEM_CACHES
+from recipes.models import Ingredient, IngredientInRecipe, Recipe
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class IngredientInRecipeAdminTest(TestCase):
+    """Ингридиенты в рецептах в админке доступны только для просмотра."""
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@foodgram.ru', password='pass',
+            first_name='Имя', last_name='Фамилия'
+        )
+        recipe = Recipe.objects.create(
+            author=cls.admin, name='Рецепт', text='Описание',
+            image='recipes/images/test.png', cooking_time=10
+        )
+        recipe.set_ingredients({Ingredient.objects.create(
+            name='Морковь', measurement_unit='г'
+        ).pk: 1})
+        cls.row = IngredientInRecipe.objects.get()
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def test_read_only(self):
+        url = '/admin/recipes/ingredientinrecipe/'
+        self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(
+            self.client.get(f'{url}{self.row.pk}/change/').status_code, 200
+        )
+        self.assertEqual(self.client.get(f'{url}add/').status_code, 403)
+        self.assertEqual(
+            self.client.post(f'{url}{self.row.pk}/delete/',
+                             {'post': 'yes'}).status_code,
+            403
+        )
+        response = self.client.post(
+            f'{url}{self.row.pk}/change/', {'amount': 5}
+        )
+        self.assertEqual(response.status_code, 403)
+        self.row.refresh_from_db()
+        self.assertEqual(self.row.amount, 1)
@@ -0,0 +1,88 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from api.serializers import ImageVariantsField
+from api.tests.test_query_budget import LOCMEM_CACHES
+from recipes import image_variants
+from recipes.models import Recipe
+
+User = get_user_model()
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(CACHES=LOCMEM_CACHES, MEDIA_ROOT=MEDIA_ROOT,
+                   RECIPE_IMAGE_VARIANT_WORKERS=0)
+class ImageVariantsTest(TestCase):
+    """Копии изображения рецепта разной ширины."""
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def create_recipe(self, width):
+        buffer = BytesIO()
+        Image.new('RGB', (width, width // 2), '#E26C2D').save(buffer, 'PNG')
+        name = default_storage.save(
+            f'recipes/images/test{width}.png', ContentFile(buffer.getvalue())
+        )
+        return Recipe.objects.create(
+            author=User.objects.create_user(
+                username=f'author{width}', email=f'author{width}@foodgram.ru'
+            ),
+            name='Рецепт', text='Описание', image=name, cooking_time=10
+        )
+
+    def variant_files(self, stem):
+        return sorted(
+            name for name in os.listdir(
+                os.path.join(MEDIA_ROOT, image_variants.VARIANTS_DIR)
+            )
+            if name.startswith(f'{stem}.')
+        )
+
+    def test_small_image(self):
+        recipe = self.create_recipe(100)
+        updated_at = recipe.updated_at
+        self.assertTrue(image_variants.build_for_recipe(recipe.pk))
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.updated_at, updated_at)
+        self.assertTrue(recipe.has_image_variants)
+        self.assertEqual(recipe.image_width, 100)
+        self.assertEqual(self.variant_files('test100'), [
+            'test100.thumbnail.jpg', 'test100.thumbnail.webp'
+        ])
+        data = ImageVariantsField().to_representation(recipe)
+        for variant in ('thumbnail', 'card', 'full'):
+            self.assertEqual(data[variant]['width'], 100)
+            self.assertTrue(
+                data[variant]['src'].endswith('test100.thumbnail.jpg')
+            )
+        self.assertEqual(
+            data['srcset']['webp'],
+            '/media/recipes/variants/test100.thumbnail.webp 100w'
+        )
+
+    def test_medium_image(self):
+        recipe = self.create_recipe(700)
+        image_variants.build_for_recipe(recipe.pk)
+        recipe.refresh_from_db()
+        self.assertEqual(
+            image_variants.variant_widths(recipe.image_width), (
+                ('thumbnail', 240, 'thumbnail'),
+                ('card', 600, 'card'),
+                ('full', 700, 'full'),
+            )
+        )
+        self.assertEqual(len(self.variant_files('test700')), 6)
+        with default_storage.open(
+            'recipes/variants/test700.full.jpg'
+        ) as file, Image.open(file) as image:
+            self.assertEqual(image.width, 700)
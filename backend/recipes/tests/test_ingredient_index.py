@@ -0,0 +1,41 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from api.tests.test_query_budget import LOCMEM_CACHES
+from core.stamps import check_shared_caches
+from recipes.ingredient_index import IngredientIndex
+from recipes.models import Ingredient
+
+
+@override_settings(CACHES=LOCMEM_CACHES, INGREDIENT_INDEX_CHECK_INTERVAL=0)
+class IngredientIndexTest(TestCase):
+    """
+    Индекс ингридиентов в двух процессах: общий кеш меток здесь
+    один LocMemCache на оба экземпляра индекса.
+    """
+    def setUp(self):
+        caches['stamps'].clear()
+        Ingredient.objects.create(name='Морковь', measurement_unit='г')
+
+    def test_invalidate_reaches_other_index(self):
+        first, second = IngredientIndex(), IngredientIndex()
+        self.assertEqual(len(second.search('мор')), 1)
+        Ingredient.objects.create(name='Морошка', measurement_unit='г')
+        first.invalidate()
+        self.assertEqual(first.version(), second.version())
+        self.assertEqual(len(second.search('мор')), 2)
+
+    def test_process_local_stamp_cache(self):
+        self.assertEqual(
+            [error.id for error in check_shared_caches(None)],
+            ['core.E001', 'core.E001']
+        )
+        with override_settings(CACHES={
+            alias: {
+                'BACKEND':
+                    'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': f'/tmp/foodgram-test-{alias}',
+            }
+            for alias in LOCMEM_CACHES
+        }):
+            self.assertEqual(check_shared_caches(None), [])
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from api.tests.test_query_budget import LOCMEM_CACHES
+from recipes.models import Ingredient, Recipe
+from recipes.recipe_index import RecipeIngredientIndex
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES,
+                   RECIPE_INGREDIENT_INDEX_CHECK_INTERVAL=0)
+class RecipeIngredientIndexTest(TestCase):
+    """
+    Индекс рецептов по ингридиентам в двух процессах: общий кеш меток
+    здесь один LocMemCache на оба экземпляра индекса.
+    """
+    def setUp(self):
+        caches['stamps'].clear()
+        self.author = User.objects.create_user(
+            username='author', email='author@foodgram.ru'
+        )
+        self.carrot, self.onion = (
+            Ingredient.objects.create(name=name, measurement_unit='г').pk
+            for name in ('Морковь', 'Лук')
+        )
+        self.recipe = self.create_recipe(self.carrot)
+
+    def create_recipe(self, *ingredient_ids):
+        recipe = Recipe.objects.create(
+            author=self.author, name='Рецепт', text='Описание',
+            image='recipes/images/test.png', cooking_time=10
+        )
+        recipe.set_ingredients({pk: 1 for pk in ingredient_ids})
+        return recipe
+
+    def test_changes_reach_other_index(self):
+        first, second = RecipeIngredientIndex(), RecipeIngredientIndex()
+        self.assertEqual(
+            second.match(include=(self.carrot, )), ({self.recipe.pk}, set())
+        )
+        onion_recipe = self.create_recipe(self.onion)
+        first.invalidate()
+        self.assertEqual(
+            second.match(exclude=(self.carrot, )), (None, {self.recipe.pk})
+        )
+        self.assertEqual(
+            second.match(include=(self.onion, )), ({onion_recipe.pk}, set())
+        )
+        onion_recipe.delete()
+        first.reset()
+        self.assertEqual(second.match(include=(self.onion, )), (set(), set()))
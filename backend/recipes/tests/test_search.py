@@ -0,0 +1,56 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from api.tests.test_query_budget import LOCMEM_CACHES
+from recipes.models import Recipe
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class RecipeSearchTest(TestCase):
+    """Полнотекстовый поиск рецептов не различает е и ё."""
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            username='author', email='author@foodgram.ru'
+        )
+        cls.recipes = [
+            Recipe.objects.create(
+                author=author, name=name, text=text,
+                image='recipes/images/test.png', cooking_time=10
+            )
+            for name, text in (
+                ('Ёлка из фруктов', 'Описание'),
+                ('Салат', 'Посыпать тёртым сыром'),
+                ('Суп', 'Описание'),
+            )
+        ]
+
+    def search(self, query):
+        return sorted(Recipe.objects.search(query).values_list(
+            'pk', flat=True
+        ))
+
+    def test_yo(self):
+        elka, salad, _ = (recipe.pk for recipe in self.recipes)
+        for query, expected in (
+            ('елка', [elka]),
+            ('ЕЛКА', [elka]),
+            ('ёлка', [elka]),
+            ('тертым', [salad]),
+            ('тёрт', [salad]),
+        ):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query), expected)
+
+    def test_yo_after_update(self):
+        recipe = self.recipes[2]
+        recipe.name = 'Суп с ежевикой'
+        recipe.save()
+        self.assertEqual(self.search('ёжевик'), [recipe.pk])
+        recipe.name = 'Суп'
+        recipe.save()
+        self.assertEqual(self.search('ежевик'), [])
+        recipe.delete()
+        self.assertEqual(self.search('суп'), [])
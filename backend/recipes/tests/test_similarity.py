@@ -0,0 +1,69 @@
+import random
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from api.tests.test_query_budget import LOCMEM_CACHES
+from recipes import similarity
+from recipes.models import Ingredient, Recipe, SimilarRecipe
+
+User = get_user_model()
+
+
+@override_settings(CACHES=LOCMEM_CACHES, SIMILAR_RECIPES_COUNT=3)
+class SimilarRecipesTest(TestCase):
+    """Пересчёт похожих рецептов по изменениям совпадает с полным."""
+    @classmethod
+    def setUpTestData(cls):
+        rnd = random.Random(0)
+        author = User.objects.create_user(
+            username='author', email='author@foodgram.ru'
+        )
+        ingredients = [
+            Ingredient.objects.create(
+                name=f'Ингредиент {i}', measurement_unit='г'
+            ).pk
+            for i in range(10)
+        ]
+        for i in range(20):
+            Recipe.objects.create(
+                author=author, name=f'Рецепт {i}', text='Описание',
+                image='recipes/images/test.png', cooking_time=10
+            ).set_ingredients({pk: 1 for pk in rnd.sample(ingredients, 4)})
+        cls.ingredients = ingredients
+
+    def stored(self):
+        return list(SimilarRecipe.objects.order_by(
+            'recipe_id', 'rank'
+        ).values_list('recipe_id', 'rank', 'similar_id'))
+
+    def assert_matches_rebuild(self):
+        incremental = self.stored()
+        similarity.build(rebuild=True)
+        self.assertEqual(incremental, self.stored())
+
+    def test_after_delete(self):
+        similarity.build(rebuild=True)
+        for _ in range(3):
+            deleted = SimilarRecipe.objects.filter(rank=1).values_list(
+                'similar_id', flat=True
+            ).first()
+            Recipe.objects.get(pk=deleted).delete()
+            self.assertTrue(Recipe.objects.without_similar().exists())
+            similarity.build()
+            ranks = {}
+            for recipe_id, rank, _ in self.stored():
+                ranks.setdefault(recipe_id, []).append(rank)
+            for recipe_ranks in ranks.values():
+                self.assertEqual(
+                    recipe_ranks, list(range(1, len(recipe_ranks) + 1))
+                )
+            self.assert_matches_rebuild()
+
+    def test_after_update(self):
+        similarity.build(rebuild=True)
+        for recipe in Recipe.objects.order_by('pk')[:2]:
+            recipe.set_ingredients({pk: 1 for pk in self.ingredients[:5]})
+            recipe.save()
+        similarity.build()
+        self.assert_matches_rebuild()
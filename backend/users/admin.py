@@ -1,17 +1,20 @@
 from django.contrib import admin
 
+from core.admin import LargeTableAdmin, ObjectDeleteAdmin
 from .models import User, Follow
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(LargeTableAdmin):
     """Настройка пользователя для админки."""
     list_display = (
         'username',
         'first_name',
         'last_name',
         'email',
-        'is_active'
+        'is_active',
+        'recipes_count',
+        'followers_count'
     )
     list_filter = (
         'is_active',
@@ -29,4 +32,15 @@ class UserAdmin(admin.ModelAdmin):
     )
 
 
-admin.site.register(Follow)
+@admin.register(Follow)
+class FollowAdmin(ObjectDeleteAdmin):
+    """Настройка подписки для админки."""
+    list_display = (
+        'user',
+        'author'
+    )
+    list_select_related = ('user', 'author')
+    search_fields = (
+        'user__username__istartswith',
+    )
+    autocomplete_fields = ('user', 'author')
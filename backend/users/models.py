@@ -1,5 +1,28 @@
-from django.contrib.auth.models import AbstractUser
-from django.db import models
+from django.contrib.auth.models import AbstractUser, UserManager
+from django.db import models, transaction
+
+from core.querysets import CounterQuerySet, UserLinkQuerySet
+
+
+class UserQuerySet(CounterQuerySet):
+    """QuerySet для пользователя."""
+    def add_is_subscribed(self, user_id):
+        """Метод для добавления признака подписки текущего пользователя."""
+        return self.annotate(
+            is_subscribed=models.Exists(
+                Follow.objects.filter(
+                    user_id=user_id, author=models.OuterRef('pk')
+                )
+            )
+        )
+
+
+class CustomUserManager(UserManager.from_queryset(UserQuerySet)):
+    """
+    Менеджер пользователя с методами UserQuerySet. Класс объявлен
+    в модуле, а не только создан from_queryset(), чтобы миграции
+    (use_in_migrations у UserManager) могли его импортировать.
+    """
 
 
 class User(AbstractUser):
@@ -17,6 +40,18 @@ class User(AbstractUser):
         unique=True,
         max_length=254
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False
+    )
+
+    objects = CustomUserManager()
 
     class Meta:
         ordering = ['id']
@@ -27,6 +62,12 @@ class User(AbstractUser):
         return self.username
 
 
+class FollowQuerySet(UserLinkQuerySet):
+    """QuerySet для подписок."""
+    target_field = 'author'
+    counter_field = 'followers_count'
+
+
 class Follow(models.Model):
     """Модель подписки."""
     user = models.ForeignKey(
@@ -42,6 +83,8 @@ class Follow(models.Model):
         verbose_name='Автор'
     )
 
+    objects = FollowQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Подписка'
         verbose_name_plural = 'Подписки'
@@ -54,3 +97,28 @@ class Follow(models.Model):
 
     def __str__(self):
         return f'{self.user.username} подписался на {self.author.username}'
+
+    @transaction.atomic(savepoint=False)
+    def save(self, *args, **kwargs):
+        previous = None
+        if not self._state.adding:
+            previous = Follow.objects.filter(pk=self.pk).values_list(
+                'author_id', flat=True
+            ).first()
+        super().save(*args, **kwargs)
+        if previous == self.author_id:
+            return
+        if previous is not None:
+            User.objects.filter(pk=previous).change_counter(
+                'followers_count', -1
+            )
+        User.objects.filter(pk=self.author_id).change_counter(
+            'followers_count', 1
+        )
+
+    @transaction.atomic(savepoint=False)
+    def delete(self, *args, **kwargs):
+        User.objects.filter(pk=self.author_id).change_counter(
+            'followers_count', -1
+        )
+        return super().delete(*args, **kwargs)